@@ -0,0 +1,2 @@
+# Initialize bench package
+# Load-testing tools: fake Groq server and latency benchmark
@@ -0,0 +1,275 @@
+"""
+End-to-end latency benchmark for the AI routes.
+Drives the Flask app with N concurrent logged-in users against the local fake Groq
+server and reports p50/p95/p99 latency, requests per second and LLM gateway
+saturation per route.
+
+    python -m bench.benchmark --users 20 --requests 10
+    python -m bench.benchmark --routes chat,chat_stream --users 50 --mean-ms 1200
+    python -m bench.benchmark --url https://staging.example.com --cookie "session=..."
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import wave
+import zlib
+import struct
+import argparse
+import tempfile
+import threading
+
+from bench.fake_groq import start_server, add_config_arguments, config_from_args
+
+ROUTES = ('chat', 'chat_stream', 'process_image', 'speech_to_text', 'process_audio')
+
+
+def make_png(width=64, height=64):
+    """Build a small RGB gradient PNG with the standard library only."""
+    # Each scanline starts with filter type 0 followed by RGB triples
+    rows = b''.join(
+        b'\x00' + b''.join(bytes((x * 4 % 256, y * 4 % 256, 128)) for x in range(width))
+        for y in range(height)
+    )
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+def make_wav(seconds=1.0, rate=16000, frequency=440.0):
+    """Build a mono 16-bit sine-wave WAV with the standard library only."""
+    frames = b''.join(
+        struct.pack('<h', int(12000 * math.sin(2 * math.pi * frequency * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class RouteStats:
+    """Latency samples and outcome counts for one route."""
+
+    def __init__(self, route):
+        self.route = route
+        self.latencies = []
+        self.ttfts = []
+        self.statuses = {}
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, status, latency, ttft=None):
+        with self._lock:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.ttfts.append(ttft)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        elapsed = (self.finished or time.monotonic()) - (self.started or time.monotonic())
+        ok = sum(count for status, count in self.statuses.items() if 200 <= status < 300)
+        total = len(self.latencies)
+        ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            'route': self.route,
+            'requests': total,
+            'errors': total - ok,
+            'statuses': self.statuses,
+            'rps': round(total / elapsed, 2) if elapsed > 0 else None,
+            'p50_ms': ms(percentile(self.latencies, 50)),
+            'p95_ms': ms(percentile(self.latencies, 95)),
+            'p99_ms': ms(percentile(self.latencies, 99)),
+            'ttft_p50_ms': ms(percentile(self.ttfts, 50)),
+            'ttft_p95_ms': ms(percentile(self.ttfts, 95)),
+        }
+
+
+class InProcessTarget:
+    """Runs requests through Flask's test client inside this process."""
+
+    def __init__(self, fake_base_url):
+        # Point the app at the fake server before it is imported
+        os.environ['GROQ_BASE_URL'] = fake_base_url
+        os.environ.setdefault('GROQ_API_KEY', 'fake-key')
+        os.environ.setdefault('GROQ_STT_BACKEND', 'groq')
+        self._db_dir = tempfile.mkdtemp(prefix='airena-bench-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(self._db_dir, 'bench.db')}"
+
+        import main
+        from models import db, User
+        self.main = main
+        with main.app.app_context():
+            user = User(name='Benchmark', email='bench@example.com', is_verified=True)
+            user.set_password(os.urandom(8).hex())
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def session(self):
+        client = self.main.app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.user_id)
+            sess['_fresh'] = True
+        return client
+
+    def gateway_stats(self):
+        return self.main.llm_gateway.stats()
+
+    def post(self, client, path, json_body=None, files=None, stream=False):
+        if files:
+            data = {name: (io.BytesIO(content), filename) for name, (filename, content) in files.items()}
+            response = client.post(path, data=data, content_type='multipart/form-data', buffered=not stream)
+        else:
+            response = client.post(path, json=json_body, buffered=not stream)
+        return response.status_code, response.iter_encoded()
+
+
+class HttpTarget:
+    """Runs requests against a running deployment over HTTP."""
+
+    def __init__(self, base_url, cookie):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.cookie = cookie
+
+    def session(self):
+        session = self._requests.Session()
+        if self.cookie:
+            session.headers['Cookie'] = self.cookie
+        return session
+
+    def gateway_stats(self):
+        return None
+
+    def post(self, session, path, json_body=None, files=None, stream=False):
+        response = session.post(self.base_url + path, json=json_body, files=files, stream=stream, timeout=300)
+        return response.status_code, response.iter_content(chunk_size=None)
+
+
+def run_route(target, route, users, requests_per_user, payloads):
+    """Hammer one route with `users` concurrent sessions and collect stats."""
+    stats = RouteStats(route)
+    samples = []
+    stop_sampling = threading.Event()
+
+    def sample_gateway():
+        while not stop_sampling.is_set():
+            gateway = target.gateway_stats()
+            if gateway is not None:
+                samples.append(gateway)
+            stop_sampling.wait(0.05)
+
+    def user_loop():
+        client = target.session()
+        for _ in range(requests_per_user):
+            started = time.monotonic()
+            ttft = None
+            if route == 'chat':
+                status, body = target.post(client, '/chat', {'message': 'Tell me about space shooters'})
+            elif route == 'chat_stream':
+                status, body = target.post(client, '/chat', {'message': 'Tell me about space shooters',
+                                                             'stream': True}, stream=True)
+            elif route == 'process_image':
+                status, body = target.post(client, '/process-image',
+                                           files={'image': ('bench.png', payloads['image'])})
+            elif route == 'speech_to_text':
+                status, body = target.post(client, '/speech-to-text',
+                                           files={'audio': ('bench.wav', payloads['audio'])})
+            else:
+                status, body = target.post(client, '/process-audio',
+                                           files={'audio': ('bench.wav', payloads['audio'])})
+            for chunk in body:
+                if ttft is None and route == 'chat_stream' and b'"token"' in chunk:
+                    ttft = time.monotonic() - started
+            stats.record(status, time.monotonic() - started, ttft)
+
+    sampler = threading.Thread(target=sample_gateway, daemon=True)
+    threads = [threading.Thread(target=user_loop) for _ in range(users)]
+
+    stats.started = time.monotonic()
+    sampler.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats.finished = time.monotonic()
+    stop_sampling.set()
+    sampler.join()
+
+    summary = stats.summary()
+    if samples:
+        capacity = samples[0]['max_concurrency']
+        summary['gateway_max_active'] = max(sample['active'] for sample in samples)
+        summary['gateway_max_queued'] = max(sample['queued'] for sample in samples)
+        summary['gateway_saturation'] = round(
+            sum(sample['active'] for sample in samples) / (len(samples) * capacity), 3)
+    summary['rejected'] = summary['statuses'].get(429, 0) + summary['statuses'].get(503, 0)
+    return summary
+
+
+def print_table(results):
+    columns = ('route', 'requests', 'errors', 'rejected', 'rps', 'p50_ms', 'p95_ms', 'p99_ms',
+               'ttft_p50_ms', 'ttft_p95_ms', 'gateway_max_active', 'gateway_max_queued', 'gateway_saturation')
+    widths = {column: max(len(column), *(len(str(result.get(column, '-'))) for result in results))
+              for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for result in results:
+        print('  '.join(str(result.get(column, '-') if result.get(column) is not None else '-').ljust(widths[column])
+                        for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the AI routes against a fake Groq server.')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent users per route')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per user per route')
+    parser.add_argument('--routes', default=','.join(ROUTES), help=f"Comma-separated subset of {', '.join(ROUTES)}")
+    parser.add_argument('--url', help='Benchmark a running deployment instead of the in-process app')
+    parser.add_argument('--cookie', help='Session cookie for --url mode')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    routes = [route.strip() for route in args.routes.split(',') if route.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+    if args.url:
+        target = HttpTarget(args.url, args.cookie)
+    else:
+        server = start_server(config_from_args(args))
+        target = InProcessTarget(f"http://127.0.0.1:{server.server_port}")
+
+    payloads = {'image': make_png(), 'audio': make_wav()}
+    results = [run_route(target, route, args.users, args.requests, payloads) for route in routes]
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) API, for load tests without real quota.
+Serves chat completions (plain and streamed) and audio transcriptions with configurable
+latency distributions, token counts and error rates.
+
+    python -m bench.fake_groq --port 8765 --latency lognormal --mean-ms 800 --error-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=fake python main.py
+"""
+
+import json
+import math
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ('the quick brown fox jumps over the lazy dog while groq answers every question '
+         'about games quizzes science history and more').split()
+
+
+class FakeGroqConfig:
+    """Latency, token and error settings for the fake server."""
+
+    def __init__(self, latency='fixed', mean_ms=500, stddev_ms=150, ttft_ms=150,
+                 min_tokens=50, max_tokens=300, tokens_per_second=400,
+                 error_rate=0.0, rate_limit_rate=0.0, seed=None):
+        self.latency = latency
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self.ttft_ms = ttft_ms
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self):
+        """Sample one upstream latency in seconds from the configured distribution."""
+        with self._lock:
+            mean, stddev = self.mean_ms, self.stddev_ms
+            if self.latency == 'uniform':
+                value = self._random.uniform(max(0, mean - stddev), mean + stddev)
+            elif self.latency == 'exponential':
+                value = self._random.expovariate(1.0 / mean) if mean else 0
+            elif self.latency == 'lognormal':
+                # Parameterize so the distribution has the requested mean and stddev
+                variance = math.log(1 + (stddev / mean) ** 2) if mean else 0
+                mu = math.log(mean) - variance / 2 if mean else 0
+                value = self._random.lognormvariate(mu, math.sqrt(variance)) if mean else 0
+            else:
+                value = mean
+        return max(0.0, value) / 1000.0
+
+    def sample_tokens(self):
+        with self._lock:
+            return self._random.randint(self.min_tokens, self.max_tokens)
+
+    def sample_error(self):
+        """Return an (status, message) pair to fail this call with, or None."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429, 'Rate limit reached'
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500, 'Internal server error'
+        return None
+
+
+def _make_text(token_count):
+    return ' '.join(WORDS[i % len(WORDS)] for i in range(token_count))
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the subset of the Groq API the app uses."""
+
+    server_version = 'FakeGroq/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        logging.debug(f"fake-groq: {format % args}")
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self._send_json(200, {'object': 'list', 'data': []})
+        self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        body = self._read_body()
+
+        error = self.config.sample_error()
+        if error:
+            status, message = error
+            time.sleep(self.config.sample_latency() / 4)
+            headers = {'Retry-After': '1'} if status == 429 else None
+            return self._send_json(status, {'error': {'message': message, 'type': 'fake_error'}}, headers)
+
+        if self.path.endswith('/chat/completions'):
+            request = json.loads(body or b'{}')
+            if request.get('stream'):
+                return self._stream_completion(request)
+            return self._completion(request)
+
+        if self.path.endswith('/audio/transcriptions'):
+            time.sleep(self.config.sample_latency())
+            return self._send_json(200, {'text': 'this is a fake transcription'})
+
+        self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def _prompt_tokens(self, request):
+        text = json.dumps(request.get('messages', []))
+        return max(1, len(text) // 4)
+
+    def _completion(self, request):
+        completion_tokens = min(self.config.sample_tokens(), request.get('max_tokens') or 10 ** 6)
+        time.sleep(self.config.sample_latency())
+        prompt_tokens = self._prompt_tokens(request)
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': _make_text(completion_tokens)},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def _stream_completion(self, request):
+        completion_tokens = min(self.config.sample_tokens(), request.get('max_tokens') or 10 ** 6)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get('model', 'fake')
+
+        time.sleep(self.config.ttft_ms / 1000.0)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        for i in range(completion_tokens):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': WORDS[i % len(WORDS)] + ' '}, 'finish_reason': None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+
+        final = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            'x_groq': {'usage': {'prompt_tokens': self._prompt_tokens(request),
+                                 'completion_tokens': completion_tokens}}
+        }
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    """Start the fake server on a background thread and return it (server.server_port has the port)."""
+    server = ThreadingHTTPServer((host, port), FakeGroqHandler)
+    server.daemon_threads = True
+    server.config = config or FakeGroqConfig()
+    thread = threading.Thread(target=server.serve_forever, name='fake-groq', daemon=True)
+    thread.start()
+    return server
+
+
+def add_config_arguments(parser):
+    """Add the fake server's tuning flags to an argument parser."""
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'], default='lognormal',
+                        help='Upstream latency distribution')
+    parser.add_argument('--mean-ms', type=float, default=600, help='Mean upstream latency in ms')
+    parser.add_argument('--stddev-ms', type=float, default=250, help='Latency spread in ms (uniform/lognormal)')
+    parser.add_argument('--ttft-ms', type=float, default=150, help='Time to first token for streamed responses')
+    parser.add_argument('--min-tokens', type=int, default=50, help='Minimum completion tokens')
+    parser.add_argument('--max-tokens', type=int, default=300, help='Maximum completion tokens')
+    parser.add_argument('--tokens-per-second', type=float, default=400, help='Streaming speed')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls failing with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of calls failing with 429')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+
+
+def config_from_args(args):
+    return FakeGroqConfig(
+        latency=args.latency, mean_ms=args.mean_ms, stddev_ms=args.stddev_ms, ttft_ms=args.ttft_ms,
+        min_tokens=args.min_tokens, max_tokens=args.max_tokens, tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local fake Groq API server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = ThreadingHTTPServer((args.host, args.port), FakeGroqHandler)
+    server.daemon_threads = True
+    server.config = config_from_args(args)
+    logging.info(f"Fake Groq API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,44 @@
 import os
 import base64
-import tempfile
 import groq
 import speech_recognition as sr
-from pydub import AudioSegment
 from PIL import Image
 import logging
+from .conversation import ConversationStore, make_summarizer
+from .cache import create_response_cache, make_key
+from .audio import transcribe
+from .imaging import preprocess_image, decode_image_payload
+from .resilience import ResilientCaller
+from .metrics import UPSTREAM_LATENCY, UPSTREAM_REQUESTS, UPSTREAM_ERRORS, current_route, record_usage
+
+CHAT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+AGENT_MODEL = "compound-beta"
+IMAGE_PROMPT = "Describe this image in detail:"
 
 class GroqAPI:
-    def __init__(self):
+    def __init__(self, client=None, gateway=None):
         self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-            
-        try:
-            # Initialize client without proxies parameter
-            self.client = groq.Client(api_key=self.api_key)
-            logging.info("Groq client initialized successfully")
-        except Exception as e:
-            logging.error(f"Failed to initialize Groq client: {str(e)}")
-            raise
+        
+        if client is not None:
+            # Caller-supplied client (e.g. a fake for tests or benchmarks)
+            self.client = client
+        else:
+            if not self.api_key:
+                raise ValueError("GROQ_API_KEY environment variable is not set")
+                
+            try:
+                # Initialize client without proxies parameter; GROQ_BASE_URL points it at a
+                # compatible server such as the local stub in bench/fake_groq.py.
+                # Retries are handled by our resilience layer, so the SDK's own are disabled.
+                self.client = groq.Client(
+                    api_key=self.api_key,
+                    base_url=os.getenv("GROQ_BASE_URL") or None,
+                    max_retries=0,
+                )
+                logging.info("Groq client initialized successfully")
+            except Exception as e:
+                logging.error(f"Failed to initialize Groq client: {str(e)}")
+                raise
             
         self.audio_enabled = False
         
@@ -31,28 +50,88 @@ class GroqAPI:
         except Exception as e:
             logging.warning(f"Audio features disabled: {str(e)}")
             self.audio_enabled = False
+        
+        # Speech recognition backend: "google" (speech_recognition) or "groq" (Whisper)
+        self.stt_backend = os.getenv("GROQ_STT_BACKEND", "google").lower()
 
         self.system_prompt = {
             "role": "system",
             "content": "You are a helpful assistant. You reply with long answers."
         }
         
-        self.chat_history = [self.system_prompt]
+        # Per-user chat history, trimmed to a token budget on every request
+        summarizer = None
+        if os.getenv("GROQ_HISTORY_SUMMARIZE", "false").lower() == "true":
+            # Background summaries still take an LLM gateway slot like any other call
+            complete = self.get_completion
+            if gateway is not None:
+                complete = lambda messages, **kwargs: gateway.call(self.get_completion, messages, **kwargs)
+            summarizer = make_summarizer(complete, CHAT_MODEL)
+        self.conversations = ConversationStore(summarizer=summarizer)
+
+        # Opt-in cache for stateless calls (GROQ_CACHE_BACKEND=memory|sqlite)
+        self.cache = create_response_cache()
+        
+        # Timeouts, retries, circuit breaker and hedging for upstream calls (GROQ_TIMEOUT, ...)
+        self.resilience = ResilientCaller()
+        # Google speech recognition gets its own breaker so its outages don't trip Groq's
+        self.speech_resilience = ResilientCaller(
+            retryable=lambda error: isinstance(error, sr.RequestError), name="Speech recognition")
     
-    def get_chat_response(self, user_input, use_agent=False):
+    def _call_upstream(self, fn, operation, model, hedge=False, resilience=None):
+        """Run fn(timeout) through a resilience layer, recording latency and outcome"""
+        labels = {"model": model, "route": current_route(), "operation": operation}
+        try:
+            with UPSTREAM_LATENCY.time(**labels):
+                result = (resilience or self.resilience).call(fn, operation=operation, hedge=hedge)
+        except Exception as e:
+            UPSTREAM_REQUESTS.inc(status="error", **labels)
+            UPSTREAM_ERRORS.inc(error=e.__class__.__name__, **labels)
+            raise
+        
+        UPSTREAM_REQUESTS.inc(status="ok", **labels)
+        return result
+    
+    def _create_completion(self, operation="chat", hedge=False, **kwargs):
+        """Create a chat completion through the resilience layer, recording latency and usage"""
+        response = self._call_upstream(
+            lambda timeout: self.client.chat.completions.create(timeout=timeout, **kwargs),
+            operation,
+            kwargs.get("model", ""),
+            hedge=hedge,
+        )
+        if not kwargs.get("stream"):
+            record_usage(kwargs.get("model", ""), getattr(response, "usage", None))
+        return response
+    
+    def get_chat_response(self, user_input, use_agent=False, user_id=None):
         """Get a response from the Groq chatbot for text input"""
         try:
             if not self.client:
                 return "Error: Groq API is not properly initialized. Please check your API key."
                 
-            self.chat_history.append({"role": "user", "content": user_input})
+            messages = self.conversations.build_messages(user_id, self.system_prompt, user_input)
             
             # Select model based on whether we want to use agentic capabilities
-            model = "compound-beta" if use_agent else "meta-llama/llama-4-scout-17b-16e-instruct"
+            model = AGENT_MODEL if use_agent else CHAT_MODEL
+            
+            # Only history-free, tool-free chats are safe to answer from the cache
+            cache_key = None
+            if self.cache and not use_agent and len(messages) == 2:
+                cache_key = make_key(model, user_input, system=self.system_prompt["content"])
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self.conversations.record(user_id, user_input, cached, self.system_prompt)
+                    return cached
+            
+            # Short prompts may be hedged with a duplicate request when the first one is slow
+            hedge = not use_agent and len(user_input) <= self.resilience.config.hedge_max_prompt_chars
             
-            response = self.client.chat.completions.create(
+            response = self._create_completion(
+                operation="chat",
+                hedge=hedge,
                 model=model,
-                messages=self.chat_history,
+                messages=messages,
                 max_tokens=2000,
                 temperature=1.2,
             )
@@ -69,8 +148,11 @@ class GroqAPI:
                         assistant_response += f"- Used tool: {tool_call.function.name}\n"
                         assistant_response += f"- Tool arguments: {tool_call.function.arguments}\n\n"
             
-            # Append the assistant's response to the chat history
-            self.chat_history.append({"role": "assistant", "content": assistant_response})
+            # Record the exchange in this user's chat history
+            self.conversations.record(user_id, user_input, assistant_response, self.system_prompt)
+            
+            if cache_key:
+                self.cache.set(cache_key, assistant_response)
             
             return assistant_response
         
@@ -78,43 +160,59 @@ class GroqAPI:
             error_message = f"An error occurred while generating a response: {str(e)}"
             logging.error(error_message)
             return error_message
-    
+
+    def get_completion(self, messages, operation="completion", model=CHAT_MODEL, **kwargs):
+        """Run a stateless completion (no history, no cache) and return the reply text; errors propagate"""
+        if not self.client:
+            raise RuntimeError("Groq API is not properly initialized. Please check your API key.")
+
+        response = self._create_completion(operation=operation, model=model, messages=messages, **kwargs)
+        return response.choices[0].message.content
+
+    def stream_chat_response(self, user_input, use_agent=False, user_id=None):
+        """Stream a response from the Groq chatbot, yielding text deltas as they arrive"""
+        if not self.client:
+            raise RuntimeError("Groq API is not properly initialized. Please check your API key.")
+
+        messages = self.conversations.build_messages(user_id, self.system_prompt, user_input)
+        model = AGENT_MODEL if use_agent else CHAT_MODEL
+
+        stream = self._create_completion(
+            operation="chat_stream",
+            model=model,
+            messages=messages,
+            max_tokens=2000,
+            temperature=1.2,
+            stream=True,
+        )
+
+        parts = []
+        try:
+            for chunk in stream:
+                # Groq reports token usage on the final chunk
+                x_groq = getattr(chunk, "x_groq", None)
+                usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None)
+                if usage:
+                    record_usage(model, usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            # Record whatever was generated, even if the client disconnected mid-stream
+            if parts:
+                self.conversations.record(user_id, user_input, ''.join(parts), self.system_prompt)
+
     def speech_to_text(self, audio_data):
         """Convert speech to text from audio data"""
         if not self.audio_enabled:
             return "Audio features are not available in this environment. Please use text input instead."
             
         try:
-            # Create temp files for original and converted audio
-            with tempfile.NamedTemporaryFile(suffix=".flac", delete=False) as temp_input_file:
-                temp_input_file.write(audio_data)
-                temp_input_path = temp_input_file.name
-            
-            # Create output wav file path
-            temp_output_path = temp_input_path.replace(".flac", ".wav")
-            
-            try:
-                # Load audio with pydub (supports many formats including FLAC)
-                audio_segment = AudioSegment.from_file(temp_input_path)
-                # Export as WAV for compatibility with speech_recognition
-                audio_segment.export(temp_output_path, format="wav")
-            except Exception as conversion_error:
-                # If conversion fails, try direct processing
-                temp_output_path = temp_input_path
-            
-            # Convert the audio file to text
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(temp_output_path) as source:
-                audio = recognizer.record(source)
-                text = recognizer.recognize_google(audio)
-            
-            # Clean up the temporary files
-            if os.path.exists(temp_input_path):
-                os.unlink(temp_input_path)
-            if os.path.exists(temp_output_path) and temp_output_path != temp_input_path:
-                os.unlink(temp_output_path)
-            
-            return text
+            # Decode in memory and convert the audio to text
+            return self._transcribe(audio_data)
         
         except sr.UnknownValueError:
             return "Sorry, I could not understand the audio."
@@ -125,43 +223,84 @@ class GroqAPI:
         except Exception as e:
             return f"An error occurred: {str(e)}"
     
+    def _stt_client(self):
+        """Return the Groq client when speech recognition should use Whisper, else None"""
+        return self.client if self.stt_backend == "groq" else None
+
+    def _transcribe(self, audio_data):
+        """Transcribe audio with the configured backend through its resilience layer and metrics"""
+        client = self._stt_client()
+        resilience = self.resilience if client is not None else self.speech_resilience
+        return transcribe(
+            audio_data,
+            client=client,
+            call=lambda fn, operation, model: self._call_upstream(fn, operation, model, resilience=resilience),
+        )
+    
     def encode_image(self, image_data):
         """Encode the image data to base64 format"""
         return base64.b64encode(image_data).decode('utf-8')
     
-    def process_image(self, image_data):
-        """Process an image using Groq's multimodal model"""
+    def describe_image(self, image_data, prompt=IMAGE_PROMPT):
+        """Describe an image using Groq's multimodal model, raising on failure"""
+        image_data = decode_image_payload(image_data)
+        
+        cache_key = None
+        if self.cache:
+            cache_key = make_key(CHAT_MODEL, prompt, image_data)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Downsize and strip metadata before encoding, falling back to the raw upload
+        mime_type = "image/jpeg"
         try:
-            # Encode the image to base64
-            base64_image = self.encode_image(image_data)
-            
-            response = self.client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",  # Use the same model for vision
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "Describe this image in detail:"},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                },
+            prepared = preprocess_image(image_data)
+            image_data, mime_type = prepared.data, prepared.mime_type
+        except Exception as e:
+            logging.warning(f"Image pre-processing failed, sending original upload: {str(e)}")
+        
+        # Encode the image to base64
+        base64_image = self.encode_image(image_data)
+        
+        response = self._create_completion(
+            operation="vision",
+            model=CHAT_MODEL,  # Use the same model for vision
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{base64_image}",
                             },
-                        ],
-                    }
-                ],
-                max_tokens=1024,
-                temperature=0.7,
-            )
-            
-            # Extract and return the description from the response
-            return response.choices[0].message.content
+                        },
+                    ],
+                }
+            ],
+            max_tokens=1024,
+            temperature=0.7,
+        )
+        
+        # Extract and return the description from the response
+        description = response.choices[0].message.content
+        
+        if cache_key:
+            self.cache.set(cache_key, description)
+        
+        return description
+    
+    def process_image(self, image_data, prompt=IMAGE_PROMPT):
+        """Process an image using Groq's multimodal model"""
+        try:
+            return self.describe_image(image_data, prompt)
         
         except Exception as e:
             return f"An error occurred while processing the image: {str(e)}"
     
-    def process_audio(self, audio_data):
+    def process_audio(self, audio_data, user_id=None):
         """Process audio for transcription"""
         if not self.audio_enabled:
             return {
@@ -170,37 +309,11 @@ class GroqAPI:
             }
             
         try:
-            # Create temp files for original and converted audio
-            with tempfile.NamedTemporaryFile(suffix=".flac", delete=False) as temp_input_file:
-                temp_input_file.write(audio_data)
-                temp_input_path = temp_input_file.name
-            
-            # Create output wav file path
-            temp_output_path = temp_input_path.replace(".flac", ".wav")
-            
-            try:
-                # Load audio with pydub (supports many formats including FLAC)
-                audio_segment = AudioSegment.from_file(temp_input_path)
-                # Export as WAV for compatibility with speech_recognition
-                audio_segment.export(temp_output_path, format="wav")
-            except Exception as conversion_error:
-                # If conversion fails, try direct processing
-                temp_output_path = temp_input_path
-                
-            # Convert the audio file to text
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(temp_output_path) as source:
-                audio = recognizer.record(source)
-                transcription = recognizer.recognize_google(audio)
-            
-            # Clean up the temporary files
-            if os.path.exists(temp_input_path):
-                os.unlink(temp_input_path)
-            if os.path.exists(temp_output_path) and temp_output_path != temp_input_path:
-                os.unlink(temp_output_path)
+            # Decode in memory and convert the audio to text
+            transcription = self._transcribe(audio_data)
             
             # Get a response from the model based on the transcription
-            response = self.get_chat_response(transcription, False)
+            response = self.get_chat_response(transcription, False, user_id)
             
             return {
                 "transcription": transcription,
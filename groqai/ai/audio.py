@@ -0,0 +1,119 @@
+"""
+In-memory audio ingestion for speech recognition.
+Sniffs the upload format, decodes WAV/FLAC directly and everything else through
+pydub/ffmpeg pipes, then downmixes and resamples to what the recognizer expects.
+Nothing is written to disk.
+"""
+
+import io
+import os
+import time
+import logging
+import speech_recognition as sr
+from pydub import AudioSegment
+from .metrics import AUDIO_CONVERSION
+
+try:
+    import magic
+except ImportError:  # libmagic missing: fall back to header sniffing
+    magic = None
+
+# Format the recognizer works best with: mono, 16-bit, 16 kHz
+TARGET_SAMPLE_RATE = 16000
+TARGET_SAMPLE_WIDTH = 2
+
+WHISPER_MODEL = os.getenv('GROQ_WHISPER_MODEL', 'whisper-large-v3-turbo')
+
+WAV_MIME_TYPES = {'audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave'}
+FLAC_MIME_TYPES = {'audio/flac', 'audio/x-flac'}
+
+
+def sniff_format(audio_data):
+    """Return 'wav', 'flac' or None for anything that needs transcoding."""
+    if magic is not None:
+        try:
+            mime = magic.from_buffer(audio_data[:2048], mime=True)
+            if mime in WAV_MIME_TYPES:
+                return 'wav'
+            if mime in FLAC_MIME_TYPES:
+                return 'flac'
+            return None
+        except Exception as e:
+            logging.debug(f"python-magic failed to sniff audio, using header check: {str(e)}")
+
+    if audio_data[:4] == b'RIFF' and audio_data[8:12] == b'WAVE':
+        return 'wav'
+    if audio_data[:4] == b'fLaC':
+        return 'flac'
+    return None
+
+
+def _normalize(audio):
+    """Resample recognizer audio to the target rate and sample width."""
+    if audio.sample_rate == TARGET_SAMPLE_RATE and audio.sample_width == TARGET_SAMPLE_WIDTH:
+        return audio
+    frames = audio.get_raw_data(convert_rate=TARGET_SAMPLE_RATE, convert_width=TARGET_SAMPLE_WIDTH)
+    return sr.AudioData(frames, TARGET_SAMPLE_RATE, TARGET_SAMPLE_WIDTH)
+
+
+def load_audio(audio_data):
+    """Decode an uploaded audio buffer into mono 16 kHz recognizer audio."""
+    started = time.perf_counter()
+    audio_format = sniff_format(audio_data)
+
+    if audio_format:
+        # WAV and FLAC can be read by the recognizer directly (it downmixes to mono)
+        try:
+            with sr.AudioFile(io.BytesIO(audio_data)) as source:
+                audio = sr.Recognizer().record(source)
+            audio = _normalize(audio)
+            AUDIO_CONVERSION.observe(time.perf_counter() - started, format=audio_format)
+            return audio
+        except Exception as e:
+            logging.debug(f"Direct {audio_format} decode failed, falling back to ffmpeg: {str(e)}")
+
+    # Anything else (webm/ogg/mp3/...) goes through ffmpeg over pipes
+    segment = AudioSegment.from_file(io.BytesIO(audio_data))
+    segment = (segment
+               .set_channels(1)
+               .set_frame_rate(TARGET_SAMPLE_RATE)
+               .set_sample_width(TARGET_SAMPLE_WIDTH))
+    AUDIO_CONVERSION.observe(time.perf_counter() - started, format=audio_format or 'transcoded')
+    return sr.AudioData(segment.raw_data, TARGET_SAMPLE_RATE, TARGET_SAMPLE_WIDTH)
+
+
+def _direct_call(fn, operation, model):
+    return fn(None)
+
+
+def transcribe(audio_data, recognizer=None, client=None, call=_direct_call):
+    """
+    Transcribe an uploaded audio buffer to text, with Groq Whisper when a client is given.
+    The upstream request goes through call(fn, operation, model), which invokes fn(timeout)
+    and is where the caller applies its timeouts, retries and metrics.
+    """
+    audio = load_audio(audio_data)
+
+    if client is not None:
+        wav_data = audio.get_wav_data()
+        transcription = call(
+            lambda timeout: client.audio.transcriptions.create(
+                file=('audio.wav', wav_data),
+                model=WHISPER_MODEL,
+                timeout=timeout,
+            ),
+            'transcription',
+            WHISPER_MODEL,
+        )
+        text = (transcription.text or '').strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    recognizer = recognizer or sr.Recognizer()
+
+    def recognize(timeout):
+        recognizer.operation_timeout = timeout
+        return recognizer.recognize_google(audio)
+
+    return call(recognize, 'transcription', 'google')
@@ -0,0 +1,93 @@
+"""
+Concurrent fan-out for batched vision requests.
+Runs one describe call per image on a bounded thread pool with per-item timeouts, counted
+from when each item starts running, and reports each item's result or error, either in
+input order or as soon as it is ready.
+"""
+
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+
+
+class _Job:
+    """A submitted item and the time a pool thread started on it."""
+
+    __slots__ = ('future', 'started')
+
+    def __init__(self):
+        self.future = None
+        self.started = None
+
+
+class BatchVisionRunner:
+    """Describe many images concurrently on a shared, bounded thread pool."""
+
+    def __init__(self, describe, max_workers=None, item_timeout=None, max_items=None):
+        # describe(image_data, prompt) -> description, raising on failure
+        self.describe = describe
+        self.max_workers = max_workers or int(os.getenv('GROQ_BATCH_WORKERS', 4))
+        self.item_timeout = item_timeout or float(os.getenv('GROQ_BATCH_ITEM_TIMEOUT', 60))
+        self.max_items = max_items or int(os.getenv('GROQ_BATCH_MAX_ITEMS', 50))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='vision-batch')
+
+    def _submit(self, images, prompt):
+        if len(images) > self.max_items:
+            raise ValueError(f"A batch can contain at most {self.max_items} images")
+        jobs = []
+        for image in images:
+            job = _Job()
+            # Carry the caller's context (e.g. the metrics route label) into the pool threads
+            job.future = self._pool.submit(contextvars.copy_context().run, self._describe, job, image, prompt)
+            jobs.append(job)
+        return jobs
+
+    def _describe(self, job, image, prompt):
+        job.started = time.monotonic()
+        return self.describe(image, prompt)
+
+    @staticmethod
+    def _result(index, future):
+        try:
+            return {'index': index, 'success': True, 'description': future.result(timeout=0)}
+        except TimeoutError:
+            future.cancel()
+            return {'index': index, 'success': False, 'error': 'Timed out while processing the image'}
+        except Exception as e:
+            logging.warning(f"Batch vision item {index} failed: {str(e)}")
+            return {'index': index, 'success': False, 'error': str(e)}
+
+    def run(self, images, prompt):
+        """Describe all images and return their results in input order."""
+        return sorted(self.iter_completed(images, prompt), key=lambda result: result['index'])
+
+    def iter_completed(self, images, prompt):
+        """
+        Describe all images, yielding each result as soon as it is ready.
+        An item's timeout runs from the moment a pool thread picks it up, so time spent
+        queued behind other batches sharing the pool is not held against it.
+        """
+        jobs = self._submit(images, prompt)
+        indexes = {job.future: index for index, job in enumerate(jobs)}
+        pending = {job.future: job for job in jobs}
+        try:
+            while pending:
+                # Items that start while we wait cannot expire before the wait ends
+                now = time.monotonic()
+                deadline = min([job.started + self.item_timeout for job in pending.values() if job.started is not None]
+                               + [now + self.item_timeout])
+                done, _ = wait(pending, timeout=max(0, deadline - now), return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                for future in sorted(pending, key=indexes.get):
+                    job = pending[future]
+                    if future in done or (job.started is not None and now - job.started >= self.item_timeout):
+                        del pending[future]
+                        yield self._result(indexes[future], future)
+        except GeneratorExit:
+            # Client went away: drop work that has not started yet
+            for future in pending:
+                future.cancel()
+            raise
+
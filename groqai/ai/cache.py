@@ -0,0 +1,201 @@
+"""
+Response cache for stateless Groq calls (image descriptions and history-free chat).
+Keys are built from the model, the normalized prompt and a content hash of any image
+bytes, so prompts differing only in case or spacing ("What is in this image?" vs
+"what is  in this image?") share an entry. Punctuation is kept: "Is it safe?" and
+"Is it safe." may call for different answers. Backends: in-process LRU for a single
+worker, or SQLite for a cache shared by every worker on the machine.
+"""
+
+import os
+import re
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from .metrics import CACHE_LOOKUPS
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalize case and whitespace so trivially different prompts map to the same key."""
+    text = (text or '').lower()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def make_key(model, prompt, image_data=None, **params):
+    """Build a cache key from the model, the normalized prompt, image content and call parameters."""
+    digest = hashlib.sha256()
+    digest.update(model.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_text(prompt).encode('utf-8'))
+    digest.update(b'\0')
+    if image_data:
+        if isinstance(image_data, str):
+            image_data = image_data.encode('utf-8')
+        digest.update(hashlib.sha256(image_data).digest())
+    digest.update(b'\0')
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class BaseCache:
+    """Common hit/miss accounting for cache backends."""
+
+    backend = 'base'
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        CACHE_LOOKUPS.inc(backend=self.backend, result='hit' if hit else 'miss')
+
+    def get(self, key):
+        value = self._get(key)
+        self._count(value is not None)
+        return value
+
+    def set(self, key, value):
+        self._set(key, value)
+
+    def stats(self):
+        """Return hit/miss counters and size for this cache."""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'backend': self.backend,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'size': len(self),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl
+        }
+
+
+class MemoryCache(BaseCache):
+    """In-process LRU cache with TTL expiry."""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache(BaseCache):
+    """SQLite-backed LRU cache with TTL expiry, shared by all workers using the same file."""
+
+    backend = 'sqlite'
+
+    def __init__(self, path, max_entries=10000, ttl=3600):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS response_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used)')
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+    def _get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute('SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            conn.commit()
+            return None
+        conn.execute('UPDATE response_cache SET last_used = ? WHERE key = ?', (now, key))
+        conn.commit()
+        return row[0]
+
+    def _set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)',
+            (key, value, now + self.ttl, now)
+        )
+        # Drop expired rows, then the least recently used rows above the limit
+        conn.execute('DELETE FROM response_cache WHERE expires_at < ?', (now,))
+        conn.execute(
+            'DELETE FROM response_cache WHERE key IN ('
+            'SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+        conn.commit()
+
+
+def create_response_cache():
+    """Create the response cache configured by environment variables, or None if disabled."""
+    backend = os.getenv('GROQ_CACHE_BACKEND', 'none').lower()
+    ttl = int(os.getenv('GROQ_CACHE_TTL', 3600))
+
+    if backend == 'memory':
+        max_entries = int(os.getenv('GROQ_CACHE_MAX_ENTRIES', 1024))
+        logging.info(f"Groq response cache enabled (memory, {max_entries} entries, ttl {ttl}s)")
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+
+    if backend == 'sqlite':
+        path = os.getenv('GROQ_CACHE_PATH', 'groq_cache.db')
+        max_entries = int(os.getenv('GROQ_CACHE_MAX_ENTRIES', 10000))
+        logging.info(f"Groq response cache enabled (sqlite at {path}, {max_entries} entries, ttl {ttl}s)")
+        return SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+
+    if backend not in ('', 'none'):
+        logging.warning(f"Unknown GROQ_CACHE_BACKEND '{backend}', response cache disabled")
+    return None
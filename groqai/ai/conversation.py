@@ -0,0 +1,237 @@
+"""
+Per-user conversation store for the Groq chatbot.
+Keeps a token-budgeted sliding window of recent turns per user, optionally folds
+older turns into a rolling summary, and evicts idle conversations. Summaries are
+written on background threads, so a slow summarization never delays a reply.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Fixed per-message overhead (role, separators) added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Summaries written at once per store
+SUMMARY_WORKERS = int(os.getenv('GROQ_HISTORY_SUMMARY_WORKERS', 2))
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a user and an assistant in a few "
+    "sentences. Keep names, facts and open questions; drop pleasantries."
+)
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text."""
+    if not text:
+        return MESSAGE_OVERHEAD_TOKENS
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def message_tokens(message):
+    """Estimate the number of tokens a chat message will cost."""
+    content = message.get('content')
+    if isinstance(content, list):
+        # Multimodal content: only count the text parts
+        content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return estimate_tokens(content)
+
+
+class Conversation:
+    """History of a single user's chat: recent turns plus a rolling summary."""
+
+    __slots__ = ('turns', 'summary', 'last_active', 'unsummarized', 'summarizing')
+
+    def __init__(self):
+        self.turns = []
+        self.summary = None
+        self.last_active = time.monotonic()
+        # Turns trimmed from the window that are not in the summary yet
+        self.unsummarized = []
+        self.summarizing = False
+
+
+class ConversationStore:
+    """Thread-safe store of conversations keyed by user id."""
+
+    def __init__(self, token_budget=None, idle_timeout=None, max_conversations=None, summarizer=None):
+        if token_budget is None:
+            token_budget = int(os.getenv('GROQ_HISTORY_TOKEN_BUDGET', 4000))
+        if idle_timeout is None:
+            idle_timeout = int(os.getenv('GROQ_HISTORY_IDLE_SECONDS', 1800))
+        if max_conversations is None:
+            max_conversations = int(os.getenv('GROQ_HISTORY_MAX_CONVERSATIONS', 1000))
+        self.token_budget = token_budget
+        self.idle_timeout = idle_timeout
+        self.max_conversations = max_conversations
+        # Callable(previous_summary, dropped_turns) -> new summary, or None to drop old turns
+        self.summarizer = summarizer
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+        self._summary_pool = None
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def _get(self, key):
+        """Return the conversation for key, creating it and marking it recently used."""
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            conversation = Conversation()
+            self._conversations[key] = conversation
+        else:
+            self._conversations.move_to_end(key)
+        conversation.last_active = time.monotonic()
+        return conversation
+
+    def _evict(self):
+        """Drop idle conversations and the least recently used ones above the limit."""
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._conversations:
+            key, conversation = next(iter(self._conversations.items()))
+            if conversation.last_active >= cutoff and len(self._conversations) <= self.max_conversations:
+                break
+            del self._conversations[key]
+            logging.debug(f"Evicted idle conversation for {key}")
+
+    def evict_idle(self):
+        """Remove conversations that have been idle longer than the timeout."""
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def _summary_message(summary):
+        return {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+
+    def _history_budget(self, system_prompt, summary):
+        """Tokens left for past turns once the system prompt and the summary are counted."""
+        budget = self.token_budget
+        if system_prompt:
+            budget -= message_tokens(system_prompt)
+        if summary:
+            budget -= message_tokens(self._summary_message(summary))
+        return budget
+
+    def build_messages(self, key, system_prompt, user_input):
+        """Build the message list for a request, fitting history into the token budget."""
+        user_message = {"role": "user", "content": user_input}
+
+        with self._lock:
+            self._evict()
+            conversation = self._get(key)
+            summary = conversation.summary
+            turns = list(conversation.turns)
+
+        messages = [system_prompt]
+        budget = self._history_budget(system_prompt, summary) - message_tokens(user_message)
+
+        if summary:
+            messages.append(self._summary_message(summary))
+
+        # Walk backwards from the newest turn and keep as many as fit
+        window = []
+        for turn in reversed(turns):
+            cost = message_tokens(turn)
+            if cost > budget:
+                break
+            budget -= cost
+            window.append(turn)
+
+        messages.extend(reversed(window))
+        messages.append(user_message)
+        return messages
+
+    def record(self, key, user_input, assistant_response, system_prompt=None):
+        """
+        Append a completed exchange and trim the stored history to the budget.
+        Pass the system prompt used with build_messages so both count the same tokens.
+        Trimmed turns are folded into the summary in the background.
+        """
+        with self._lock:
+            conversation = self._get(key)
+            conversation.turns.append({"role": "user", "content": user_input})
+            conversation.turns.append({"role": "assistant", "content": assistant_response})
+            dropped = self._trim(conversation, system_prompt)
+            if not dropped or not self.summarizer:
+                return
+            conversation.unsummarized.extend(dropped)
+            if conversation.summarizing:
+                # The running summarization picks these up when it is done
+                return
+            conversation.summarizing = True
+            if self._summary_pool is None:
+                self._summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS,
+                                                        thread_name_prefix='conversation-summary')
+            pool = self._summary_pool
+
+        pool.submit(self._summarize, key, conversation)
+
+    def _summarize(self, key, conversation):
+        """Fold a conversation's trimmed turns into its summary until none are left."""
+        while True:
+            with self._lock:
+                turns = conversation.unsummarized
+                if not turns or self._conversations.get(key) is not conversation:
+                    conversation.unsummarized = []
+                    conversation.summarizing = False
+                    return
+                conversation.unsummarized = []
+                previous_summary = conversation.summary
+
+            try:
+                summary = self.summarizer(previous_summary, turns)
+            except Exception as e:
+                # The turns stay out of the summary; the window no longer has them either
+                logging.warning(f"Failed to summarize conversation for {key}: {str(e)}")
+                continue
+            with self._lock:
+                conversation.summary = summary
+
+    def _trim(self, conversation, system_prompt=None):
+        """Remove the oldest turns that no longer fit the budget and return them."""
+        budget = self._history_budget(system_prompt, conversation.summary)
+        total = sum(message_tokens(turn) for turn in conversation.turns)
+        cut = 0
+        # Always drop user/assistant pairs so the window never starts mid-exchange
+        while total > budget and cut < len(conversation.turns) - 2:
+            total -= message_tokens(conversation.turns[cut]) + message_tokens(conversation.turns[cut + 1])
+            cut += 2
+        dropped = conversation.turns[:cut]
+        del conversation.turns[:cut]
+        return dropped
+
+    def clear(self, key):
+        """Forget the conversation for key."""
+        with self._lock:
+            self._conversations.pop(key, None)
+
+
+def make_summarizer(complete, model, max_tokens=300):
+    """
+    Create a summarizer that asks the model to fold old turns into the rolling summary.
+    `complete(messages, operation=..., model=..., **kwargs)` returns the reply text, e.g.
+    GroqAPI.get_completion, so summaries get the same timeouts, retries and metrics.
+    """
+    def summarize(previous_summary, turns):
+        transcript = '\n'.join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        if previous_summary:
+            transcript = f"Earlier summary: {previous_summary}\n{transcript}"
+
+        return complete(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript},
+            ],
+            operation="summarize",
+            model=model,
+            max_tokens=max_tokens,
+            temperature=0.3,
+        )
+
+    return summarize
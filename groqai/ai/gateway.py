@@ -0,0 +1,142 @@
+"""
+Admission control for upstream LLM calls.
+Bounds how many Groq requests run at once per worker and how many may wait for a
+slot, rejecting the rest immediately so slow upstream calls cannot starve the app.
+Meant to run under a green-thread worker (gunicorn -k eventlet) where waiting on a
+slot or on the network does not hold an OS thread.
+"""
+
+import os
+import time
+import logging
+import threading
+from .metrics import QUEUE_WAIT, GATEWAY_REJECTED, current_route
+
+
+class GatewayBusy(Exception):
+    """Raised when the gateway cannot admit a request."""
+
+    def __init__(self, message, status_code=503, retry_after=1):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMGateway:
+    """Bounded concurrency pool with a bounded wait queue in front of GroqAPI calls."""
+
+    def __init__(self, max_concurrency=None, max_queue=None, queue_timeout=None):
+        self.max_concurrency = max_concurrency or int(os.getenv('GROQ_GATEWAY_CONCURRENCY', 8))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('GROQ_GATEWAY_QUEUE', 32))
+        self.queue_timeout = queue_timeout or float(os.getenv('GROQ_GATEWAY_QUEUE_TIMEOUT', 10))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+
+    def stats(self):
+        """Return the current number of active and queued requests."""
+        with self._lock:
+            return {
+                'active': self._active,
+                'queued': self._waiting,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue
+            }
+
+    def acquire(self):
+        """Wait for a free slot, raising GatewayBusy if the queue is full or the wait times out."""
+        # Fast path: take a free slot without queueing
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self._active += 1
+            QUEUE_WAIT.observe(0.0, route=current_route())
+            return 0.0
+
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                logging.warning("LLM gateway queue is full, rejecting request")
+                GATEWAY_REJECTED.inc(route=current_route(), status='429')
+                raise GatewayBusy("Too many requests are waiting for the AI service. Please try again shortly.",
+                                  status_code=429, retry_after=int(self.queue_timeout))
+            self._waiting += 1
+
+        started = time.monotonic()
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        if not acquired:
+            logging.warning(f"LLM gateway slot wait timed out after {self.queue_timeout}s")
+            GATEWAY_REJECTED.inc(route=current_route(), status='503')
+            raise GatewayBusy("The AI service is busy. Please try again shortly.",
+                              status_code=503, retry_after=int(self.queue_timeout))
+
+        with self._lock:
+            self._active += 1
+        waited = time.monotonic() - started
+        QUEUE_WAIT.observe(waited, route=current_route())
+        return waited
+
+    def release(self):
+        """Give a slot back to the pool."""
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn inside a gateway slot."""
+        self.acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release()
+
+    def stream(self, iterator_fn, *args, **kwargs):
+        """
+        Admit a streaming call and return an iterator that holds the slot until it is exhausted.
+        Admission happens eagerly so GatewayBusy is raised before the response starts.
+        """
+        self.acquire()
+        try:
+            iterator = iter(iterator_fn(*args, **kwargs))
+        except Exception:
+            self.release()
+            raise
+        return _SlotIterator(self, iterator)
+
+
+class _SlotIterator:
+    """
+    Iterator that releases its gateway slot when exhausted or closed, whichever comes first.
+    Close it even if it is never iterated, e.g. from the response's close callback.
+    """
+
+    def __init__(self, gateway, iterator):
+        self._gateway = gateway
+        self._iterator = iterator
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            close = getattr(self._iterator, 'close', None)
+            if close:
+                close()
+        finally:
+            self._gateway.release()
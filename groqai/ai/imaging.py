@@ -0,0 +1,107 @@
+"""
+Image pre-processing for vision requests.
+Sniffs the real format of an upload, applies the EXIF orientation, downsizes to a
+maximum edge, strips metadata and re-encodes to a size-bounded JPEG or WebP, all on
+in-memory buffers.
+"""
+
+import io
+import os
+import base64
+import logging
+from PIL import Image, ImageOps
+
+# Formats the vision model accepts as-is when they need no resizing
+PASSTHROUGH_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+OUTPUT_FORMATS = {'jpeg': ('JPEG', 'image/jpeg'), 'webp': ('WEBP', 'image/webp')}
+
+# Quality steps tried in order until the encoded image fits the byte budget
+QUALITY_STEPS = (85, 75, 65, 55, 45)
+
+
+class PreparedImage:
+    """Result of pre-processing: encoded bytes, their MIME type and the size change."""
+
+    __slots__ = ('data', 'mime_type', 'original_size', 'width', 'height')
+
+    def __init__(self, data, mime_type, original_size, width=None, height=None):
+        self.data = data
+        self.mime_type = mime_type
+        self.original_size = original_size
+        self.width = width
+        self.height = height
+
+    @property
+    def saved_bytes(self):
+        return self.original_size - len(self.data)
+
+    def data_url(self):
+        """Return the image as a base64 data URL."""
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+
+def decode_image_payload(image_data):
+    """Turn a base64 string or data URL (as sent in JSON bodies) into raw bytes."""
+    if isinstance(image_data, str):
+        if image_data.startswith('data:') and ',' in image_data:
+            image_data = image_data.split(',', 1)[1]
+        return base64.b64decode(image_data)
+    return image_data
+
+
+def _encode(image, image_format, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def preprocess_image(image_data, max_edge=None, max_bytes=None, output_format=None):
+    """Downsize, strip metadata and re-encode an image so it fits the configured bounds."""
+    max_edge = max_edge or int(os.getenv('GROQ_IMAGE_MAX_EDGE', 1568))
+    max_bytes = max_bytes or int(os.getenv('GROQ_IMAGE_MAX_BYTES', 1000000))
+    output_format = (output_format or os.getenv('GROQ_IMAGE_FORMAT', 'jpeg')).lower()
+    pil_format, mime_type = OUTPUT_FORMATS.get(output_format, OUTPUT_FORMATS['jpeg'])
+
+    original_size = len(image_data)
+    image = Image.open(io.BytesIO(image_data))
+    source_format = image.format
+
+    # Already small, supported and free of metadata: send the original bytes
+    if (source_format in PASSTHROUGH_FORMATS
+            and max(image.size) <= max_edge
+            and original_size <= max_bytes
+            and not image.info.get('exif')):
+        return PreparedImage(image_data, PASSTHROUGH_FORMATS[source_format], original_size,
+                             image.width, image.height)
+
+    # Bake the EXIF orientation into the pixels before the metadata is dropped
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        if pil_format == 'JPEG':
+            # JPEG has no alpha channel: flatten onto white
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    data = None
+    while True:
+        for quality in QUALITY_STEPS:
+            data = _encode(image, pil_format, quality)
+            if len(data) <= max_bytes:
+                break
+        if len(data) <= max_bytes or max(image.size) <= 256:
+            break
+        # Still too big at the lowest quality: shrink further and retry
+        image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)), Image.LANCZOS)
+
+    prepared = PreparedImage(data, mime_type, original_size, image.width, image.height)
+    logging.info(
+        f"Pre-processed {source_format} image: {original_size} -> {len(data)} bytes "
+        f"({prepared.saved_bytes} saved), {image.width}x{image.height} {pil_format}"
+    )
+    return prepared
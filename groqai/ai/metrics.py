@@ -0,0 +1,326 @@
+"""
+Lightweight Prometheus-style metrics for the AI routes.
+Each worker process keeps counters, gauges and histograms in memory and periodically
+writes a snapshot of its cumulative values to a shared directory. A scrape of /metrics
+on any worker merges the snapshots of every worker spawned by the same gunicorn master,
+so the totals are correct no matter which worker answers.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Route label for metrics recorded while handling a request (set by the web layer)
+_current_route = contextvars.ContextVar('metrics_route', default='none')
+
+
+def set_route(route):
+    """Set the route label used by metrics recorded in the current context."""
+    _current_route.set(route or 'none')
+
+
+def current_route():
+    return _current_route.get()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            samples = [[list(key), value if not isinstance(value, list) else list(value)]
+                       for key, value in self._values.items()]
+        return {'type': self.kind, 'help': self.documentation, 'labels': list(self.labelnames), 'samples': samples}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # Layout: per-bucket counts (non-cumulative), then +Inf count, sum
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the wrapped block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class Registry:
+    """Process-local metrics plus callbacks that refresh gauges just before a snapshot."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collect_callback(self, callback):
+        """Register a callable run before every snapshot (e.g. to sample pool sizes into gauges)."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def snapshot(self):
+        for callback in list(self._callbacks):
+            try:
+                callback()
+            except Exception as e:
+                logging.debug(f"Metrics collect callback failed: {str(e)}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+class MultiProcessStore:
+    """Per-process snapshot files in a shared directory, merged at scrape time."""
+
+    def __init__(self, registry, directory=None, interval=None):
+        self.registry = registry
+        self.directory = directory or os.getenv(
+            'GROQ_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'airena-metrics'))
+        self.interval = interval or float(os.getenv('GROQ_METRICS_FLUSH_SECONDS', 5))
+        self._flusher = None
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, pid=None):
+        # Group files by parent so only workers of the current master are merged
+        return os.path.join(self.directory, f"metrics_{os.getppid()}_{pid or os.getpid()}.json")
+
+    def flush(self):
+        """Write this process's cumulative snapshot atomically."""
+        path = self._path()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def ensure_flusher(self):
+        """Start the background flush thread in this process (once per pid, safe after fork)."""
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._flusher.start()
+            atexit.register(self._safe_flush)
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logging.debug(f"Metrics flush failed: {str(e)}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._safe_flush()
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def collect(self):
+        """Merge the snapshots of every worker of this master into one."""
+        self._safe_flush()
+        prefix = f"metrics_{os.getppid()}_"
+        merged = {}
+        for filename in os.listdir(self.directory):
+            if not filename.startswith(prefix) or not filename.endswith('.json'):
+                continue
+            pid = int(filename[len(prefix):-len('.json')])
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = self._alive(pid)
+            for name, metric in snapshot.items():
+                # Gauges describe live state, so dead workers no longer contribute
+                if metric['type'] == 'gauge' and not alive:
+                    continue
+                target = merged.setdefault(name, {**metric, 'samples': {}})
+                for labels, value in metric['samples']:
+                    key = tuple(labels)
+                    if isinstance(value, list):
+                        current = target['samples'].get(key)
+                        target['samples'][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        target['samples'][key] = target['samples'].get(key, 0) + value
+        return merged
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [(name, value) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(merged):
+    """Render merged snapshots in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric['labels']
+        for labels, value in sorted(metric['samples'].items()):
+            if metric['type'] == 'histogram':
+                buckets = metric['buckets']
+                cumulative = 0
+                for bound, count in zip(buckets + [float('inf')], value[:-1]):
+                    cumulative += count
+                    le = ('le', _format_number(float(bound)))
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_number(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'airena_upstream_latency_seconds', 'Latency of upstream (Groq, speech recognition) calls including retries',
+    ('model', 'route', 'operation'))
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'airena_upstream_requests_total', 'Upstream calls by outcome',
+    ('model', 'route', 'operation', 'status'))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'airena_upstream_errors_total', 'Failed upstream calls by error class',
+    ('model', 'route', 'operation', 'error'))
+PROMPT_TOKENS = REGISTRY.counter(
+    'airena_prompt_tokens_total', 'Prompt tokens reported by Groq', ('model', 'route'))
+COMPLETION_TOKENS = REGISTRY.counter(
+    'airena_completion_tokens_total', 'Completion tokens reported by Groq', ('model', 'route'))
+QUEUE_WAIT = REGISTRY.histogram(
+    'airena_gateway_queue_wait_seconds', 'Time spent waiting for an LLM gateway slot', ('route',))
+GATEWAY_REJECTED = REGISTRY.counter(
+    'airena_gateway_rejected_total', 'Requests rejected by the LLM gateway', ('route', 'status'))
+AUDIO_CONVERSION = REGISTRY.histogram(
+    'airena_audio_conversion_seconds', 'Time to decode and resample uploaded audio', ('format',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'airena_response_cache_lookups_total', 'Response cache lookups by result', ('backend', 'result'))
+GATEWAY_ACTIVE = REGISTRY.gauge(
+    'airena_gateway_active', 'Groq calls currently holding a gateway slot')
+GATEWAY_QUEUED = REGISTRY.gauge(
+    'airena_gateway_queued', 'Requests currently waiting for a gateway slot')
+
+STORE = None
+
+
+def get_store():
+    """Return the process's multi-process store, creating it on first use."""
+    global STORE
+    if STORE is None:
+        STORE = MultiProcessStore(REGISTRY)
+    STORE.ensure_flusher()
+    return STORE
+
+
+def record_usage(model, usage):
+    """Count prompt/completion tokens from a response.usage object (or dict)."""
+    if usage is None:
+        return
+    route = current_route()
+    get = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, name, None)
+    prompt_tokens = get('prompt_tokens')
+    completion_tokens = get('completion_tokens')
+    if prompt_tokens:
+        PROMPT_TOKENS.inc(prompt_tokens, model=model, route=route)
+    if completion_tokens:
+        COMPLETION_TOKENS.inc(completion_tokens, model=model, route=route)
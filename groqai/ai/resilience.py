@@ -0,0 +1,229 @@
+"""
+Resilience layer for Groq calls.
+Adds per-call timeouts, bounded retries with exponential backoff and full jitter on
+429/5xx/connection errors, a circuit breaker that fails fast while the upstream is
+down, and optional hedged requests that fire a duplicate call once the first one has
+taken longer than the observed p95 latency.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import groq
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls are being short-circuited."""
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+class ResilienceConfig:
+    """Timeout, retry, breaker and hedging settings, read from the environment by default."""
+
+    def __init__(self, timeout=None, max_retries=None, backoff_base=None, backoff_max=None,
+                 breaker_threshold=None, breaker_reset=None, hedge=None, hedge_max_prompt_chars=None,
+                 hedge_min_samples=None):
+        env = os.getenv
+        self.timeout = timeout if timeout is not None else float(env('GROQ_TIMEOUT', 30))
+        self.max_retries = max_retries if max_retries is not None else int(env('GROQ_MAX_RETRIES', 2))
+        self.backoff_base = backoff_base if backoff_base is not None else float(env('GROQ_BACKOFF_BASE', 0.5))
+        self.backoff_max = backoff_max if backoff_max is not None else float(env('GROQ_BACKOFF_MAX', 8))
+        self.breaker_threshold = (breaker_threshold if breaker_threshold is not None
+                                  else int(env('GROQ_BREAKER_THRESHOLD', 5)))
+        self.breaker_reset = breaker_reset if breaker_reset is not None else float(env('GROQ_BREAKER_RESET', 30))
+        self.hedge = hedge if hedge is not None else _env_bool('GROQ_HEDGE', False)
+        self.hedge_max_prompt_chars = (hedge_max_prompt_chars if hedge_max_prompt_chars is not None
+                                       else int(env('GROQ_HEDGE_MAX_PROMPT_CHARS', 500)))
+        self.hedge_min_samples = (hedge_min_samples if hedge_min_samples is not None
+                                  else int(env('GROQ_HEDGE_MIN_SAMPLES', 20)))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe after the reset timeout."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold, reset_timeout, name='Groq API'):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._unavailable = f"{name} is temporarily unavailable, please try again shortly"
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not go upstream right now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(self._unavailable)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: let exactly one probe through
+            if self._probe_in_flight:
+                raise CircuitOpenError(self._unavailable)
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info("Groq circuit breaker closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"Groq circuit breaker opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct, min_samples=1):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+def is_retryable(error):
+    """Whether an upstream error is worth retrying (rate limits, server errors, network trouble)."""
+    if isinstance(error, (groq.APITimeoutError, groq.APIConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def _retry_after(error):
+    """Seconds the upstream asked us to wait, if it sent a Retry-After header."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientCaller:
+    """Runs upstream calls with timeouts, retries, a circuit breaker and optional hedging."""
+
+    def __init__(self, config=None, retryable=is_retryable, name='Groq'):
+        self.config = config or ResilienceConfig()
+        # retryable(error) -> whether the error means the upstream is struggling
+        self.retryable = retryable
+        self.name = name
+        self.breaker = CircuitBreaker(self.config.breaker_threshold, self.config.breaker_reset, f"{name} API")
+        self._latencies = {}
+        self._latencies_lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='groq-hedge')
+
+    def latency(self, operation):
+        with self._latencies_lock:
+            tracker = self._latencies.get(operation)
+            if tracker is None:
+                tracker = self._latencies[operation] = LatencyTracker()
+            return tracker
+
+    def backoff(self, attempt, error=None):
+        """Exponential backoff with full jitter, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.config.backoff_max))
+        return delay
+
+    def _attempt(self, fn, operation):
+        """One guarded upstream call; fn receives the per-call timeout."""
+        self.breaker.before_call()
+        started = time.monotonic()
+        try:
+            result = fn(self.config.timeout)
+        except Exception as e:
+            if self.retryable(e):
+                self.breaker.record_failure()
+            else:
+                # Client errors (bad request, auth) say nothing about upstream health
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        self.latency(operation).add(time.monotonic() - started)
+        return result
+
+    def _hedged_attempt(self, fn, operation):
+        """Run fn, firing one duplicate if the first call outlives the p95 latency."""
+        threshold = self.latency(operation).percentile(95, self.config.hedge_min_samples)
+        if threshold is None:
+            return self._attempt(fn, operation)
+
+        primary = self._hedge_pool.submit(self._attempt, fn, operation)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        logging.debug(f"Hedging {operation} call after {threshold:.3f}s")
+        try:
+            hedge = self._hedge_pool.submit(self._attempt, fn, operation)
+        except RuntimeError:
+            return primary.result()
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn, operation='chat', hedge=False):
+        """
+        Call fn(timeout) with retries and circuit breaking.
+        hedge=True allows a duplicate request when hedging is enabled in the config.
+        """
+        attempt = 0
+        while True:
+            try:
+                if hedge and self.config.hedge:
+                    return self._hedged_attempt(fn, operation)
+                return self._attempt(fn, operation)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not self.retryable(e) or attempt >= self.config.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                logging.warning(f"{self.name} {operation} call failed ({e.__class__.__name__}), "
+                                f"retrying in {delay:.2f}s ({attempt + 1}/{self.config.max_retries})")
+                time.sleep(delay)
+                attempt += 1
@@ -151,39 +151,112 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show typing indicator
         const typingIndicator = addMessage('Thinking...', 'system', true);
         
-        // Send message to server with agentic toggle status
+        // Send message to server with agentic toggle status and stream the reply
         fetch('/chat', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
             },
-            body: JSON.stringify({ 
+            body: JSON.stringify({
                 message: message,
-                use_agent: agenticToggle.checked
+                use_agent: agenticToggle.checked,
+                stream: true
             }),
         })
-        .then(response => response.json())
-        .then(data => {
-            // Remove typing indicator
-            chatMessages.removeChild(typingIndicator);
-            
-            // Add assistant response to chat
-            addMessage(data.response, 'assistant');
-            
-            // Speak the response if text-to-speech is enabled
-            if (textToSpeechToggle.checked && audioFeaturesAvailable) {
-                speakText(data.response);
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error(`Request failed with status ${response.status}`);
             }
+
+            let messageDiv = null;
+            let fullText = '';
+
+            return readEventStream(response, (event, data) => {
+                if (event === 'error') {
+                    throw new Error(data.error);
+                }
+                if (event !== 'message' || !data.token) return;
+
+                // Replace the typing indicator with the assistant message on the first token
+                if (!messageDiv) {
+                    chatMessages.removeChild(typingIndicator);
+                    messageDiv = addMessage('', 'assistant', false, false);
+                }
+                fullText += data.token;
+                renderMessageText(messageDiv, fullText);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }).then(() => {
+                if (!messageDiv) {
+                    chatMessages.removeChild(typingIndicator);
+                    messageDiv = addMessage('', 'assistant', false, false);
+                }
+
+                // Add completed response to history
+                messageHistory.push({
+                    sender: 'assistant',
+                    text: fullText
+                });
+
+                // Speak the response if text-to-speech is enabled
+                if (textToSpeechToggle.checked && audioFeaturesAvailable) {
+                    speakText(fullText);
+                }
+            });
         })
         .catch(error => {
             // Remove typing indicator
-            chatMessages.removeChild(typingIndicator);
-            
+            if (typingIndicator.parentNode) {
+                chatMessages.removeChild(typingIndicator);
+            }
+
             // Add error message to chat
             addMessage('An error occurred while processing your request. Please try again.', 'system');
             console.error('Error:', error);
         });
     }
+
+    // Function to read a Server-Sent Events response body, calling onEvent(event, data) per event
+    function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        function dispatch(block) {
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trimStart());
+                }
+            });
+            if (dataLines.length === 0) return;
+            onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    if (buffer.trim()) dispatch(buffer);
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    dispatch(block);
+                }
+                return pump();
+            });
+        }
+
+        return pump();
+    }
     
     // Function to toggle voice recording
     function toggleRecording() {
@@ -403,9 +476,9 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Function to add message to chat
-    function addMessage(text, sender, isTyping = false) {
+    function addMessage(text, sender, isTyping = false, recordHistory = true) {
         const messageDiv = document.createElement('div');
-        
+
         if (isTyping) {
             // Create typing indicator
             messageDiv.className = 'message system-message';
@@ -413,19 +486,15 @@ document.addEventListener('DOMContentLoaded', function() {
         } else {
             // Create normal message
             messageDiv.className = `message ${sender}-message`;
-            
-            // Handle newlines and URLs in messages
-            const formattedText = text
-                .replace(/\n/g, '<br>')
-                .replace(/(https?:\/\/[^\s]+)/g, '<a href="$1" target="_blank">$1</a>');
-            
-            messageDiv.innerHTML = formattedText;
-            
+            renderMessageText(messageDiv, text);
+
             // Add message to history
-            messageHistory.push({
-                sender: sender,
-                text: text
-            });
+            if (recordHistory) {
+                messageHistory.push({
+                    sender: sender,
+                    text: text
+                });
+            }
         }
         
         chatMessages.appendChild(messageDiv);
@@ -436,6 +505,13 @@ document.addEventListener('DOMContentLoaded', function() {
         return messageDiv;
     }
     
+    // Function to render message text, handling newlines and URLs
+    function renderMessageText(messageDiv, text) {
+        messageDiv.innerHTML = text
+            .replace(/\n/g, '<br>')
+            .replace(/(https?:\/\/[^\s]+)/g, '<a href="$1" target="_blank">$1</a>');
+    }
+
     // Function to speak text using browser's speech synthesis
     function speakText(text) {
         if (!audioFeaturesAvailable) return;
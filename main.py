@@ -1,12 +1,19 @@
 import os
+import json
+import hashlib
 import logging
+from datetime import datetime, timedelta
 import importlib.util
-from flask import Flask, render_template, url_for, request, jsonify, send_from_directory, redirect, flash
+from flask import Flask, render_template, url_for, request, jsonify, send_from_directory, redirect, flash, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_mail import Mail, Message
 from groqai.ai.api import GroqAPI
+from groqai.ai.gateway import LLMGateway, GatewayBusy
+from groqai.ai.batch import BatchVisionRunner
+from groqai.ai import metrics
 from models import db, User, PasswordResetToken
+from quiz.sessions import QuizAttemptError
 from auth import auth as auth_blueprint
 
 # Configure logging for easier debugging
@@ -23,7 +30,7 @@ logging.basicConfig(
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///airena.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///airena.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.urandom(24)
 
@@ -64,14 +71,64 @@ try:
 except ImportError:
     logging.warning("screenpipe module not found, screen recording functionality will not be available")
 
+# Bound concurrent and queued upstream AI calls per worker
+llm_gateway = LLMGateway()
+
 # Initialize Groq API
 try:
-    groq_api = GroqAPI()
+    groq_api = GroqAPI(gateway=llm_gateway)
     logging.info("Groq API initialized successfully")
 except Exception as e:
     logging.error(f"Failed to initialize Groq API: {str(e)}")
     groq_api = None
 
+# Optionally top up the quiz bank with model-written questions in the background
+if groq_api and os.getenv('QUIZ_GENERATOR_ENABLED', 'false').lower() == 'true':
+    from quiz.generator import start_background_generator
+    start_background_generator(groq_api)
+
+# Fan out batched vision requests; each item still goes through the gateway
+vision_batch = BatchVisionRunner(
+    lambda image_data, prompt: llm_gateway.call(groq_api.describe_image, image_data, prompt)
+)
+
+def sample_gateway_metrics():
+    """Copy the gateway's live pool sizes into the metrics gauges."""
+    stats = llm_gateway.stats()
+    metrics.GATEWAY_ACTIVE.set(stats['active'])
+    metrics.GATEWAY_QUEUED.set(stats['queued'])
+
+metrics.REGISTRY.add_collect_callback(sample_gateway_metrics)
+
+@app.before_request
+def label_request_metrics():
+    """Tag metrics recorded during this request with its route."""
+    metrics.set_route(request.endpoint)
+    metrics.get_store()
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose AI call metrics, aggregated across workers, in Prometheus text format."""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    body = metrics.render_prometheus(metrics.get_store().collect())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.errorhandler(GatewayBusy)
+def handle_gateway_busy(e):
+    """Reject requests the LLM gateway cannot admit."""
+    response = jsonify({'success': False, 'error': e.message})
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@app.errorhandler(QuizAttemptError)
+def handle_quiz_attempt_error(e):
+    """Report invalid quiz attempt requests."""
+    return jsonify({'success': False, 'message': e.message}), e.status_code
+
 @app.route('/')
 def index():
     """Render the main application page."""
@@ -109,6 +166,37 @@ def game():
     """Render the space shooter game page."""
     return render_template('game.html')
 
+def wants_stream(data):
+    """Check whether the client asked for a Server-Sent Events response."""
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def stream_chat(message, use_agent):
+    """Stream a chat response to the browser as Server-Sent Events."""
+    # Admit the request before the response starts so a full gateway can still answer 429/503
+    tokens = llm_gateway.stream(groq_api.stream_chat_response, message, use_agent, current_user.id)
+
+    def generate():
+        try:
+            for token in tokens:
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            logging.error(f"Error while streaming chat response: {str(e)}")
+            error = f"An error occurred while generating a response: {str(e)}"
+            yield f"event: error\ndata: {json.dumps({'error': error})}\n\n"
+        finally:
+            tokens.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # A client that disconnects before the first token never runs generate()'s finally;
+    # the server still closes the response, and closing twice is harmless
+    response.call_on_close(tokens.close)
+    return response
+
 # API endpoints for the Groq AI chat functionality
 @app.route('/api/groq/chat', methods=['POST'])
 @login_required
@@ -118,8 +206,11 @@ def groq_chat():
     message = data.get('message', '')
     use_agent = data.get('use_agent', False)
     
+    if wants_stream(data):
+        return stream_chat(message, use_agent)
+    
     # Call the actual Groq API using our implementation
-    response = groq_api.get_chat_response(message, use_agent)
+    response = llm_gateway.call(groq_api.get_chat_response, message, use_agent, current_user.id)
     
     return jsonify({
         'success': True,
@@ -143,13 +234,64 @@ def groq_vision():
     prompt = request.json.get('prompt', 'What is in this image?') if 'image' in request.json else 'What is in this image?'
     
     # Process the image using Groq API
-    description = groq_api.process_image(image_data)
+    description = llm_gateway.call(groq_api.process_image, image_data, prompt)
     
     return jsonify({
         'success': True,
         'response': description
     })
 
+@app.route('/api/groq/vision/batch', methods=['POST'])
+@login_required
+def groq_vision_batch():
+    """Describe many images in one request, concurrently."""
+    data = request.get_json(silent=True) or {}
+    
+    if request.files:
+        # Multipart upload: one or more files under the "images" field
+        images = [image_file.read() for image_file in request.files.getlist('images')]
+        prompt = request.form.get('prompt', 'What is in this image?')
+        stream = request.form.get('stream', 'false').lower() == 'true'
+    else:
+        # JSON body: {"images": [<base64 or data URL>, ...]}
+        images = data.get('images', [])
+        prompt = data.get('prompt', 'What is in this image?')
+        stream = bool(data.get('stream', False))
+    
+    if not images:
+        return jsonify({'error': 'No images provided'}), 400
+    if len(images) > vision_batch.max_items:
+        return jsonify({'error': f'A batch can contain at most {vision_batch.max_items} images'}), 400
+    
+    if stream:
+        # Emit one NDJSON line per image as soon as it is described
+        results = vision_batch.iter_completed(images, prompt)
+        return Response(
+            stream_with_context(json.dumps(result) + '\n' for result in results),
+            mimetype='application/x-ndjson',
+            headers={'X-Accel-Buffering': 'no'}
+        )
+    
+    results = vision_batch.run(images, prompt)
+    
+    return jsonify({
+        'success': all(result['success'] for result in results),
+        'results': results
+    })
+
+@app.route('/api/groq/cache-stats')
+@login_required
+def groq_cache_stats():
+    """Report hit/miss counters for the Groq response cache."""
+    if not groq_api or not groq_api.cache:
+        return jsonify({'success': True, 'enabled': False})
+    
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'stats': groq_api.cache.stats()
+    })
+
 @app.route('/api/groq/speech-to-text', methods=['POST'])
 @login_required
 def groq_stt():
@@ -161,10 +303,10 @@ def groq_stt():
     audio_data = audio_file.read()
     
     # Convert speech to text using Groq API
-    text = groq_api.speech_to_text(audio_data)
+    text = llm_gateway.call(groq_api.speech_to_text, audio_data)
     
     # Get response from Groq API based on the text
-    response = groq_api.get_chat_response(text, False)
+    response = llm_gateway.call(groq_api.get_chat_response, text, False, current_user.id)
     
     return jsonify({
         'success': True,
@@ -198,8 +340,11 @@ def chat():
     if not user_input:
         return jsonify({'error': 'No message provided'}), 400
     
+    if wants_stream(data):
+        return stream_chat(user_input, use_agent)
+    
     # Get response from Groq API
-    response = groq_api.get_chat_response(user_input, use_agent)
+    response = llm_gateway.call(groq_api.get_chat_response, user_input, use_agent, current_user.id)
     
     return jsonify({'response': response})
 
@@ -214,10 +359,10 @@ def speech_to_text():
     audio_data = audio_file.read()
     
     # Convert speech to text using Groq API
-    text = groq_api.speech_to_text(audio_data)
+    text = llm_gateway.call(groq_api.speech_to_text, audio_data)
     
     # Get response from Groq API based on the text
-    response = groq_api.get_chat_response(text, False)
+    response = llm_gateway.call(groq_api.get_chat_response, text, False, current_user.id)
     
     return jsonify({
         'text': text,
@@ -235,7 +380,7 @@ def process_image():
     image_data = image_file.read()
     
     # Process the image using Groq API
-    description = groq_api.process_image(image_data)
+    description = llm_gateway.call(groq_api.process_image, image_data)
     
     return jsonify({'description': description})
 
@@ -250,42 +395,100 @@ def process_audio():
     audio_data = audio_file.read()
     
     # Process the audio using Groq API
-    result = groq_api.process_audio(audio_data)
+    result = llm_gateway.call(groq_api.process_audio, audio_data, current_user.id)
     
     return jsonify(result)
 
+# Seconds shared caches may keep a seeded quiz or the genre list
+QUIZ_CACHE_MAX_AGE = int(os.getenv('QUIZ_CACHE_MAX_AGE', 300))
+
+def cacheable_json(payload, max_age=0, public=False):
+    """JSON response with a strong ETag that answers a matching If-None-Match with 304."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    etag = hashlib.sha256(body.encode('utf-8')).hexdigest()
+    
+    if max_age:
+        cache_control = f"{'public' if public else 'private'}, max-age={max_age}"
+    else:
+        # Cache but revalidate every time, which is cheap thanks to the ETag
+        cache_control = f"{'public' if public else 'private'}, no-cache"
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def resolve_quiz_seed(seed):
+    """Expand the 'daily' seed to today's date; returns the seed and how long the quiz may be cached."""
+    if seed == 'daily':
+        now = datetime.utcnow()
+        tomorrow = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        return now.strftime('daily-%Y-%m-%d'), max(1, min(QUIZ_CACHE_MAX_AGE, int((tomorrow - now).total_seconds())))
+    return seed, QUIZ_CACHE_MAX_AGE
+
+def quiz_response(topic, question_count, difficulty=None, tags=None, seed=None):
+    """
+    Build the quiz API response; seeded quizzes are deterministic and cacheable.
+    Ranked attempts draw from the same questions, so no copy carries the answer key.
+    """
+    from quiz.quiz_fluvio import generate_quiz
+    
+    max_age = 0
+    if seed not in (None, ''):
+        seed, max_age = resolve_quiz_seed(str(seed))
+    
+    # Generate quiz from our quiz_fluvio module
+    quiz_data = generate_quiz(topic, question_count, difficulty, tags, seed)
+    
+    if not quiz_data:
+        return jsonify({
+            'success': False,
+            'message': f'No questions available for topic: {topic}'
+        })
+    
+    quiz_data['questions'] = [
+        {'question': question['question'], 'options': question['options']}
+        for question in quiz_data['questions']
+    ]
+    payload = {
+        'success': True,
+        'quiz': quiz_data
+    }
+    
+    if max_age:
+        payload['seed'] = seed
+        return cacheable_json(payload, max_age=max_age, public=True)
+    
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/api/fluvio/generate-quiz', methods=['POST'])
 @login_required
 def generate_quiz():
     """Generate a quiz based on selected topics."""
     try:
-        from quiz.quiz_fluvio import generate_quiz, list_available_genres
+        from quiz.quiz_fluvio import list_available_genres
         
         data = request.json
         topic = data.get('topic', ' ')
         question_count = data.get('count', 5)
+        difficulty = data.get('difficulty')
+        tags = data.get('tags')
+        seed = data.get('seed')
         
         # If requesting available topics
         if topic == 'list_genres':
             genres = list_available_genres()
-            return jsonify({
+            return cacheable_json({
                 'success': True,
                 'genres': genres
             })
         
-        # Generate quiz from our quiz_fluvio module
-        quiz_data = generate_quiz(topic, question_count)
-        
-        if not quiz_data:
-            return jsonify({
-                'success': False,
-                'message': f'No questions available for topic: {topic}'
-            })
-        
-        return jsonify({
-            'success': True,
-            'quiz': quiz_data
-        })
+        return quiz_response(topic, question_count, difficulty, tags, seed)
     except ImportError:
         logging.warning("quiz.quiz_fluvio module not found, quiz functionality will be limited")
         return jsonify({
@@ -293,6 +496,141 @@ def generate_quiz():
             'message': 'Quiz functionality is not available'
         })
 
+@app.route('/api/fluvio/genres', methods=['GET'])
+@login_required
+def list_quiz_genres():
+    """List quiz genres; answers 304 when the client's copy is current."""
+    from quiz.quiz_fluvio import list_available_genres
+    
+    return cacheable_json({
+        'success': True,
+        'genres': list_available_genres()
+    }, max_age=60, public=True)
+
+@app.route('/api/fluvio/quiz', methods=['GET'])
+@login_required
+def get_quiz():
+    """Cacheable GET variant of generate-quiz, e.g. /api/fluvio/quiz?topic=science&seed=daily"""
+    tags = request.args.get('tags')
+    return quiz_response(
+        request.args.get('topic', ' '),
+        request.args.get('count', 5, type=int),
+        request.args.get('difficulty'),
+        tags.split(',') if tags else None,
+        request.args.get('seed')
+    )
+
+@app.route('/api/fluvio/bulk-quiz', methods=['POST'])
+@login_required
+def bulk_quiz():
+    """Generate many quizzes in one call, streamed as NDJSON (one quiz per line)."""
+    from quiz.bulk import MAX_QUESTIONS, MAX_QUIZZES, known_genres, generate_quizzes, iter_ndjson, without_answers
+    
+    data = request.json or {}
+    topics = data.get('topics') or [data.get('topic')]
+    genres = known_genres(topic for topic in topics if topic)
+    if not genres:
+        return jsonify({'success': False, 'message': 'No questions available for the requested topics'}), 400
+    
+    quiz_total = data.get('quizzes', 1)
+    if not isinstance(quiz_total, int) or not 1 <= quiz_total <= MAX_QUIZZES:
+        return jsonify({'success': False, 'message': f'quizzes must be between 1 and {MAX_QUIZZES}'}), 400
+    
+    question_count = data.get('count', 5)
+    if not isinstance(question_count, int) or isinstance(question_count, bool) or question_count < 1:
+        return jsonify({'success': False, 'message': 'count must be a positive integer'}), 400
+    question_count = min(question_count, MAX_QUESTIONS)
+    
+    quizzes = generate_quizzes(genres, quiz_total, question_count, bool(data.get('balanced')), data.get('seed'))
+    return Response(stream_with_context(iter_ndjson(without_answers(quizzes))), mimetype='application/x-ndjson')
+
+@app.route('/api/fluvio/attempts', methods=['POST'])
+@login_required
+def start_quiz_attempt():
+    """Start a scored quiz; the answer key stays on the server."""
+    from quiz.sessions import MAX_QUESTIONS, start_attempt
+    
+    data = request.json or {}
+    question_count = data.get('count', 5)
+    if not isinstance(question_count, int) or isinstance(question_count, bool) or question_count < 1:
+        return jsonify({'success': False, 'message': 'count must be a positive integer'}), 400
+    question_count = min(question_count, MAX_QUESTIONS)
+    
+    seed = data.get('seed')
+    if seed not in (None, ''):
+        # Same expansion as the GET endpoint, so seed=daily matches the shared quiz
+        seed, _ = resolve_quiz_seed(str(seed))
+    quiz_data = start_attempt(
+        current_user.id,
+        data.get('topic', ' '),
+        question_count,
+        data.get('difficulty'),
+        data.get('tags'),
+        seed,
+        data.get('replay')
+    )
+    
+    return jsonify({
+        'success': True,
+        'quiz': quiz_data
+    })
+
+@app.route('/api/fluvio/attempts/<int:attempt_id>/answer', methods=['POST'])
+@login_required
+def answer_quiz_question(attempt_id):
+    """Record one answer and return the correct option."""
+    from quiz.sessions import answer_question
+    
+    data = request.json or {}
+    result = answer_question(current_user.id, attempt_id, data.get('question'), data.get('selected'))
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/fluvio/attempts/<int:attempt_id>/finish', methods=['POST'])
+@login_required
+def finish_quiz_attempt(attempt_id):
+    """Score a quiz attempt and return the player's leaderboard ranks."""
+    from quiz.sessions import finish_attempt
+    
+    result = finish_attempt(current_user.id, attempt_id)
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/fluvio/leaderboard', methods=['GET'])
+@login_required
+def quiz_leaderboard():
+    """Top players globally or for one genre, plus the current user's rank."""
+    from quiz.leaderboard import GLOBAL, get_top, get_rank
+    
+    genre = request.args.get('genre', GLOBAL)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    rank, score = get_rank(current_user.id, genre)
+    
+    return jsonify({
+        'success': True,
+        'genre': genre,
+        'top': get_top(genre, limit),
+        'me': {'rank': rank, 'score': score}
+    })
+
+@app.route('/api/fluvio/search', methods=['GET'])
+@login_required
+def search_quiz_questions():
+    """Keyword search in the compiled question bank."""
+    from quiz.quiz_fluvio import search_questions
+    
+    keyword = request.args.get('q', '').strip()
+    if not keyword:
+        return jsonify({'success': False, 'message': 'Missing search keyword'}), 400
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    results = search_questions(keyword, request.args.get('genre'), limit)
+    
+    return jsonify({
+        'success': True,
+        'results': results
+    })
+
 @app.route('/api/game/create', methods=['POST'])
 @login_required
 def create_game():
@@ -43,4 +43,69 @@ class PasswordResetToken(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(hours=1))
     
-    user = db.relationship('User', backref=db.backref('reset_tokens', lazy=True)) 
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('reset_tokens', lazy=True)) 
+
+class QuizAttempt(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    genre = db.Column(db.String(50), nullable=False)
+    seed = db.Column(db.String(100))
+    # Questions as served, including the answer key, as JSON; never sent to the client whole
+    questions = db.Column(db.Text, nullable=False)
+    question_count = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    
+    user = db.relationship('User', backref=db.backref('quiz_attempts', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_user_started', 'user_id', 'started_at'),
+    )
+
+class QuizAnswer(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id'), nullable=False)
+    question_index = db.Column(db.Integer, nullable=False)
+    selected = db.Column(db.Integer, nullable=False)
+    is_correct = db.Column(db.Boolean, nullable=False)
+    answered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    attempt = db.relationship('QuizAttempt', backref=db.backref('answers', lazy=True))
+    
+    __table_args__ = (
+        db.UniqueConstraint('attempt_id', 'question_index', name='uq_quiz_answer_question'),
+    )
+
+class QuizServedQuestion(db.Model):
+    """The attempt that first served a question to a user; only that attempt can score it on the boards."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    genre = db.Column(db.String(50), nullable=False)
+    # SHA-256 of the normalized question text, so reshuffled options still match
+    question_key = db.Column(db.String(64), nullable=False)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id'), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'genre', 'question_key', name='uq_quiz_served_question'),
+        db.Index('ix_quiz_served_attempt', 'attempt_id'),
+    )
+
+class LeaderboardEntry(db.Model):
+    """Running totals per user and genre; genre '' holds the global board."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    genre = db.Column(db.String(50), nullable=False, default='')
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    user = db.relationship('User', backref=db.backref('leaderboard_entries', lazy=True))
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'genre', name='uq_leaderboard_user_genre'),
+        # Covering index for ranking: top-K and "scores above mine" never touch the table
+        db.Index('ix_leaderboard_rank', 'genre', 'total_score', 'user_id'),
+        # Lets workers pull only the rows changed since their last sync
+        db.Index('ix_leaderboard_updated', 'genre', 'updated_at'),
+    )
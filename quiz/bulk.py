@@ -0,0 +1,215 @@
+"""
+Bulk quiz generation for tournaments and classrooms.
+Produces many quizzes in one pass instead of one request per participant: question picks
+and option shuffles are drawn for a whole chunk of quizzes at once (vectorized with NumPy
+when it is installed, plain `random` otherwise) and quizzes are yielded one at a time so
+large batches stream as NDJSON without ever being held in memory.
+
+Questions never repeat within a quiz. With balanced=True every question of a genre is
+used once before any question is used again, so coverage across the batch is even.
+
+    python -m quiz.bulk --genre science --genre history --quizzes 500 --count 10 --balanced > quizzes.ndjson
+"""
+
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional; the stdlib path gives the same guarantees, just slower
+    np = None
+
+from quiz.quiz_fluvio import BANK, OPTIONS_PER_QUESTION, get_store
+from quiz.question_store import genre_bucket
+
+# Upper limit on quizzes per bulk API call
+MAX_QUIZZES = int(os.getenv('QUIZ_BULK_MAX', 1000))
+
+# Upper limit on questions per quiz in a bulk API call
+MAX_QUESTIONS = int(os.getenv('QUIZ_BULK_MAX_COUNT', 50))
+
+# Quizzes drawn per vectorized batch; bounds memory use regardless of the batch size
+CHUNK_SIZE = 64
+
+# Largest quizzes x bank-size matrix drawn in one go before falling back to per-quiz draws
+MAX_MATRIX_CELLS = 4_000_000
+
+
+class GenrePool:
+    """One genre's questions addressed by dense position, from memory or the compiled bank."""
+
+    def __init__(self, genre, store=None):
+        self.genre = genre
+        self.store = store
+        self._bank = None
+        if store:
+            self.bucket = genre_bucket(genre)
+            self.size = store.count(self.bucket)
+        else:
+            self._bank = BANK.get(genre)
+            self.size = len(self._bank) if self._bank else 0
+
+    def fetch(self, positions):
+        """Return {position: question} for the given positions."""
+        positions = set(positions)
+        if self._bank is not None:
+            return {position: self._bank.question(position) for position in positions}
+        # Keyed by the slot each row came from, so a missing slot cannot shift the others
+        return self.store.slot_questions(self.bucket, positions)
+
+
+class Sampler:
+    """Random draws for whole chunks of quizzes, seeded for reproducible batches."""
+
+    def __init__(self, seed=None):
+        if np is not None:
+            if seed is not None:
+                # Hash string seeds so every process derives the same generator
+                seed = int.from_bytes(hashlib.sha256(str(seed).encode('utf-8')).digest()[:8], 'big')
+            self._np = np.random.default_rng(seed)
+        else:
+            self._random = random.Random(seed)
+
+    def picks(self, size, count, quizzes):
+        """`quizzes` rows of `count` distinct positions in range(size)."""
+        if np is None:
+            return [self._random.sample(range(size), count) for _ in range(quizzes)]
+        if size * quizzes <= MAX_MATRIX_CELLS:
+            # One random key per (quiz, question); the `count` smallest keys of a row are its picks
+            keys = self._np.random((quizzes, size))
+            return np.argpartition(keys, count - 1, axis=1)[:, :count].tolist()
+        return [self._np.choice(size, count, replace=False).tolist() for _ in range(quizzes)]
+
+    def permutation(self, size):
+        if np is None:
+            order = list(range(size))
+            self._random.shuffle(order)
+            return order
+        return self._np.permutation(size).tolist()
+
+    def option_orders(self, quizzes, count):
+        """Option order for every question of every quiz; index 0 is the correct answer."""
+        if np is None:
+            return [[self._random.sample(range(OPTIONS_PER_QUESTION), OPTIONS_PER_QUESTION)
+                     for _ in range(count)] for _ in range(quizzes)]
+        return self._np.random((quizzes, count, OPTIONS_PER_QUESTION)).argsort(axis=2).tolist()
+
+
+class BalancedStream:
+    """Deals positions from successive permutations so every question is used equally often."""
+
+    def __init__(self, size, sampler):
+        self.size = size
+        self.sampler = sampler
+        self._order = []
+        self._cursor = 0
+
+    def take(self, count):
+        taken = self._order[self._cursor:self._cursor + count]
+        self._cursor += len(taken)
+        if len(taken) < count:
+            # Start the next round, dealing the questions already in this quiz last
+            order = self.sampler.permutation(self.size)
+            held = set(taken)
+            self._order = [p for p in order if p not in held] + [p for p in order if p in held]
+            self._cursor = count - len(taken)
+            taken += self._order[:self._cursor]
+        return taken
+
+
+def known_genres(genres):
+    """Filter requested genres down to the ones that have questions, keeping order."""
+    store = get_store()
+    available = set(store.genres() if store else BANK.genres())
+    return [genre for genre in dict.fromkeys(genres) if genre in available]
+
+
+def _format_quiz(index, genre, positions, orders, questions):
+    formatted_questions = []
+    for position, order in zip(positions, orders):
+        question = questions[position]
+        options = [question['correct']] + question['wrong']
+        formatted_questions.append({
+            'question': question['question'],
+            'options': [options[i] for i in order],
+            'correct': order.index(0)
+        })
+    return {
+        'index': index,
+        'topic': genre.capitalize(),
+        'questions': formatted_questions
+    }
+
+
+def generate_quizzes(genres, quizzes, question_count=5, balanced=False, seed=None):
+    """
+    Yield `quizzes` quizzes, assigned to the genres round-robin.
+    Each quiz has the same shape as generate_quiz() plus its index in the batch.
+    """
+    store = get_store()
+    pools = [pool for pool in (GenrePool(genre, store) for genre in genres) if pool.size]
+    if not pools:
+        return
+
+    sampler = Sampler(seed)
+    streams = [BalancedStream(pool.size, sampler) for pool in pools]
+
+    for start in range(0, quizzes, CHUNK_SIZE):
+        chunk = range(start, min(quizzes, start + CHUNK_SIZE))
+        ready = {}
+        for pool_index, pool in enumerate(pools):
+            indices = [index for index in chunk if index % len(pools) == pool_index]
+            if not indices:
+                continue
+            count = min(max(question_count, 1), pool.size)
+            if balanced:
+                rows = [streams[pool_index].take(count) for _ in indices]
+            else:
+                rows = sampler.picks(pool.size, count, len(indices))
+            # One lookup for every question used in this chunk
+            questions = pool.fetch(position for row in rows for position in row)
+            orders = sampler.option_orders(len(indices), count)
+            for index, row, row_orders in zip(indices, rows, orders):
+                ready[index] = _format_quiz(index, pool.genre, row, row_orders, questions)
+        for index in chunk:
+            yield ready.pop(index)
+
+
+def without_answers(quizzes):
+    """Quizzes as the API serves them: questions and options, no answer key."""
+    for quiz in quizzes:
+        quiz['questions'] = [{'question': question['question'], 'options': question['options']}
+                             for question in quiz['questions']]
+        yield quiz
+
+
+def iter_ndjson(quizzes):
+    """Serialize quizzes as newline-delimited JSON, one quiz per line."""
+    for quiz in quizzes:
+        yield json.dumps(quiz) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate many Fluvio quizzes at once as NDJSON.')
+    parser.add_argument('--genre', action='append', required=True, help='Genre to draw from (repeatable)')
+    parser.add_argument('--quizzes', type=int, default=10, help='Number of quizzes to generate')
+    parser.add_argument('--count', type=int, default=5, help='Questions per quiz')
+    parser.add_argument('--balanced', action='store_true', help='Spread question usage evenly across the batch')
+    parser.add_argument('--seed', help='Seed for a reproducible batch')
+    args = parser.parse_args()
+
+    genres = known_genres(args.genre)
+    if not genres:
+        print(f"No questions available for: {', '.join(args.genre)}", file=sys.stderr)
+        return 1
+    sys.stdout.writelines(iter_ndjson(generate_quizzes(genres, args.quizzes, args.count, args.balanced, args.seed)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Background question generator for Fluvio Quiz.
+Asks the Groq chat model for new multiple-choice questions per genre, validates them into
+the bank's Question|Correct|Wrong1|Wrong2|Wrong3 line format, drops near-duplicates by
+normalized hash and appends the rest to the genre files, where the in-memory bank picks
+them up on its next reload; a compiled bank gets the same questions added in place. It
+runs from the command line or as a daemon thread; quiz requests only ever read the bank
+and never wait on the model.
+
+    python -m quiz.generator --genre science --target 300 --workers 4 --rpm 30
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from quiz.quiz_fluvio import QUESTIONS_DIR, list_available_genres
+
+# Questions requested per model call
+BATCH_SIZE = int(os.getenv('QUIZ_GENERATOR_BATCH', 10))
+
+# Genres are topped up until they hold at least this many questions
+TARGET = int(os.getenv('QUIZ_GENERATOR_TARGET', 200))
+
+# Model calls per minute across all generator threads
+RATE_PER_MINUTE = float(os.getenv('QUIZ_GENERATOR_RPM', 20))
+
+# Concurrent model calls
+WORKERS = int(os.getenv('QUIZ_GENERATOR_WORKERS', 2))
+
+# Seconds between top-up rounds of the background thread
+INTERVAL = float(os.getenv('QUIZ_GENERATOR_INTERVAL', 3600))
+
+MAX_QUESTION_CHARS = 300
+MAX_OPTION_CHARS = 120
+
+# Existing questions shown to the model so it steers away from them
+EXAMPLES_IN_PROMPT = 15
+
+PROMPT = """Write {count} new multiple-choice trivia questions about {genre}.
+Each question has exactly one correct answer and three plausible but wrong answers.
+Keep questions under 200 characters and answers under 60 characters.
+Do not repeat or rephrase any of these existing questions:
+{examples}
+
+Reply with JSON only, in this shape:
+{{"questions": [{{"question": "...", "correct": "...", "wrong": ["...", "...", "..."]}}]}}"""
+
+# Words that do not change what a question asks
+_STOPWORDS = frozenset((
+    'a', 'an', 'the', 'of', 'is', 'are', 'was', 'were', 'what', 'which', 'who', 'in', 'on',
+    'for', 'to', 'by', 'as', 'called', 'known', 'does', 'do', 'did'
+))
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def question_hash(text):
+    """Hash of a question's significant words, so rewordings and reorderings collide."""
+    words = sorted({word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS})
+    return hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()[:16]
+
+
+def _clean(value):
+    if not isinstance(value, str):
+        return ''
+    # The bank is pipe-delimited and line-based
+    return ' '.join(value.replace('|', '/').split())
+
+
+def to_line(item):
+    """Validate one generated question and return its bank line, or None if it is unusable."""
+    if not isinstance(item, dict) or not isinstance(item.get('wrong'), list):
+        return None
+    question = _clean(item.get('question'))
+    options = [_clean(item.get('correct'))] + [_clean(wrong) for wrong in item['wrong'][:3]]
+    if not question or len(options) < 4 or not all(options):
+        return None
+    if len(question) > MAX_QUESTION_CHARS or any(len(option) > MAX_OPTION_CHARS for option in options):
+        return None
+    if len({option.lower() for option in options}) < 4:
+        return None
+    return '|'.join([question] + options)
+
+
+def parse_response(content):
+    """Extract the list of question objects from the model's reply."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        # Tolerate prose around the JSON object
+        start, end = (content or '').find('{'), (content or '').rfind('}')
+        if start < 0 or end <= start:
+            return []
+        try:
+            data = json.loads(content[start:end + 1])
+        except ValueError:
+            return []
+    if isinstance(data, dict):
+        data = data.get('questions')
+    return data if isinstance(data, list) else []
+
+
+def read_questions(path):
+    """Question texts already in a genre file."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.split('|', 1)[0].strip() for line in file if line.count('|') >= 4]
+
+
+def append_questions(path, lines):
+    """Append lines that are not near-duplicates of the file's questions; returns the lines added."""
+    with open(path, 'a+', encoding='utf-8') as file:
+        # Serialize writers across processes; readers tolerate a half-written last line
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            file.seek(0)
+            content = file.read()
+            seen = {question_hash(line.split('|', 1)[0]) for line in content.splitlines() if line.strip()}
+            fresh = []
+            for line in lines:
+                digest = question_hash(line.split('|', 1)[0])
+                if digest not in seen:
+                    seen.add(digest)
+                    fresh.append(line)
+            if fresh:
+                prefix = '' if not content or content.endswith('\n') else '\n'
+                file.write(prefix + '\n'.join(fresh) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+    return fresh
+
+
+class RateLimiter:
+    """Spaces calls evenly so all threads together stay under a per-minute budget."""
+
+    def __init__(self, rate_per_minute):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class QuestionGenerator:
+    """Generates questions for genres with a pool of rate-limited workers."""
+
+    def __init__(self, api, directory=QUESTIONS_DIR, batch_size=BATCH_SIZE, workers=WORKERS,
+                 rate_per_minute=RATE_PER_MINUTE):
+        self.api = api
+        self.directory = directory
+        # The compiled bank is built from the bundled question files, so only those feed it
+        self.update_compiled_bank = os.path.abspath(directory) == os.path.abspath(QUESTIONS_DIR)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = RateLimiter(rate_per_minute)
+
+    def _path(self, genre):
+        return os.path.join(self.directory, f"{genre}.txt")
+
+    def generate_batch(self, genre, count=None):
+        """Ask the model for one batch of questions and append the usable new ones."""
+        existing = read_questions(self._path(genre))
+        examples = random.sample(existing, min(EXAMPLES_IN_PROMPT, len(existing)))
+        prompt = PROMPT.format(count=count or self.batch_size, genre=genre,
+                               examples='\n'.join(f"- {example}" for example in examples) or '- (none yet)')
+
+        self.limiter.wait()
+        content = self.api.get_completion(
+            [{"role": "user", "content": prompt}],
+            operation="quiz_generate",
+            temperature=0.9,
+            response_format={"type": "json_object"},
+        )
+
+        lines = [line for line in map(to_line, parse_response(content)) if line]
+        fresh = append_questions(self._path(genre), lines)
+        if fresh and self.update_compiled_bank:
+            add_to_compiled_bank(genre, fresh)
+        added = len(fresh)
+        logging.info(f"Quiz generator: {genre} +{added} ({len(lines)} valid, {len(lines) - added} duplicates)")
+        return added
+
+    def fill(self, genres, target=TARGET):
+        """Top each genre up to `target` questions; returns the number added per genre."""
+        batches = []
+        for genre in genres:
+            missing = target - len(read_questions(self._path(genre)))
+            batches += [genre] * max(0, -(-missing // self.batch_size))
+
+        added = {genre: 0 for genre in genres}
+        if not batches:
+            return added
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='quiz-generator') as pool:
+            futures = {pool.submit(self.generate_batch, genre): genre for genre in batches}
+            for future in as_completed(futures):
+                try:
+                    added[futures[future]] += future.result()
+                except Exception as e:
+                    logging.error(f"Quiz generator batch for {futures[future]} failed: {str(e)}")
+        return added
+
+
+def add_to_compiled_bank(genre, lines):
+    """
+    Add new lines to the compiled bank, if one is in use. The bank is extended in place
+    rather than rebuilt, since it may hold questions imported from other source directories.
+    """
+    from quiz.question_store import DEFAULT_DB_PATH, add_questions
+    if os.path.exists(DEFAULT_DB_PATH):
+        add_questions(genre, lines, DEFAULT_DB_PATH)
+
+
+def start_background_generator(api, interval=INTERVAL, target=TARGET):
+    """
+    Top up every genre in a daemon thread every `interval` seconds.
+    Every worker process starts the thread, but a host-wide lock file lets only one run rounds.
+    """
+    lock_path = os.path.join(tempfile.gettempdir(), 'airena-quiz-generator.lock')
+    generator = QuestionGenerator(api)
+
+    def run():
+        from groqai.ai import metrics
+        metrics.set_route('quiz_generator')
+        lock_file = open(lock_path, 'w')
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another process is the generator; check again next round in case it exits
+                time.sleep(interval)
+                continue
+            try:
+                generator.fill(list_available_genres(), target)
+            except Exception as e:
+                logging.error(f"Quiz generator round failed: {str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='quiz-generator', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate new Fluvio Quiz questions with the Groq API.')
+    parser.add_argument('--genre', action='append', help='Genre to top up (repeatable, default: all)')
+    parser.add_argument('--target', type=int, default=TARGET, help='Questions per genre to aim for')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help='Questions requested per call')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Concurrent model calls')
+    parser.add_argument('--rpm', type=float, default=RATE_PER_MINUTE, help='Model calls per minute')
+    parser.add_argument('--dir', default=QUESTIONS_DIR, help='Directory of genre files to append to')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from groqai.ai.api import GroqAPI
+
+    generator = QuestionGenerator(GroqAPI(), args.dir, args.batch, args.workers, args.rpm)
+    added = generator.fill(args.genre or list_available_genres(), args.target)
+    for genre, count in sorted(added.items()):
+        print(f"{genre}: +{count}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Quiz leaderboards, global and per genre.
+Totals live in the LeaderboardEntry table and are bumped with atomic UPDATEs, so any
+number of workers can record results. Each worker keeps every board it has served as a
+sorted list in memory: top-K is a slice and "my rank" a binary search, both O(log n)
+or better, instead of an aggregate over all users per request. Boards are patched in
+place on every local submission and pull rows changed by other workers at most every
+LEADERBOARD_SYNC_INTERVAL seconds through the (genre, updated_at) index.
+"""
+
+import os
+import time
+import bisect
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, LeaderboardEntry
+
+# Genre key of the global board
+GLOBAL = ''
+
+# Seconds between pulls of rows changed by other workers
+SYNC_INTERVAL = float(os.getenv('LEADERBOARD_SYNC_INTERVAL', 2))
+
+# Rows updated this close to the last sync are read again to absorb clock skew and slow commits
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class Board:
+    """One leaderboard: (-score, user_id) keys kept sorted, plus each user's current score."""
+
+    __slots__ = ('keys', 'scores', 'synced_at', 'checked_at')
+
+    def __init__(self):
+        self.keys = []
+        self.scores = {}
+        self.synced_at = None
+        self.checked_at = 0.0
+
+    def set(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self.keys[bisect.bisect_left(self.keys, (-old, user_id))]
+        bisect.insort(self.keys, (-score, user_id))
+        self.scores[user_id] = score
+
+    def rank(self, user_id):
+        """1-based competition rank (ties share a rank), or None for users without a score."""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.keys, (-score,)) + 1
+
+    def top(self, limit):
+        return [(-negative_score, user_id) for negative_score, user_id in self.keys[:limit]]
+
+
+class LeaderboardCache:
+    """Per-process boards, loaded on first use and kept current incrementally."""
+
+    def __init__(self, sync_interval=SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def _sync(self, genre, board):
+        query = db.session.query(LeaderboardEntry.user_id, LeaderboardEntry.total_score,
+                                 LeaderboardEntry.updated_at).filter(LeaderboardEntry.genre == genre)
+        if board.synced_at is not None:
+            query = query.filter(LeaderboardEntry.updated_at >= board.synced_at - SYNC_OVERLAP)
+        synced_at = board.synced_at
+        for user_id, score, updated_at in query:
+            board.set(user_id, score)
+            if synced_at is None or updated_at > synced_at:
+                synced_at = updated_at
+        board.synced_at = synced_at or datetime.utcnow()
+        board.checked_at = time.monotonic()
+
+    def board(self, genre):
+        """Return the board for a genre, pulling remote changes if the last sync is stale."""
+        with self._lock:
+            board = self._boards.get(genre)
+            if board is None:
+                board = self._boards[genre] = Board()
+                self._sync(genre, board)
+            elif time.monotonic() - board.checked_at >= self.sync_interval:
+                self._sync(genre, board)
+            return board
+
+    def apply(self, genre, user_id, score):
+        """Patch a board the process already holds after a local submission."""
+        with self._lock:
+            board = self._boards.get(genre)
+            if board is not None:
+                board.set(user_id, score)
+
+
+CACHE = LeaderboardCache()
+
+
+def _add_score(user_id, genre, score, now):
+    """Atomically add a result to one board row and return the new total."""
+    values = {
+        'total_score': LeaderboardEntry.total_score + score,
+        'attempts': LeaderboardEntry.attempts + 1,
+        'updated_at': now
+    }
+    for _ in range(2):
+        updated = LeaderboardEntry.query.filter_by(user_id=user_id, genre=genre).update(
+            values, synchronize_session=False)
+        if updated:
+            break
+        try:
+            # First result on this board; a concurrent insert makes us fall back to the UPDATE
+            with db.session.begin_nested():
+                db.session.add(LeaderboardEntry(user_id=user_id, genre=genre, total_score=score,
+                                                attempts=1, updated_at=now))
+            break
+        except IntegrityError:
+            continue
+    return db.session.query(LeaderboardEntry.total_score).filter_by(user_id=user_id, genre=genre).scalar()
+
+
+def record_result(user_id, genre, score):
+    """Add a finished attempt to the genre and global boards; the caller commits."""
+    now = datetime.utcnow()
+    return {board_genre: _add_score(user_id, board_genre, score, now) for board_genre in (genre, GLOBAL)}
+
+
+def publish_result(user_id, totals):
+    """Reflect committed totals in this process's cached boards."""
+    for genre, total in totals.items():
+        CACHE.apply(genre, user_id, total)
+
+
+def get_rank(user_id, genre=GLOBAL):
+    """Return the user's rank and score on a board, or (None, 0) if they have no results there."""
+    board = CACHE.board(genre)
+    return board.rank(user_id), board.scores.get(user_id, 0)
+
+
+def get_top(genre=GLOBAL, limit=10):
+    """Top `limit` entries of a board with user names."""
+    board = CACHE.board(genre)
+    top = board.top(limit)
+    names = dict(db.session.query(User.id, User.name).filter(User.id.in_([user_id for _, user_id in top])))
+    return [
+        {'rank': board.rank(user_id), 'user_id': user_id, 'name': names.get(user_id, 'Player'), 'score': score}
+        for score, user_id in top
+    ]
@@ -0,0 +1,441 @@
+"""
+Compiled question bank for Fluvio Quiz.
+Compiles the pipe-delimited genre files into an indexed SQLite database so that very
+large banks can be sampled and searched without loading them into memory.
+
+Line format (difficulty and tags are optional):
+    Question|Correct|Wrong1|Wrong2|Wrong3[|difficulty[|tag1,tag2,...]]
+
+Random sampling is O(k) per quiz: every sampling bucket (genre, genre + difficulty,
+genre + tag) has a dense slot table, so picking k questions means drawing k slot
+numbers and doing k primary-key lookups.
+
+    python -m quiz.question_store build [--source DIR ...] [--output PATH]
+    python -m quiz.question_store search "solar system" [--genre science]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import sqlite3
+import argparse
+import threading
+
+from quiz.quiz_fluvio import QUESTIONS_DIR, RELOAD_INTERVAL, normalize_tags
+
+# Default location of the compiled bank (next to the question files)
+DEFAULT_DB_PATH = os.getenv('QUIZ_BANK_DB', os.path.join(os.path.dirname(__file__), 'questions.db'))
+
+INSERT_BATCH_SIZE = 5000
+
+# Ids per IN (...) list; stays under SQLITE_MAX_VARIABLE_NUMBER on old SQLite builds
+LOOKUP_BATCH_SIZE = 900
+
+SCHEMA = """
+CREATE TABLE questions (
+    id INTEGER PRIMARY KEY,
+    genre TEXT NOT NULL,
+    difficulty TEXT,
+    question TEXT NOT NULL,
+    correct TEXT NOT NULL,
+    wrong1 TEXT NOT NULL,
+    wrong2 TEXT NOT NULL,
+    wrong3 TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE question_tags (
+    tag TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, genre, question_id)
+) WITHOUT ROWID;
+CREATE TABLE sample_slots (
+    bucket TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (bucket, slot)
+) WITHOUT ROWID;
+CREATE TABLE buckets (
+    bucket TEXT PRIMARY KEY,
+    total INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX ix_questions_genre_difficulty ON questions (genre, difficulty);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE questions_fts USING fts5(
+    question, correct, tags, content='questions', content_rowid='id'
+);
+INSERT INTO questions_fts (rowid, question, correct, tags) SELECT id, question, correct, tags FROM questions;
+"""
+
+
+def genre_bucket(genre):
+    return f"g:{genre}"
+
+
+def difficulty_bucket(genre, difficulty):
+    return f"g:{genre}|d:{difficulty}"
+
+
+def tag_bucket(genre, tag):
+    return f"g:{genre}|t:{tag}"
+
+
+def parse_line(genre, line):
+    """Parse one genre file line into a question row, or None if it is not a question."""
+    line = line.strip()
+    if not line:
+        return None
+    parts = line.split('|')
+    if len(parts) < 5:
+        return None
+    difficulty = None
+    if len(parts) > 5 and parts[5].strip():
+        difficulty = parts[5].strip().lower()
+    tags = ''
+    if len(parts) > 6:
+        tags = ','.join(sorted({tag.strip().lower() for tag in parts[6].split(',') if tag.strip()}))
+    return (genre, difficulty, parts[0], parts[1], parts[2], parts[3], parts[4], tags)
+
+
+def _iter_rows(source_dirs):
+    """Yield question rows from every genre file in the source directories, one line at a time."""
+    for source_dir in source_dirs:
+        for filename in sorted(os.listdir(source_dir)):
+            if not filename.endswith('.txt'):
+                continue
+            genre = os.path.splitext(filename)[0]
+            with open(os.path.join(source_dir, filename), 'r', encoding='utf-8') as file:
+                for line in file:
+                    row = parse_line(genre, line)
+                    if row:
+                        yield row
+
+
+def build_store(source_dirs=None, output_path=None):
+    """Compile the question files into a fresh SQLite bank and atomically replace the old one."""
+    source_dirs = source_dirs or [QUESTIONS_DIR]
+    output_path = output_path or DEFAULT_DB_PATH
+    temp_path = f"{output_path}.building"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.executescript(SCHEMA)
+
+        batch = []
+        total = 0
+        for row in _iter_rows(source_dirs):
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                conn.executemany('INSERT INTO questions (genre, difficulty, question, correct, wrong1, wrong2, '
+                                 'wrong3, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.executemany('INSERT INTO questions (genre, difficulty, question, correct, wrong1, wrong2, '
+                             'wrong3, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+            total += len(batch)
+
+        # Explode the comma-separated tags into the tag index
+        conn.execute("""
+            WITH RECURSIVE split(question_id, genre, tag, rest) AS (
+                SELECT id, genre, '', tags || ',' FROM questions WHERE tags != ''
+                UNION ALL
+                SELECT question_id, genre, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1)
+                FROM split WHERE rest != ''
+            )
+            INSERT OR IGNORE INTO question_tags (tag, genre, question_id)
+            SELECT tag, genre, question_id FROM split WHERE tag != ''
+        """)
+
+        # Dense slot numbering per sampling bucket
+        conn.execute("""
+            INSERT INTO sample_slots (bucket, slot, question_id)
+            SELECT 'g:' || genre, ROW_NUMBER() OVER (PARTITION BY genre ORDER BY id) - 1, id
+            FROM questions
+        """)
+        conn.execute("""
+            INSERT INTO sample_slots (bucket, slot, question_id)
+            SELECT 'g:' || genre || '|d:' || difficulty,
+                   ROW_NUMBER() OVER (PARTITION BY genre, difficulty ORDER BY id) - 1, id
+            FROM questions WHERE difficulty IS NOT NULL
+        """)
+        conn.execute("""
+            INSERT INTO sample_slots (bucket, slot, question_id)
+            SELECT 'g:' || genre || '|t:' || tag,
+                   ROW_NUMBER() OVER (PARTITION BY genre, tag ORDER BY question_id) - 1, question_id
+            FROM question_tags
+        """)
+        conn.execute('INSERT INTO buckets (bucket, total) SELECT bucket, COUNT(*) FROM sample_slots GROUP BY bucket')
+
+        try:
+            conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logging.warning(f"FTS5 unavailable, keyword search will use LIKE: {str(e)}")
+
+        conn.commit()
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(temp_path, output_path)
+    return total
+
+
+def add_questions(genre, lines, db_path=None):
+    """
+    Add question lines of one genre to an existing compiled bank in place.
+    New questions get the next slot of each of their sampling buckets and join the tag and
+    search indexes, so the bank stays complete without a rebuild from its source files.
+    Returns the number of questions added.
+    """
+    rows = [row for row in (parse_line(genre, line) for line in lines) if row]
+    if not rows:
+        return 0
+
+    conn = sqlite3.connect(db_path or DEFAULT_DB_PATH, timeout=30, isolation_level=None)
+    try:
+        has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'").fetchone() is not None
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for row in rows:
+                question_id = conn.execute(
+                    'INSERT INTO questions (genre, difficulty, question, correct, wrong1, wrong2, wrong3, tags) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row).lastrowid
+                difficulty, tags = row[1], row[7].split(',') if row[7] else []
+
+                buckets = [genre_bucket(genre)]
+                if difficulty:
+                    buckets.append(difficulty_bucket(genre, difficulty))
+                for tag in tags:
+                    conn.execute('INSERT OR IGNORE INTO question_tags (tag, genre, question_id) VALUES (?, ?, ?)',
+                                 (tag, genre, question_id))
+                    buckets.append(tag_bucket(genre, tag))
+
+                for bucket in buckets:
+                    total = conn.execute('SELECT total FROM buckets WHERE bucket = ?', (bucket,)).fetchone()
+                    conn.execute('INSERT INTO sample_slots (bucket, slot, question_id) VALUES (?, ?, ?)',
+                                 (bucket, total[0] if total else 0, question_id))
+                    conn.execute('INSERT INTO buckets (bucket, total) VALUES (?, 1) '
+                                 'ON CONFLICT(bucket) DO UPDATE SET total = total + 1', (bucket,))
+
+                if has_fts:
+                    conn.execute('INSERT INTO questions_fts (rowid, question, correct, tags) VALUES (?, ?, ?, ?)',
+                                 (question_id, row[2], row[3], row[7]))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
+    return len(rows)
+
+
+class QuestionStore:
+    """Read-only access to a compiled bank, reopened automatically when the file is rebuilt."""
+
+    def __init__(self, path=DEFAULT_DB_PATH, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._local = threading.local()
+        self._signature = None
+        self._checked_at = None
+        self._genres = ()
+        self._has_fts = False
+        self._missing = False
+        self._lock = threading.Lock()
+        self._check()
+
+    def _check(self):
+        """Re-stat the database file and reset cached state if it was replaced or removed."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            try:
+                stat_result = os.stat(self.path)
+            except FileNotFoundError:
+                self._missing = True
+                self._signature = None
+                self._genres = ()
+                self._checked_at = time.monotonic()
+                return
+            self._missing = False
+            signature = (stat_result.st_mtime_ns, stat_result.st_ino, stat_result.st_size)
+            if signature != self._signature:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+                try:
+                    self._genres = tuple(row[0] for row in conn.execute(
+                        "SELECT substr(bucket, 3) FROM buckets WHERE bucket LIKE 'g:%' "
+                        "AND instr(bucket, '|') = 0 ORDER BY bucket"))
+                    self._has_fts = conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'").fetchone() is not None
+                finally:
+                    conn.close()
+                self._signature = signature
+            self._checked_at = time.monotonic()
+
+    def _conn(self):
+        """Per-thread read-only connection, reopened when the bank file changes."""
+        self._check()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.signature != self._signature:
+            if conn is not None:
+                conn.close()
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+            self._local.signature = self._signature
+        return conn
+
+    def available(self):
+        """Whether the bank file still exists (as of the last check)."""
+        self._check()
+        return not self._missing
+
+    def genres(self):
+        self._check()
+        return self._genres
+
+    def count(self, bucket):
+        row = self._conn().execute('SELECT total FROM buckets WHERE bucket = ?', (bucket,)).fetchone()
+        return row[0] if row else 0
+
+    def _select_in(self, query, values, params=()):
+        """Run a query with an `IN ({placeholders})` list, LOOKUP_BATCH_SIZE values at a time."""
+        conn = self._conn()
+        values = list(values)
+        for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+            batch = values[start:start + LOOKUP_BATCH_SIZE]
+            yield from conn.execute(query.format(placeholders=','.join('?' * len(batch))), list(params) + batch)
+
+    def _fetch_by_id(self, question_ids):
+        return {
+            row[0]: {'question': row[1], 'correct': row[2], 'wrong': [row[3], row[4], row[5]]}
+            for row in self._select_in(
+                'SELECT id, question, correct, wrong1, wrong2, wrong3 FROM questions WHERE id IN ({placeholders})',
+                set(question_ids))
+        }
+
+    def _fetch(self, question_ids):
+        by_id = self._fetch_by_id(question_ids)
+        return [by_id[question_id] for question_id in question_ids if question_id in by_id]
+
+    def slot_questions(self, bucket, slots):
+        """Return {slot: question} for the given slot numbers of a sampling bucket."""
+        question_ids = dict(self._select_in(
+            'SELECT slot, question_id FROM sample_slots WHERE bucket = ? AND slot IN ({placeholders})',
+            set(slots), (bucket,)))
+        by_id = self._fetch_by_id(question_ids.values())
+        return {slot: by_id[question_id] for slot, question_id in question_ids.items() if question_id in by_id}
+
+    def fetch_slots(self, bucket, slots):
+        """Return the questions at the given slot numbers of a sampling bucket, in order."""
+        by_slot = self.slot_questions(bucket, slots)
+        return [by_slot[slot] for slot in slots if slot in by_slot]
+
+    def sample(self, genre, count, difficulty=None, tags=None, rng=None):
+        """Pick `count` distinct random questions for a genre, optionally filtered by difficulty and tags."""
+        rng = rng or random
+        tags = normalize_tags(tags)
+        conn = self._conn()
+
+        if len(tags) <= 1 and not (difficulty and tags):
+            # A single precomputed bucket covers the filter: draw slot numbers directly
+            if tags:
+                bucket = tag_bucket(genre, tags[0])
+            elif difficulty:
+                bucket = difficulty_bucket(genre, difficulty.lower())
+            else:
+                bucket = genre_bucket(genre)
+            total = self.count(bucket)
+            slots = rng.sample(range(total), min(count, total))
+            return self.fetch_slots(bucket, slots)
+
+        # Combined filters: intersect through the tag index (ids only, never full rows)
+        query = ('SELECT q.id FROM questions q WHERE q.genre = ?'
+                 + (' AND q.difficulty = ?' if difficulty else '')
+                 + ''.join(' AND q.id IN (SELECT question_id FROM question_tags WHERE tag = ? AND genre = ?)'
+                           for _ in tags))
+        params = [genre] + ([difficulty.lower()] if difficulty else [])
+        for tag in tags:
+            params += [tag, genre]
+        question_ids = [row[0] for row in conn.execute(query, params)]
+        return self._fetch(rng.sample(question_ids, min(count, len(question_ids))))
+
+    def search(self, keyword, genre=None, limit=20, answers=True):
+        """
+        Full-text search over question text, correct answer and tags.
+        With answers=False the correct answer is neither matched nor returned, so results
+        are safe to show to players.
+        """
+        conn = self._conn()
+        if self._has_fts:
+            # Quote each term so user input cannot inject FTS query syntax
+            terms = ' '.join('"' + term.replace('"', '""') + '"' for term in keyword.split())
+            if not terms:
+                return []
+            if not answers:
+                terms = f"{{question tags}} : ({terms})"
+            query = ('SELECT q.genre, q.difficulty, q.question, q.correct, q.tags FROM questions_fts f '
+                     'JOIN questions q ON q.id = f.rowid WHERE questions_fts MATCH ?'
+                     + (' AND q.genre = ?' if genre else '') + ' ORDER BY rank LIMIT ?')
+            params = [terms] + ([genre] if genre else []) + [limit]
+        else:
+            query = ('SELECT genre, difficulty, question, correct, tags FROM questions WHERE question LIKE ?'
+                     + (' AND genre = ?' if genre else '') + ' LIMIT ?')
+            params = [f"%{keyword}%"] + ([genre] if genre else []) + [limit]
+
+        results = []
+        for row in conn.execute(query, params):
+            result = {'genre': row[0], 'difficulty': row[1], 'question': row[2],
+                      'tags': row[4].split(',') if row[4] else []}
+            if answers:
+                result['correct'] = row[3]
+            results.append(result)
+        return results
+
+
+def open_default_store():
+    """Return a QuestionStore for the compiled bank, or None if it has not been built."""
+    if not os.path.exists(DEFAULT_DB_PATH):
+        return None
+    store = QuestionStore(DEFAULT_DB_PATH)
+    return store if store.available() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile and query the Fluvio Quiz question bank.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Compile question files into the SQLite bank')
+    build_parser.add_argument('--source', action='append', help='Directory of genre .txt files (repeatable)')
+    build_parser.add_argument('--output', default=DEFAULT_DB_PATH, help='Path of the compiled bank')
+
+    search_parser = subparsers.add_parser('search', help='Keyword search in the compiled bank')
+    search_parser.add_argument('keyword')
+    search_parser.add_argument('--genre')
+    search_parser.add_argument('--limit', type=int, default=20)
+    search_parser.add_argument('--db', default=DEFAULT_DB_PATH)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'build':
+        started = time.monotonic()
+        total = build_store(args.source, args.output)
+        print(f"Compiled {total} questions into {args.output} in {time.monotonic() - started:.2f}s")
+    else:
+        for result in QuestionStore(args.db).search(args.keyword, args.genre, args.limit):
+            print(f"[{result['genre']}] {result['question']} -> {result['correct']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,7 @@ let selectedTopic = null;
 let quizData = null;
 let currentQuestion = 0;
 let correctAnswers = 0;
+let answerPending = false;
 
 // Initialize when document is ready
 document.addEventListener('DOMContentLoaded', function() {
@@ -22,13 +23,8 @@ document.addEventListener('DOMContentLoaded', function() {
 function fetchTopics() {
     console.log('Fetching topics...');
     
-    fetch('/api/fluvio/generate-quiz', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ topic: 'list_genres' })
-    })
+    // GET so the browser can revalidate its cached copy with the ETag
+    fetch('/api/fluvio/genres')
     .then(response => response.json())
     .then(data => {
         console.log('Topics received:', data);
@@ -151,44 +147,65 @@ function generateQuiz() {
     
     console.log('Generating quiz for topic:', selectedTopic);
     
-    // Show loading section
-    showSection('quiz-loading');
-    
-    // Send request to API
-    fetch('/api/fluvio/generate-quiz', {
+    // A ?seed=... on the page URL (e.g. seed=daily or a tournament id) gives every player
+    // the same questions
+    const seed = new URLSearchParams(window.location.search).get('seed');
+    startAttempt(seed ? { topic: selectedTopic, seed: seed } : { topic: selectedTopic });
+}
+
+// Open a scored attempt; the server keeps the answer key
+function postAttempt(body) {
+    return fetch('/api/fluvio/attempts', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify({ topic: selectedTopic })
+        body: JSON.stringify(body)
     })
     .then(response => response.json())
     .then(data => {
-        console.log('Quiz data received:', data);
-        if (data.success && data.quiz) {
-            // Store quiz data
-            quizData = data.quiz;
-            
-            // Reset current question and score
-            currentQuestion = 0;
-            correctAnswers = 0;
-            
-            // Prepare and show first question
-            prepareQuestion();
-            showSection('quiz-questions');
-        } else {
-            // Show error and go back to topic selection
-            showError(data.message || 'Failed to generate quiz');
-            showSection('topic-selection');
+        if (!data.success || !data.quiz) {
+            throw new Error(data.message || 'Failed to generate quiz');
         }
-    })
-    .catch(error => {
-        console.error('Error generating quiz:', error);
-        showError('Failed to generate quiz');
-        showSection('topic-selection');
+        return data.quiz;
     });
 }
 
+// Show a freshly loaded quiz from its first question
+function showQuiz(quiz) {
+    // Store quiz data
+    quizData = quiz;
+    
+    // Reset current question and score
+    currentQuestion = 0;
+    correctAnswers = 0;
+    
+    // Prepare and show first question
+    prepareQuestion();
+    showSection('quiz-questions');
+}
+
+// Go back to topic selection after a failed load
+function quizLoadFailed(error) {
+    console.error('Error generating quiz:', error);
+    showError(error.message || 'Failed to generate quiz');
+    showSection('topic-selection');
+}
+
+// Start a scored attempt
+function startAttempt(body) {
+    // Show loading section
+    showSection('quiz-loading');
+    
+    // Send request to API
+    postAttempt(body)
+    .then(quiz => {
+        console.log('Quiz data received:', quiz);
+        showQuiz(quiz);
+    })
+    .catch(quizLoadFailed);
+}
+
 // Prepare a question
 function prepareQuestion() {
     if (!quizData || !quizData.questions || currentQuestion >= quizData.questions.length) return;
@@ -240,34 +257,57 @@ function prepareQuestion() {
 function selectAnswer(optionItem) {
     if (!quizData || !quizData.questions || currentQuestion >= quizData.questions.length) return;
     
-    // If already answered, do nothing
-    if (document.querySelector('.option-item.correct') || document.querySelector('.option-item.incorrect')) return;
+    // If already answered (or waiting for the server), do nothing
+    if (answerPending || document.querySelector('.option-item.correct') || document.querySelector('.option-item.incorrect')) return;
     
     const selectedOption = parseInt(optionItem.dataset.option);
-    const correctOption = quizData.questions[currentQuestion].correct;
     
     // Mark selected option
     optionItem.classList.add('selected');
+    answerPending = true;
     
-    // Check if correct
-    if (selectedOption === correctOption) {
-        // Correct answer
-        optionItem.classList.add('correct');
-        correctAnswers++;
+    // The server checks the answer and reveals the correct option
+    fetch(`/api/fluvio/attempts/${quizData.attempt_id}/answer`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ question: currentQuestion, selected: selectedOption })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.message || 'Failed to submit answer');
+        }
+        
+        // Check if correct
+        if (data.is_correct) {
+            // Correct answer
+            optionItem.classList.add('correct');
+        } else {
+            // Incorrect answer
+            optionItem.classList.add('incorrect');
+            
+            // Mark correct option
+            document.querySelector(`.option-item[data-option="${data.correct}"]`).classList.add('correct');
+        }
         
         // Update score counter
+        correctAnswers = data.score;
         document.getElementById('score-counter').textContent = `Score: ${correctAnswers}`;
-    } else {
-        // Incorrect answer
-        optionItem.classList.add('incorrect');
         
-        // Mark correct option
-        document.querySelector(`.option-item[data-option="${correctOption}"]`).classList.add('correct');
-    }
-    
-    // Enable next button
-    const btnNextQuestion = document.getElementById('btn-next-question');
-    btnNextQuestion.disabled = false;
+        // Enable next button
+        const btnNextQuestion = document.getElementById('btn-next-question');
+        btnNextQuestion.disabled = false;
+    })
+    .catch(error => {
+        console.error('Error submitting answer:', error);
+        optionItem.classList.remove('selected');
+        showError(error.message || 'Failed to submit answer');
+    })
+    .finally(() => {
+        answerPending = false;
+    });
 }
 
 // Show next question
@@ -307,17 +347,28 @@ function showQuizResults() {
     
     // Show results section
     showSection('quiz-results');
+    
+    // Score the attempt on the server and show the player's ranks
+    fetch(`/api/fluvio/attempts/${quizData.attempt_id}/finish`, { method: 'POST' })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success && !data.ranked) {
+            document.getElementById('result-feedback').textContent =
+                `${feedback} You have played all of these questions before, so this round is not ranked.`;
+        } else if (data.success && data.genre_rank) {
+            document.getElementById('result-feedback').textContent =
+                `${feedback} You are ranked #${data.genre_rank} in ${quizData.topic} and #${data.global_rank} overall.`;
+        }
+    })
+    .catch(error => {
+        console.error('Error finishing quiz:', error);
+    });
 }
 
 // Restart quiz
 function restartQuiz() {
-    // Reset current question and score
-    currentQuestion = 0;
-    correctAnswers = 0;
-    
-    // Prepare and show first question
-    prepareQuestion();
-    showSection('quiz-questions');
+    // Replay the same questions as a new attempt (scored, but not ranked)
+    startAttempt({ replay: quizData.attempt_id });
 }
 
 // Go to topic selection
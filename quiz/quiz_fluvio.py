@@ -1,74 +1,254 @@
 """
 Quiz generator module for Fluvio Quiz feature.
 Provides functions to load and generate quizzes with multiple-choice questions from text files.
+
+All genre files are parsed once into an immutable in-memory bank. Files are re-checked
+at most every RELOAD_INTERVAL seconds with cheap stat() calls and only the ones whose
+mtime, inode or size changed are re-parsed, so generating a quiz normally does no
+filesystem I/O at all.
+
+When a compiled bank (see quiz/question_store.py) exists it is used instead, so large
+imported banks are sampled and searched without being loaded into memory.
 """
 
 import os
+import time
 import random
+import threading
+from array import array
 
 # Path to questions directory
 QUESTIONS_DIR = os.path.join(os.path.dirname(__file__), 'questions')
 
+# Seconds between checks of the questions directory for changed files
+RELOAD_INTERVAL = float(os.getenv('QUIZ_RELOAD_INTERVAL', 5))
+
+# Number of options per question: the correct answer followed by three wrong ones
+OPTIONS_PER_QUESTION = 4
+
+
+class GenreBank:
+    """Immutable, compact question storage for one genre."""
+
+    __slots__ = ('genre', 'signature', 'questions', 'option_texts', 'option_index')
+
+    def __init__(self, genre, signature, questions, option_texts, option_index):
+        self.genre = genre
+        # (mtime_ns, inode, size) of the file this bank was parsed from
+        self.signature = signature
+        # Question texts, one per question
+        self.questions = questions
+        # Distinct answer strings used in this genre
+        self.option_texts = option_texts
+        # OPTIONS_PER_QUESTION indices into option_texts per question, correct answer first
+        self.option_index = option_index
+
+    def __len__(self):
+        return len(self.questions)
+
+    def options(self, position):
+        """Return the option strings of a question, correct answer first."""
+        start = position * OPTIONS_PER_QUESTION
+        return [self.option_texts[i] for i in self.option_index[start:start + OPTIONS_PER_QUESTION]]
+
+    def question(self, position):
+        """Return a question in the dict format used by the API helpers."""
+        options = self.options(position)
+        return {
+            'question': self.questions[position],
+            'correct': options[0],
+            'wrong': options[1:]
+        }
+
+
+def _signature(stat_result):
+    return (stat_result.st_mtime_ns, stat_result.st_ino, stat_result.st_size)
+
+
+def parse_genre_file(genre, filepath, signature):
+    """Parse a pipe-delimited genre file into a GenreBank."""
+    questions = []
+    option_ids = {}
+    option_index = array('I')
+
+    with open(filepath, 'r', encoding='utf-8') as file:
+        for line in file:
+            # Skip empty lines
+            line = line.strip()
+            if not line:
+                continue
+
+            # Parse question format: Question|Correct Answer|Wrong1|Wrong2|Wrong3
+            parts = line.split('|')
+            if len(parts) < 5:
+                continue
+
+            questions.append(parts[0])
+            for text in parts[1:5]:
+                option_index.append(option_ids.setdefault(text, len(option_ids)))
+
+    return GenreBank(genre, signature, tuple(questions), tuple(option_ids), option_index)
+
+
+class QuestionBank:
+    """All genres, loaded once and refreshed from disk only when files change."""
+
+    def __init__(self, directory=QUESTIONS_DIR, reload_interval=RELOAD_INTERVAL):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._genres = {}
+        self._genre_names = ()
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Re-stat the question files and re-parse the ones that changed."""
+        current = dict(self._genres)
+        seen = set()
+
+        if os.path.isdir(self.directory):
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.txt') or not entry.is_file():
+                        continue
+                    genre = os.path.splitext(entry.name)[0]
+                    seen.add(genre)
+                    signature = _signature(entry.stat())
+
+                    bank = current.get(genre)
+                    if bank is not None and bank.signature == signature:
+                        continue
+                    try:
+                        current[genre] = parse_genre_file(genre, entry.path, signature)
+                    except Exception as e:
+                        print(f"Error loading questions for {genre}: {str(e)}")
+                        current.pop(genre, None)
+
+        for genre in set(current) - seen:
+            del current[genre]
+
+        # Swap in the new state in one step so readers never see a partial bank
+        self._genres = current
+        self._genre_names = tuple(sorted(current))
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+                return
+            self._refresh()
+            self._checked_at = time.monotonic()
+
+    def reload(self):
+        """Force a check of the questions directory."""
+        with self._lock:
+            self._refresh()
+            self._checked_at = time.monotonic()
+
+    def genres(self):
+        self._maybe_refresh()
+        return self._genre_names
+
+    def get(self, genre):
+        self._maybe_refresh()
+        return self._genres.get(genre)
+
+
+# Shared bank used by the module-level helpers
+BANK = QuestionBank()
+
+# Compiled SQLite bank, opened lazily
+_STORE = None
+# When we last looked for a compiled bank and found none
+_STORE_MISSING_AT = None
+
+
+def get_store():
+    """
+    Return the compiled question store if one has been built, else None.
+    A missing bank is looked for again every RELOAD_INTERVAL seconds, and a bank that is
+    deleted is dropped, so the text files take over without a restart.
+    """
+    global _STORE, _STORE_MISSING_AT
+    if _STORE is not None and not _STORE.available():
+        _STORE = None
+        _STORE_MISSING_AT = time.monotonic()
+    if _STORE is None:
+        now = time.monotonic()
+        if _STORE_MISSING_AT is not None and now - _STORE_MISSING_AT < RELOAD_INTERVAL:
+            return None
+        from quiz.question_store import open_default_store
+        _STORE = open_default_store()
+        if _STORE is None:
+            _STORE_MISSING_AT = now
+    return _STORE
+
+
 def list_available_genres():
     """List all available question genres based on files in the questions directory."""
-    genres = []
-    if os.path.exists(QUESTIONS_DIR):
-        for filename in os.listdir(QUESTIONS_DIR):
-            if filename.endswith('.txt'):
-                genre = os.path.splitext(filename)[0]
-                genres.append(genre)
-    return sorted(genres)
+    store = get_store()
+    if store:
+        return list(store.genres())
+    return list(BANK.genres())
+
+def search_questions(keyword, genre=None, limit=20):
+    """Keyword search over questions for players, without answers; needs the compiled bank."""
+    store = get_store()
+    if not store:
+        return []
+    return store.search(keyword, genre, limit, answers=False)
 
 def load_questions_from_file(genre):
     """Load questions from a specific genre file."""
-    filepath = os.path.join(QUESTIONS_DIR, f"{genre}.txt")
-    questions = []
-    
-    if not os.path.exists(filepath):
+    bank = BANK.get(genre)
+    if bank is None:
         return []
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            for line in file:
-                # Skip empty lines
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Parse question format: Question|Correct Answer|Wrong1|Wrong2|Wrong3
-                parts = line.split('|')
-                if len(parts) >= 5:
-                    question = parts[0]
-                    correct_answer = parts[1]
-                    wrong_answers = parts[2:5]
-                    
-                    questions.append({
-                        'question': question,
-                        'correct': correct_answer,
-                        'wrong': wrong_answers
-                    })
-    except Exception as e:
-        print(f"Error loading questions for {genre}: {str(e)}")
+    return [bank.question(position) for position in range(len(bank))]
+
+def normalize_tags(tags):
+    """Tag filter as a sorted list of distinct lowercase tags; accepts a comma-separated string."""
+    if not tags:
         return []
-    
-    return questions
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return sorted({str(tag).strip().lower() for tag in tags if str(tag).strip()})
+
+def quiz_rng(seed, genre, count, difficulty=None, tags=None):
+    """Private random generator for a seeded quiz, or None for an unseeded one."""
+    if seed is None or seed == '':
+        return None
+    # String seeds hash deterministically, so every worker builds the same quiz
+    key = f"{seed}|{genre}|{count}|{difficulty or ''}|{','.join(sorted(tags or []))}"
+    return random.Random(key)
 
-def get_random_questions(genre, count=5):
+def get_random_questions(genre, count=5, difficulty=None, tags=None, rng=None):
     """Get a set of random questions from a specific genre."""
-    all_questions = load_questions_from_file(genre)
+    rng = rng or random
+    store = get_store()
+    if store:
+        return store.sample(genre, count, difficulty, tags, rng)
     
-    if not all_questions:
+    # The text files carry no difficulty or tags, so filters need the compiled bank
+    if difficulty or tags:
         return []
     
+    bank = BANK.get(genre)
+
+    if not bank:
+        return []
+
     # Limit count to available questions
-    count = min(count, len(all_questions))
-    
-    # Randomly select questions
-    selected_questions = random.sample(all_questions, count)
-    return selected_questions
+    count = min(count, len(bank))
+
+    # Randomly select question positions and build only those questions
+    positions = rng.sample(range(len(bank)), count)
+    return [bank.question(position) for position in positions]
 
-def format_for_api(questions):
+def format_for_api(questions, rng=None):
     """Format questions for API response."""
+    rng = rng or random
     formatted_questions = []
     
     for idx, q in enumerate(questions):
@@ -79,7 +259,7 @@ def format_for_api(questions):
         correct_idx = 0
         
         # Shuffle options
-        random.shuffle(options)
+        rng.shuffle(options)
         
         # Find new index of correct answer after shuffle
         correct_idx = options.index(q['correct'])
@@ -93,20 +273,19 @@ def format_for_api(questions):
     
     return formatted_questions
 
-def generate_quiz(genre, question_count=5):
-    """Generate a complete quiz for the given genre."""
-    # Check if genre exists
-    if genre not in list_available_genres():
-        return None
+def generate_quiz(genre, question_count=5, difficulty=None, tags=None, seed=None):
+    """Generate a complete quiz for the given genre; the same seed always yields the same quiz."""
+    tags = normalize_tags(tags)
+    rng = quiz_rng(seed, genre, question_count, difficulty, tags)
     
-    # Get random questions
-    questions = get_random_questions(genre, question_count)
+    # Get random questions (an unknown genre has no bank and yields none)
+    questions = get_random_questions(genre, question_count, difficulty, tags, rng)
     
     if not questions:
         return None
     
     # Format questions for API
-    formatted_questions = format_for_api(questions)
+    formatted_questions = format_for_api(questions, rng)
     
     # Create quiz data
     quiz = {
@@ -0,0 +1,174 @@
+"""
+Server-side quiz attempts.
+The answer key stays on the server: the client receives questions and options only,
+submits one answer at a time and learns whether it was right from the response.
+Finishing an attempt scores it from the stored answers and adds it to the leaderboards.
+Each question counts on the boards once per player: only the attempt that first served it
+to the player can score it. Replays, repeated seeds and fresh draws that happen to repeat
+questions are scored for the player, but would otherwise let anyone learn the answers in
+one attempt and collect them again in the next.
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, QuizAttempt, QuizAnswer, QuizServedQuestion
+from quiz.quiz_fluvio import generate_quiz
+from quiz import leaderboard
+
+# Upper limit on questions per attempt; one attempt reveals the answers to all of them
+MAX_QUESTIONS = int(os.getenv('QUIZ_ATTEMPT_MAX_COUNT', 20))
+
+
+class QuizAttemptError(Exception):
+    """Raised for attempt requests that cannot be honoured."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _public_quiz(attempt, questions):
+    return {
+        'attempt_id': attempt.id,
+        'topic': attempt.genre.capitalize(),
+        'questions': [{'question': q['question'], 'options': q['options']} for q in questions]
+    }
+
+
+def question_key(question):
+    """Identity of a question within its genre, whatever order its options were served in."""
+    return hashlib.sha256(' '.join(question['question'].lower().split()).encode('utf-8')).hexdigest()
+
+
+def _claim_questions(attempt, questions):
+    """Record the questions this attempt is the first to serve to its player."""
+    keys = set(question_key(question) for question in questions)
+    served = {key for key, in db.session.query(QuizServedQuestion.question_key).filter(
+        QuizServedQuestion.user_id == attempt.user_id,
+        QuizServedQuestion.genre == attempt.genre,
+        QuizServedQuestion.question_key.in_(keys)
+    )}
+    for key in keys - served:
+        try:
+            # A concurrent attempt of the same player may claim it first
+            with db.session.begin_nested():
+                db.session.add(QuizServedQuestion(user_id=attempt.user_id, genre=attempt.genre,
+                                                  question_key=key, attempt_id=attempt.id))
+        except IntegrityError:
+            continue
+
+
+def _get_attempt(user_id, attempt_id):
+    attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=user_id).first()
+    if attempt is None:
+        raise QuizAttemptError('Quiz attempt not found', 404)
+    return attempt
+
+
+def start_attempt(user_id, genre, question_count=5, difficulty=None, tags=None, seed=None, replay=None):
+    """Create an attempt for a new quiz, or for the same questions as an earlier attempt."""
+    if replay is not None:
+        previous = _get_attempt(user_id, replay)
+        genre, seed, questions = previous.genre, previous.seed, json.loads(previous.questions)
+    else:
+        quiz_data = generate_quiz(genre, question_count, difficulty, tags, seed)
+        if not quiz_data:
+            raise QuizAttemptError(f'No questions available for topic: {genre}', 404)
+        questions = quiz_data['questions']
+
+    attempt = QuizAttempt(
+        user_id=user_id,
+        genre=genre,
+        seed=str(seed) if seed not in (None, '') else None,
+        questions=json.dumps(questions),
+        question_count=len(questions)
+    )
+    db.session.add(attempt)
+    db.session.flush()
+    _claim_questions(attempt, questions)
+    db.session.commit()
+    return _public_quiz(attempt, questions)
+
+
+def answer_question(user_id, attempt_id, question_index, selected):
+    """Record one answer and reveal the correct option for that question."""
+    attempt = _get_attempt(user_id, attempt_id)
+    if attempt.completed_at is not None:
+        raise QuizAttemptError('This quiz has already been finished', 409)
+    if not isinstance(question_index, int) or not 0 <= question_index < attempt.question_count:
+        raise QuizAttemptError('Invalid question index')
+
+    question = json.loads(attempt.questions)[question_index]
+    if not isinstance(selected, int) or not 0 <= selected < len(question['options']):
+        raise QuizAttemptError('Invalid option')
+
+    is_correct = selected == question['correct']
+    db.session.add(QuizAnswer(attempt_id=attempt.id, question_index=question_index,
+                              selected=selected, is_correct=is_correct))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise QuizAttemptError('This question has already been answered', 409)
+
+    score = QuizAnswer.query.filter_by(attempt_id=attempt.id, is_correct=True).count()
+    return {
+        'correct': question['correct'],
+        'is_correct': is_correct,
+        'score': score
+    }
+
+
+def _ranked_indexes(attempt):
+    """Indexes of the questions this attempt was the first to serve to its player."""
+    owned = {key for key, in db.session.query(QuizServedQuestion.question_key).filter_by(attempt_id=attempt.id)}
+    indexes = {}
+    for index, question in enumerate(json.loads(attempt.questions)):
+        key = question_key(question)
+        if key in owned:
+            indexes.setdefault(key, index)
+    return set(indexes.values())
+
+
+def finish_attempt(user_id, attempt_id):
+    """Score an attempt (unanswered questions count as wrong) and update the leaderboards."""
+    attempt = _get_attempt(user_id, attempt_id)
+    ranked_indexes = _ranked_indexes(attempt)
+    ranked = bool(ranked_indexes)
+
+    if attempt.completed_at is None:
+        correct = [index for index, in db.session.query(QuizAnswer.question_index).filter_by(
+            attempt_id=attempt.id, is_correct=True)]
+        score = len(correct)
+        # Claim the attempt atomically so a double submit cannot count it twice
+        claimed = QuizAttempt.query.filter_by(id=attempt.id, completed_at=None).update(
+            {'completed_at': datetime.utcnow(), 'score': score}, synchronize_session=False)
+        if claimed and ranked:
+            # Questions the player was served before add nothing to the boards
+            ranked_score = sum(1 for index in correct if index in ranked_indexes)
+            totals = leaderboard.record_result(user_id, attempt.genre, ranked_score)
+            db.session.commit()
+            leaderboard.publish_result(user_id, totals)
+        elif claimed:
+            db.session.commit()
+        else:
+            db.session.rollback()
+        db.session.refresh(attempt)
+
+    genre_rank, genre_score = leaderboard.get_rank(user_id, attempt.genre)
+    global_rank, global_score = leaderboard.get_rank(user_id)
+    return {
+        'score': attempt.score,
+        'total': attempt.question_count,
+        'ranked': ranked,
+        'genre_rank': genre_rank,
+        'genre_score': genre_score,
+        'global_rank': global_rank,
+        'global_score': global_score
+    }
@@ -1,5 +1,5 @@
 from main import app, db
-from models import User, EmailVerificationToken, PasswordResetToken
+from models import User, EmailVerificationToken, PasswordResetToken, QuizAttempt, QuizAnswer, LeaderboardEntry
 
 def reset_database():
     with app.app_context():
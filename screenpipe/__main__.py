@@ -0,0 +1,56 @@
+"""
+Maintenance commands for screen recordings.
+
+    python -m screenpipe rebuild-catalog
+    python -m screenpipe reindex [RECORDING_ID ...]
+    python -m screenpipe postprocess [RECORDING_ID ...]
+"""
+
+import os
+import sys
+import argparse
+
+from . import screenpipe, postprocess
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m screenpipe', description='Screen recording maintenance.')
+    parser.add_argument('command', choices=['rebuild-catalog', 'reindex', 'postprocess'],
+                        help='rebuild-catalog: reconstruct the recording catalog from the info.json files on disk; '
+                             'reindex: add Cues and Duration to finished recordings; '
+                             'postprocess: remux and render thumbnails of finished recordings')
+    parser.add_argument('recording_ids', nargs='*', help='Recordings to process (default: all completed)')
+    args = parser.parse_args()
+
+    if args.command == 'rebuild-catalog':
+        count = screenpipe.rebuild_catalog()
+        print(f"Catalogued {count} recording sessions from {screenpipe.RECORDINGS_DIR}")
+        return 0
+
+    recording_ids = args.recording_ids
+    if not recording_ids:
+        recording_ids, cursor = [], None
+        while True:
+            recordings, cursor = screenpipe.list_recordings(limit=screenpipe.MAX_PAGE_SIZE, cursor=cursor)
+            recording_ids += [recording['recording_id'] for recording in recordings]
+            if not cursor:
+                break
+    for recording_id in recording_ids:
+        if args.command == 'reindex':
+            summary = screenpipe.reindex_recording(recording_id)
+            if summary:
+                print(f"{recording_id}: {summary['duration']:.2f}s, {summary['clusters']} clusters, {summary['cues']} cues")
+            continue
+
+        # Runs in this process, one recording at a time
+        info = screenpipe.get_recording_info(recording_id) or {}
+        outputs, errors = postprocess.process(screenpipe.recording_path(recording_id),
+                                              os.path.join(screenpipe.RECORDINGS_DIR, recording_id),
+                                              info.get('media_duration') or info.get('duration'))
+        screenpipe.record_outputs(recording_id, outputs, errors)
+        print(f"{recording_id}: {', '.join(outputs) or 'no outputs'}" + (f" ({', '.join(errors)} failed)" if errors else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
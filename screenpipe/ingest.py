@@ -0,0 +1,139 @@
+"""
+Socket.IO ingest channel for screen recordings.
+A recorder keeps one connection open on the /screenpipe namespace and emits binary
+chunks with sequence numbers instead of POSTing them. Chunks go onto a bounded
+per-connection write queue that a background task drains into the session's output
+file; once written, the server emits `written` with the next expected sequence number
+and the free queue slots (credits). The recorder never has more unacknowledged chunks
+in flight than it has credits, so a slow disk pushes back on the client instead of
+piling up in memory.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+
+import socketio
+
+from . import screenpipe
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = '/screenpipe'
+
+# Chunks a connection may have queued for writing
+WRITE_QUEUE_CHUNKS = int(os.getenv('SCREENPIPE_WS_QUEUE_CHUNKS', 16))
+
+sio = socketio.Server(
+    async_mode=os.getenv('SCREENPIPE_SOCKETIO_ASYNC_MODE') or None,
+    max_http_buffer_size=screenpipe.MAX_BATCH_BYTES,
+)
+
+
+def _run_blocking(fn, *args):
+    """Run disk I/O in a real OS thread when serving with eventlet, so fsync never stalls the hub."""
+    if sio.async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+    return fn(*args)
+
+
+def _runs(items):
+    """Split (seq, data) items into runs of consecutive sequence numbers."""
+    runs = []
+    for seq, data in items:
+        if runs and runs[-1][0] + len(runs[-1][1]) == seq:
+            runs[-1][1].append(data)
+        else:
+            runs.append((seq, [data]))
+    return runs
+
+
+class IngestStream:
+    """Write queue of one connection streaming into one session."""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.queue = deque()
+        self.draining = False
+        self.lock = threading.Lock()
+
+
+class RecordingNamespace(socketio.Namespace):
+    """Events: `start` attaches a connection to a session, `chunk` queues one chunk."""
+
+    def __init__(self, namespace=NAMESPACE):
+        super().__init__(namespace)
+        self._streams = {}
+
+    def on_start(self, sid, data):
+        session_id = (data or {}).get('session_id')
+        # A reconnecting recorder resumes from whatever the server already has
+        next_seq = screenpipe.next_sequence(session_id) if session_id else None
+        if next_seq is None:
+            return {'success': False, 'message': 'Unknown session'}
+
+        self._streams[sid] = IngestStream(session_id)
+        logger.debug(f"Socket {sid} streaming into session {session_id} from chunk {next_seq}")
+        return {'success': True, 'next_seq': next_seq, 'credits': WRITE_QUEUE_CHUNKS}
+
+    def on_chunk(self, sid, data):
+        stream = self._streams.get(sid)
+        if stream is None:
+            return {'success': False, 'message': 'Send start first'}
+
+        seq = (data or {}).get('seq')
+        chunk = (data or {}).get('data')
+        if not isinstance(seq, int) or not isinstance(chunk, (bytes, bytearray)):
+            return {'success': False, 'message': 'Invalid chunk'}
+
+        with stream.lock:
+            if len(stream.queue) >= WRITE_QUEUE_CHUNKS:
+                # Client ignored its credits; it must resend from this chunk
+                return {'success': False, 'retry': True, 'queued': len(stream.queue)}
+            stream.queue.append((seq, bytes(chunk)))
+            queued = len(stream.queue)
+            start_drain = not stream.draining
+            stream.draining = True
+
+        if start_drain:
+            self.server.start_background_task(self._drain, sid, stream)
+        return {'success': True, 'queued': queued}
+
+    def _drain(self, sid, stream):
+        """Write queued chunks in batches and report progress after each batch."""
+        while True:
+            with stream.lock:
+                if not stream.queue:
+                    stream.draining = False
+                    return
+                items = list(stream.queue)
+                stream.queue.clear()
+
+            next_seq = None
+            for first_seq, chunks in _runs(items):
+                next_seq = _run_blocking(screenpipe.save_recording_batch, stream.session_id, chunks, first_seq)
+                if next_seq is None:
+                    break
+
+            with stream.lock:
+                queued = len(stream.queue)
+            if next_seq is None:
+                self.emit('ingest_error', {'message': 'Failed to write chunks'}, to=sid)
+            else:
+                self.emit('written', {'next_seq': next_seq, 'queued': queued,
+                                      'credits': WRITE_QUEUE_CHUNKS - queued}, to=sid)
+
+    def on_disconnect(self, sid):
+        # The session stays open; the recorder can reconnect or fall back to HTTP uploads
+        self._streams.pop(sid, None)
+
+
+sio.register_namespace(RecordingNamespace())
+
+
+def init_socketio(app):
+    """Serve the Socket.IO endpoint (/socket.io) in front of the Flask app."""
+    app.wsgi_app = socketio.WSGIApp(sio, app.wsgi_app)
+    return sio
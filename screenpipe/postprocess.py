@@ -0,0 +1,165 @@
+"""
+Post-processing of finished recordings with ffmpeg.
+Each recording is remuxed (no re-encode) into an MP4 with its index at the front, and
+gets a poster frame and a sprite sheet of thumbnails for the recordings page. The work
+is done by single-threaded ffmpeg processes at reduced priority, started from a small
+thread pool sized from the CPU count shared by all web workers, and at most a bounded
+number of recordings wait for it, so post-processing never competes with the web workers
+for more than a fraction of the machine. No Python worker processes are started, so
+nothing re-imports the application.
+"""
+
+import os
+import shutil
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg binary; the same one pydub uses for audio
+FFMPEG = os.getenv('SCREENPIPE_FFMPEG', 'ffmpeg')
+
+# Web worker processes, each with its own pool (gunicorn reads the same variable)
+WEB_WORKERS = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+
+# Concurrent ffmpeg runs per web worker; defaults to a quarter of the CPUs across all of them
+WORKERS = int(os.getenv('SCREENPIPE_POSTPROCESS_WORKERS', 0)) or max(1, (os.cpu_count() or 1) // 4 // WEB_WORKERS)
+
+# Recordings that may wait for a worker; further ones are skipped
+QUEUE = int(os.getenv('SCREENPIPE_POSTPROCESS_QUEUE', 16))
+
+# Niceness added to ffmpeg processes
+NICE = int(os.getenv('SCREENPIPE_POSTPROCESS_NICE', 10))
+
+# Seconds one ffmpeg run may take
+TIMEOUT = float(os.getenv('SCREENPIPE_POSTPROCESS_TIMEOUT', 600))
+
+POSTER_WIDTH = 640
+SPRITE_TILE_WIDTH = 160
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 5
+
+REMUX_NAME = 'remux.mp4'
+POSTER_NAME = 'poster.jpg'
+SPRITE_NAME = 'sprite.jpg'
+
+
+def available():
+    """Whether ffmpeg can be found."""
+    return shutil.which(FFMPEG) is not None
+
+
+def _lower_priority(pid):
+    # Set from the parent: preexec_fn is not safe in a process with threads
+    try:
+        os.setpriority(os.PRIO_PROCESS, pid, min(os.getpriority(os.PRIO_PROCESS, pid) + NICE, 19))
+    except OSError as e:
+        logger.debug(f"Could not lower the priority of ffmpeg: {str(e)}")
+
+
+def _ffmpeg(*args):
+    with subprocess.Popen([FFMPEG, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', *args],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) as proc:
+        _lower_priority(proc.pid)
+        try:
+            _, stderr = proc.communicate(timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args, stderr=stderr)
+
+
+def _describe(error):
+    """ffmpeg's own message for a failed run, or the exception text."""
+    stderr = getattr(error, 'stderr', None)
+    if stderr:
+        return stderr.decode('utf-8', 'replace').strip()[-500:]
+    return str(error)
+
+
+def _replace_from(temp_path, path):
+    os.replace(temp_path, path)
+    return os.path.basename(path)
+
+
+def process(source, output_dir, duration=None):
+    """
+    Produce the remux, poster and sprite of one recording; runs on a pool thread.
+    Returns the outputs that were created and the errors of those that were not.
+    """
+    outputs, errors = {}, {}
+    duration = duration or 0
+
+    # Stream copy only: the container changes, the encoded frames do not
+    remux_path = os.path.join(output_dir, REMUX_NAME)
+    try:
+        _ffmpeg('-i', source, '-map', '0', '-c', 'copy', '-threads', '1', '-movflags', '+faststart',
+                '-f', 'mp4', f"{remux_path}.tmp")
+        outputs['remux'] = _replace_from(f"{remux_path}.tmp", remux_path)
+    except (OSError, subprocess.SubprocessError) as e:
+        errors['remux'] = _describe(e)
+
+    poster_path = os.path.join(output_dir, POSTER_NAME)
+    try:
+        _ffmpeg('-ss', f"{min(1.0, duration / 2):.3f}", '-i', source, '-frames:v', '1', '-threads', '1',
+                '-vf', f"scale={POSTER_WIDTH}:-2", '-f', 'image2', f"{poster_path}.tmp")
+        outputs['poster'] = _replace_from(f"{poster_path}.tmp", poster_path)
+    except (OSError, subprocess.SubprocessError) as e:
+        errors['poster'] = _describe(e)
+
+    # One tile every `interval` seconds, spread over the whole recording
+    tiles = SPRITE_COLUMNS * SPRITE_ROWS
+    interval = max(duration / tiles, 1.0)
+    sprite_path = os.path.join(output_dir, SPRITE_NAME)
+    try:
+        _ffmpeg('-i', source, '-frames:v', '1', '-threads', '1',
+                '-vf', f"fps=1/{interval:.3f},scale={SPRITE_TILE_WIDTH}:-2,tile={SPRITE_COLUMNS}x{SPRITE_ROWS}",
+                '-f', 'image2', f"{sprite_path}.tmp")
+        outputs['sprite'] = _replace_from(f"{sprite_path}.tmp", sprite_path)
+        outputs['sprite_layout'] = {
+            'columns': SPRITE_COLUMNS,
+            'rows': SPRITE_ROWS,
+            'tile_width': SPRITE_TILE_WIDTH,
+            'interval': interval
+        }
+    except (OSError, subprocess.SubprocessError) as e:
+        errors['sprite'] = _describe(e)
+
+    return outputs, errors
+
+
+class PostProcessor:
+    """Bounded thread pool feeding finished recordings through `process`."""
+
+    def __init__(self, on_done, workers=WORKERS, queue=QUEUE):
+        self.on_done = on_done
+        self._slots = threading.BoundedSemaphore(queue)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='screenpipe-postprocess')
+
+    def submit(self, recording_id, source, output_dir, duration=None):
+        """Queue a recording; returns False if the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"Post-processing queue full, skipping recording {recording_id}")
+            return False
+
+        def done(future):
+            self._slots.release()
+            try:
+                outputs, errors = future.result()
+            except Exception as e:
+                outputs, errors = {}, {'worker': str(e)}
+            for name, error in errors.items():
+                logger.warning(f"Post-processing {name} of recording {recording_id} failed: {error}")
+            self.on_done(recording_id, outputs, errors)
+
+        try:
+            future = self._pool.submit(process, source, output_dir, duration)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        future.add_done_callback(done)
+        return True
@@ -0,0 +1,317 @@
+"""
+Recording session registry shared by every worker process.
+Sessions live in a SQLite database in WAL mode next to the recordings. Appending chunks
+takes two short transactions: the first reads the session's committed sequence number
+and size and reserves the session for this writer, the data is written at that offset
+with no database lock held, and the second commits the new values if the reservation is
+still ours. Chunk sequence allocation is therefore atomic across workers, any worker can
+accept chunks for any session, and writes to different sessions never wait for each
+other. The committed size doubles as the crash-recovery journal: bytes past it were
+never acknowledged and are overwritten or trimmed.
+
+Each write also renews a lease naming the writing process. Sessions whose lease ran out
+long ago belong to recorders that went away and can be finalized by any worker; the
+same goes for sessions left in processing by a worker that died while finalizing. The
+finalizing worker renews its lease while the session is queued and while it runs.
+
+The same table is the recording catalog: every info.json write is mirrored into it, and
+listings are keyset-paginated over (status, sort key, session_id) indexes, or (sort key,
+session_id) ones when no status is given, so a page costs the same however many
+recordings exist.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    game_id TEXT,
+    status TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    next_seq INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    end_time TEXT,
+    duration REAL,
+    info TEXT,
+    write_token TEXT,
+    write_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS ix_sessions_status_lease ON sessions (status, lease_expires);
+CREATE INDEX IF NOT EXISTS ix_sessions_status_start ON sessions (status, start_time, session_id);
+CREATE INDEX IF NOT EXISTS ix_sessions_status_duration ON sessions (status, duration, session_id);
+CREATE INDEX IF NOT EXISTS ix_sessions_game_start ON sessions (game_id, start_time, session_id);
+CREATE INDEX IF NOT EXISTS ix_sessions_start ON sessions (start_time, session_id);
+CREATE INDEX IF NOT EXISTS ix_sessions_duration ON sessions (duration, session_id);
+"""
+
+# Catalog and write reservation columns added after the first version of the table
+ADDED_COLUMNS = (('end_time', 'TEXT'), ('duration', 'REAL'), ('info', 'TEXT'),
+                 ('write_token', 'TEXT'), ('write_until', 'REAL NOT NULL DEFAULT 0'))
+
+# Listing sort keys and the column each one orders by
+SORT_COLUMNS = {'start_time': 'start_time', 'duration': 'duration'}
+
+# Seconds a worker keeps ownership of a session after its last write
+LEASE_SECONDS = float(os.getenv('SCREENPIPE_LEASE_SECONDS', 30))
+
+# Seconds a chunk write may hold its reservation before others may take the session over
+WRITE_RESERVE_SECONDS = LEASE_SECONDS
+
+# Seconds between checks while another writer holds a session's reservation
+WRITE_WAIT_SECONDS = 0.01
+
+# Identifies this worker process in leases
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SessionRegistry:
+    """Session rows with atomic sequence allocation and write leases."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(sessions)')}
+        for name, column_type in ADDED_COLUMNS:
+            if name not in columns:
+                conn.execute(f'ALTER TABLE sessions ADD COLUMN {name} {column_type}')
+        conn.executescript(INDEXES)
+
+    def _conn(self):
+        """Per-thread connection in autocommit mode; transactions are opened explicitly."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, session_id, game_id, start_time):
+        """Register a new session, or restart an existing one that never received a chunk."""
+        self._conn().execute(
+            "INSERT INTO sessions (session_id, game_id, status, start_time, owner, lease_expires) "
+            "VALUES (?, ?, 'recording', ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET game_id = excluded.game_id, status = excluded.status, "
+            "start_time = excluded.start_time, owner = excluded.owner, lease_expires = excluded.lease_expires "
+            "WHERE sessions.next_seq = 0",
+            (session_id, game_id, start_time, OWNER, time.time() + LEASE_SECONDS))
+
+    def get(self, session_id):
+        row = self._conn().execute('SELECT * FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def append(self, session_id, chunks, first_seq, write):
+        """
+        Append chunks to a recording session.
+        `write(offset, first_seq, chunks)` is called between the reserving and the committing
+        transaction to put the bytes on disk. With first_seq, chunks already committed are
+        skipped and nothing is written if earlier chunks are missing. Returns the next
+        expected sequence number, or None if the session does not exist or is no longer
+        recording.
+        """
+        conn = self._conn()
+        token = uuid.uuid4().hex
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute("SELECT next_seq, size, write_until FROM sessions "
+                                   "WHERE session_id = ? AND status = 'recording'", (session_id,)).fetchone()
+                if row is None:
+                    conn.execute('ROLLBACK')
+                    return None
+
+                next_seq, size = row['next_seq'], row['size']
+                pending = chunks
+                if first_seq is not None:
+                    pending = chunks[next_seq - first_seq:] if first_seq <= next_seq else []
+                now = time.time()
+                if pending and row['write_until'] > now:
+                    # Another writer is between its reservation and its commit
+                    conn.execute('ROLLBACK')
+                    time.sleep(WRITE_WAIT_SECONDS)
+                    continue
+
+                if pending:
+                    conn.execute('UPDATE sessions SET write_token = ?, write_until = ?, owner = ?, lease_expires = ? '
+                                 'WHERE session_id = ?',
+                                 (token, now + WRITE_RESERVE_SECONDS, OWNER, now + LEASE_SECONDS, session_id))
+                else:
+                    conn.execute('UPDATE sessions SET owner = ?, lease_expires = ? WHERE session_id = ?',
+                                 (OWNER, now + LEASE_SECONDS, session_id))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            if not pending:
+                return next_seq
+
+            try:
+                write(size, next_seq, pending)
+            except BaseException:
+                conn.execute('UPDATE sessions SET write_token = NULL, write_until = 0 '
+                             'WHERE session_id = ? AND write_token = ?', (session_id, token))
+                raise
+
+            next_seq += len(pending)
+            size += sum(len(chunk) for chunk in pending)
+            committed = conn.execute(
+                "UPDATE sessions SET next_seq = ?, size = ?, write_token = NULL, write_until = 0, owner = ?, "
+                "lease_expires = ? WHERE session_id = ? AND write_token = ? AND status = 'recording'",
+                (next_seq, size, OWNER, time.time() + LEASE_SECONDS, session_id, token)).rowcount
+            if committed:
+                return next_seq
+            # The reservation ran out and another writer took over; start again from what it committed
+
+    def begin_finalize(self, session_id, end_time):
+        """
+        Atomically move a recording session to processing; returns its row if this call won.
+        A chunk write in progress is waited for, so no bytes land after the session stops.
+        """
+        while True:
+            now = time.time()
+            updated = self._conn().execute(
+                "UPDATE sessions SET status = 'processing', end_time = ?, owner = ?, lease_expires = ? "
+                "WHERE session_id = ? AND status = 'recording' AND write_until <= ?",
+                (end_time, OWNER, now + LEASE_SECONDS, session_id, now)).rowcount
+            if updated:
+                return self.get(session_id)
+            session = self.get(session_id)
+            if session is None or session['status'] != 'recording':
+                return None
+            time.sleep(WRITE_WAIT_SECONDS)
+
+    def reclaim(self, session_id):
+        """Take over a session whose processing worker let its lease run out; returns its row if this call won."""
+        now = time.time()
+        updated = self._conn().execute(
+            "UPDATE sessions SET owner = ?, lease_expires = ? "
+            "WHERE session_id = ? AND status = 'processing' AND lease_expires < ?",
+            (OWNER, now + LEASE_SECONDS, session_id, now)).rowcount
+        return self.get(session_id) if updated else None
+
+    def renew(self, session_id):
+        """Extend this worker's lease on a session it is processing; returns False if it lost the session."""
+        return self._conn().execute(
+            "UPDATE sessions SET lease_expires = ? WHERE session_id = ? AND status = 'processing' AND owner = ?",
+            (time.time() + LEASE_SECONDS, session_id, OWNER)).rowcount > 0
+
+    def set_status(self, session_id, status):
+        self._conn().execute('UPDATE sessions SET status = ? WHERE session_id = ?', (status, session_id))
+
+    def expired(self, status, idle_seconds=0):
+        """Ids of sessions in a status whose lease expired more than idle_seconds ago."""
+        rows = self._conn().execute(
+            'SELECT session_id FROM sessions WHERE status = ? AND lease_expires < ?',
+            (status, time.time() - idle_seconds))
+        return [row['session_id'] for row in rows]
+
+    def save_info(self, info):
+        """Mirror a session's info.json into the catalog; live write state is left alone."""
+        self._conn().execute(
+            "INSERT INTO sessions (session_id, game_id, status, start_time, next_seq, end_time, duration, info) "
+            "VALUES (:session_id, :game_id, :status, :start_time, :chunks, :end_time, :duration, :info) "
+            "ON CONFLICT(session_id) DO UPDATE SET game_id = excluded.game_id, "
+            # A session being finalized still says "recording" on disk
+            "status = CASE WHEN sessions.status = 'processing' AND excluded.status = 'recording' "
+            "THEN sessions.status ELSE excluded.status END, "
+            "start_time = excluded.start_time, end_time = excluded.end_time, duration = excluded.duration, "
+            "info = excluded.info",
+            {
+                'session_id': info['session_id'],
+                'game_id': info.get('game_id'),
+                'status': info.get('status') or 'completed',
+                'start_time': info.get('start_time') or '',
+                'chunks': info.get('chunks') or 0,
+                'end_time': info.get('end_time'),
+                'duration': info.get('duration'),
+                'info': json.dumps(info)
+            })
+
+    def catalogued(self):
+        """Whether any session has a catalog entry yet."""
+        return self._conn().execute('SELECT 1 FROM sessions WHERE info IS NOT NULL LIMIT 1').fetchone() is not None
+
+    def get_info(self, session_id):
+        """The catalogued info.json of a session, or None."""
+        row = self._conn().execute('SELECT info FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return json.loads(row['info']) if row and row['info'] else None
+
+    def list(self, status=None, game_id=None, since=None, until=None, sort='start_time', descending=True,
+             limit=50, after=None):
+        """
+        One page of catalogued sessions, newest (or longest) first by default.
+        `after` is the (sort value, session_id) of the last row of the previous page; sorting
+        by duration only lists sessions that have one. Returns (infos, after for the next page).
+        """
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f"Unknown sort key: {sort}")
+
+        clauses, params = ['info IS NOT NULL'], []
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(status)
+        if game_id is not None:
+            clauses.append('game_id = ?')
+            params.append(game_id)
+        if since is not None:
+            clauses.append('start_time >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('start_time < ?')
+            params.append(until)
+        if column == 'duration':
+            clauses.append('duration IS NOT NULL')
+        if after is not None:
+            clauses.append(f"({column}, session_id) {'<' if descending else '>'} (?, ?)")
+            params += list(after)
+
+        direction = 'DESC' if descending else 'ASC'
+        rows = self._conn().execute(
+            f"SELECT session_id, {column} AS sort_value, info FROM sessions WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {column} {direction}, session_id {direction} LIMIT ?",
+            params + [limit + 1]).fetchall()
+
+        next_after = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_after = (rows[-1]['sort_value'], rows[-1]['session_id'])
+        return [json.loads(row['info']) for row in rows], next_after
+
+    def rebuild(self, infos):
+        """Replace the catalog with the given info.json contents, keeping live write state."""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS rebuild_ids (session_id TEXT PRIMARY KEY)')
+            conn.execute('DELETE FROM rebuild_ids')
+            count = 0
+            for info in infos:
+                self.save_info(info)
+                conn.execute('INSERT OR IGNORE INTO rebuild_ids VALUES (?)', (info['session_id'],))
+                count += 1
+            # Sessions whose directory is gone
+            conn.execute('DELETE FROM sessions WHERE session_id NOT IN (SELECT session_id FROM rebuild_ids)')
+            conn.execute('COMMIT')
+            return count
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, session_id):
+        self._conn().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
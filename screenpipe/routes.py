@@ -1,8 +1,11 @@
 
 import os
+import time
+import logging
 from flask import request, jsonify, send_file, render_template, abort
 from werkzeug.utils import secure_filename
 from . import screenpipe
+from .streaming import send_recording, stream_live
 
 def register_routes(app):
     """Register screen recording routes with Flask app."""
@@ -11,6 +14,19 @@ def register_routes(app):
     if not os.path.exists(screenpipe.RECORDINGS_DIR):
         os.makedirs(screenpipe.RECORDINGS_DIR, exist_ok=True)
     
+    # Persistent Socket.IO channel for chunk uploads (HTTP uploads keep working without it)
+    try:
+        from .ingest import init_socketio
+        init_socketio(app)
+    except ImportError as e:
+        logging.warning(f"Socket.IO ingest unavailable: {str(e)}")
+    
+    # Finish sessions a previous run left unfinalized
+    try:
+        screenpipe.resume_finalization()
+    except Exception as e:
+        logging.error(f"Could not resume recording finalization: {str(e)}")
+    
     @app.route('/screenshare/start_recording', methods=['POST'])
     def start_recording():
         """Start a new recording session."""
@@ -29,12 +45,29 @@ def register_routes(app):
         return jsonify({
             'success': True,
             'session_id': session_id,
-            'message': 'Recording session started'
+            'message': 'Recording session started',
+            'upload': screenpipe.upload_settings(data.get('timeslice_ms'))
         })
     
     @app.route('/screenshare/upload_chunk', methods=['POST'])
     def upload_chunk():
-        """Upload a video chunk."""
+        """
+        Upload one video chunk, or a batch of them as repeated video_chunk parts.
+        Batches carry `seq`, the sequence number of their first chunk, which makes retries safe.
+        Requests over the advertised max_batch_bytes / max_batch_chunks are refused with 413.
+        """
+        # Checked before the body is parsed, so oversized uploads are never buffered
+        if request.content_length is None:
+            return jsonify({
+                'success': False,
+                'message': 'Content-Length required'
+            }), 411
+        if request.content_length > screenpipe.MAX_BATCH_BYTES + screenpipe.MULTIPART_OVERHEAD_BYTES:
+            return jsonify({
+                'success': False,
+                'message': f'Upload exceeds {screenpipe.MAX_BATCH_BYTES} bytes'
+            }), 413
+        
         if 'video_chunk' not in request.files:
             return jsonify({
                 'success': False,
@@ -48,19 +81,59 @@ def register_routes(app):
                 'message': 'Missing session_id'
             }), 400
         
-        video_chunk = request.files['video_chunk']
-        if video_chunk.filename == '':
+        video_chunks = request.files.getlist('video_chunk')
+        if any(video_chunk.filename == '' for video_chunk in video_chunks):
             return jsonify({
                 'success': False,
                 'message': 'Empty filename'
             }), 400
+        if len(video_chunks) > screenpipe.MAX_BATCH_CHUNKS:
+            return jsonify({
+                'success': False,
+                'message': f'Batch exceeds {screenpipe.MAX_BATCH_CHUNKS} chunks'
+            }), 413
+        
+        first_seq = request.form.get('seq', type=int)
+        if len(video_chunks) == 1 and first_seq is None:
+            chunk_data = video_chunks[0].read()
+            success = screenpipe.save_recording_chunk(session_id, chunk_data)
+            
+            return jsonify({
+                'success': success,
+                'message': 'Chunk uploaded' if success else 'Failed to process chunk'
+            })
+        
+        chunks = [video_chunk.read() for video_chunk in video_chunks]
+        if sum(len(chunk) for chunk in chunks) > screenpipe.MAX_BATCH_BYTES:
+            return jsonify({
+                'success': False,
+                'message': f'Upload exceeds {screenpipe.MAX_BATCH_BYTES} bytes'
+            }), 413
+        
+        started = time.monotonic()
+        next_seq = screenpipe.save_recording_batch(session_id, chunks, first_seq)
+        write_ms = round((time.monotonic() - started) * 1000, 1)
         
-        chunk_data = video_chunk.read()
-        success = screenpipe.save_recording_chunk(session_id, chunk_data)
+        if next_seq is None:
+            return jsonify({
+                'success': False,
+                'message': 'Failed to process chunks'
+            })
+        
+        if first_seq is not None and next_seq < first_seq + len(chunks):
+            # Chunks before this batch never arrived; tell the client where to resume
+            return jsonify({
+                'success': False,
+                'message': 'Missing earlier chunks',
+                'next_seq': next_seq
+            }), 409
         
         return jsonify({
-            'success': success,
-            'message': 'Chunk uploaded' if success else 'Failed to process chunk'
+            'success': True,
+            'message': f'{len(chunks)} chunks uploaded',
+            'next_seq': next_seq,
+            'received_bytes': sum(len(chunk) for chunk in chunks),
+            'write_ms': write_ms
         })
     
     @app.route('/screenshare/stop_recording', methods=['POST'])
@@ -75,19 +148,47 @@ def register_routes(app):
                 'message': 'Missing session_id'
             }), 400
         
-        recording_id = screenpipe.finalize_recording(session_id)
-        
-        if recording_id:
-            return jsonify({
-                'success': True,
-                'recording_id': recording_id,
-                'message': 'Recording session stopped and processed'
+        # Finalization runs in the background; poll the status URL for the outcome
+        try:
+            status = screenpipe.request_finalize(session_id)
+        except screenpipe.FinalizeQueueFull:
+            # The session keeps recording; the recorder retries the stop
+            response = jsonify({
+                'success': False,
+                'recording_id': session_id,
+                'status': 'recording',
+                'message': 'Too many recordings are being finalized. Please try again shortly.'
             })
-        else:
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        
+        if not status:
             return jsonify({
                 'success': False,
                 'message': 'Failed to finalize recording'
             })
+        
+        return jsonify({
+            'success': status['status'] != 'error',
+            'recording_id': session_id,
+            'status': status['status'],
+            'status_url': f'/screenshare/status/{session_id}',
+            'message': status.get('error') or 'Recording session stopped'
+        }), 202 if status['status'] == 'processing' else 200
+    
+    @app.route('/screenshare/status/<recording_id>')
+    def recording_status(recording_id):
+        """Processing status of a recording: recording, processing, completed or error."""
+        status = screenpipe.get_recording_status(recording_id)
+        
+        if not status:
+            return jsonify({
+                'success': False,
+                'message': 'Recording not found'
+            }), 404
+        
+        return jsonify(dict(status, success=True))
     
     @app.route('/screenshare/view/<recording_id>')
     def view_recording(recording_id):
@@ -128,7 +229,7 @@ def register_routes(app):
             abort(404)
         
         filename = f"gameplay_{recording_id}.webm"
-        return send_file(file_path, as_attachment=True, download_name=filename)
+        return send_recording(file_path, download_name=filename)
     
     @app.route('/screenshare/video/<recording_id>')
     def serve_video(recording_id):
@@ -138,16 +239,85 @@ def register_routes(app):
         if not file_path or not os.path.exists(file_path):
             abort(404)
         
-        return send_file(file_path, mimetype='video/webm')
+        return send_recording(file_path)
+    
+    @app.route('/screenshare/asset/<recording_id>/<name>')
+    def recording_asset(recording_id, name):
+        """Serve a post-processing output of a recording: remux, poster or sprite."""
+        mimetypes = {'remux': 'video/mp4', 'poster': 'image/jpeg', 'sprite': 'image/jpeg'}
+        file_path = screenpipe.get_output_file(recording_id, name) if name in mimetypes else None
+        
+        if not file_path:
+            abort(404)
+        
+        return send_recording(file_path, mimetype=mimetypes[name])
+    
+    @app.route('/screenshare/seek/<recording_id>')
+    def seek_recording(recording_id):
+        """Byte offset of the cue at or before ?t=<seconds>, for players fetching ranges themselves."""
+        position = screenpipe.seek_offset(recording_id, request.args.get('t', 0, type=float))
+        
+        if not position:
+            return jsonify({
+                'success': False,
+                'message': 'Recording has no cue index'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'time': position[0],
+            'offset': position[1]
+        })
+    
+    @app.route('/screenshare/live/<recording_id>')
+    def live_video(recording_id):
+        """
+        Follow a recording while it is still being written.
+        Streams everything committed so far, then each new chunk, and ends once the
+        recording is finalized. Finished recordings are served like /screenshare/video.
+        """
+        status = screenpipe.get_recording_status(recording_id)
+        file_path = screenpipe.get_recording_file(recording_id)
+        
+        if not status or not file_path or not os.path.exists(file_path):
+            abort(404)
+        
+        if status['status'] not in ('recording', 'processing'):
+            return send_recording(file_path)
+        return stream_live(recording_id, max(request.args.get('offset', 0, type=int), 0))
+    
+    def recording_filters():
+        """Catalog filters and paging from the query string."""
+        return {
+            'status': request.args.get('status', 'completed'),
+            'game_id': request.args.get('game_id'),
+            'since': request.args.get('since'),
+            'until': request.args.get('until'),
+            'sort': request.args.get('sort', 'start_time'),
+            'order': request.args.get('order', 'desc'),
+            'limit': request.args.get('limit', screenpipe.DEFAULT_PAGE_SIZE, type=int),
+            'cursor': request.args.get('cursor')
+        }
     
     @app.route('/screenshare/list')
     def list_recordings():
-        """List all recordings."""
-        recordings = screenpipe.list_recordings()
+        """
+        List recordings, one page at a time.
+        Query: status (default completed, empty for all), game_id, since, until, sort
+        (start_time or duration), order (asc or desc), limit and the cursor of the previous page.
+        """
+        try:
+            recordings, next_cursor = screenpipe.list_recordings(**recording_filters())
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         
         return jsonify({
             'success': True,
-            'recordings': recordings
+            'recordings': recordings,
+            'next_cursor': next_cursor
         })
     
     @app.route('/screenshare/delete/<recording_id>', methods=['POST'])
@@ -168,6 +338,9 @@ def register_routes(app):
     @app.route('/screenshare')
     def screenshare_index():
         """Show screen recording management page."""
-        recordings = screenpipe.list_recordings()
+        try:
+            recordings, next_cursor = screenpipe.list_recordings(**recording_filters())
+        except ValueError:
+            abort(400)
         
-        return render_template('screenshare/index.html', recordings=recordings)
\ No newline at end of file
+        return render_template('screenshare/index.html', recordings=recordings, next_cursor=next_cursor)
\ No newline at end of file
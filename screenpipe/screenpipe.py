@@ -6,11 +6,17 @@ Handles saving and processing of screen recordings.
 import os
 import time
 import json
+import base64
 import shutil
 import logging
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
 from pathlib import Path
 
+from . import webm, postprocess
+from .registry import SessionRegistry, LEASE_SECONDS
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -22,8 +28,226 @@ RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), 'recordings')
 if not os.path.exists(RECORDINGS_DIR):
     os.makedirs(RECORDINGS_DIR, exist_ok=True)
     
-# Active recording sessions
-active_sessions = {}
+# When recording data is fsynced: "always" (every chunk), "interval" or "never"
+FSYNC_POLICY = os.getenv('SCREENPIPE_FSYNC', 'interval').lower()
+
+# Seconds between fsyncs with the "interval" policy
+FSYNC_INTERVAL = float(os.getenv('SCREENPIPE_FSYNC_INTERVAL', 1))
+
+# Also keep every chunk as its own file under chunks/ (debugging only)
+KEEP_CHUNKS = os.getenv('SCREENPIPE_KEEP_CHUNKS', 'false').lower() == 'true'
+
+# Upload settings advertised to recorders: MediaRecorder timeslice and chunks per upload
+TIMESLICE_MS = int(os.getenv('SCREENPIPE_TIMESLICE_MS', 1000))
+MIN_TIMESLICE_MS = 250
+MAX_TIMESLICE_MS = 5000
+BATCH_CHUNKS = int(os.getenv('SCREENPIPE_BATCH_CHUNKS', 5))
+MAX_BATCH_CHUNKS = int(os.getenv('SCREENPIPE_MAX_BATCH_CHUNKS', 20))
+MAX_BATCH_BYTES = int(os.getenv('SCREENPIPE_MAX_BATCH_BYTES', 4 * 1024 * 1024))
+# Room for the multipart boundaries, part headers and form fields around a full batch
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Recorders idle for this many seconds are considered gone and their sessions finalized
+ABANDON_SECONDS = float(os.getenv('SCREENPIPE_ABANDON_SECONDS', 600))
+
+# Writers this process has not used for this many seconds, or whose session stopped
+# recording (possibly on another worker), are closed by a periodic sweep
+WRITER_IDLE_SECONDS = float(os.getenv('SCREENPIPE_WRITER_IDLE_SECONDS', 60))
+
+# Background finalization: worker threads, sessions that may wait for one, and retries on I/O errors
+FINALIZE_WORKERS = int(os.getenv('SCREENPIPE_FINALIZE_WORKERS', 2))
+FINALIZE_QUEUE = int(os.getenv('SCREENPIPE_FINALIZE_QUEUE', 32))
+FINALIZE_RETRIES = int(os.getenv('SCREENPIPE_FINALIZE_RETRIES', 3))
+FINALIZE_RETRY_DELAY = float(os.getenv('SCREENPIPE_FINALIZE_RETRY_DELAY', 1))
+
+# Rewrite finished recordings with Cues and Duration so players can seek them
+CUE_INDEX = os.getenv('SCREENPIPE_CUE_INDEX', 'true').lower() == 'true'
+
+# Remux finished recordings and render poster and sprite thumbnails with ffmpeg
+POSTPROCESS = os.getenv('SCREENPIPE_POSTPROCESS', 'true').lower() == 'true'
+
+# Recordings per listing page
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Open writers of this process, by session id
+_writers = {}
+_writers_lock = threading.Lock()
+_writer_sweeper_pid = None
+
+_registry = None
+_registry_lock = threading.Lock()
+
+# Sessions this process has claimed for finalization, queued or running; their leases are kept renewed
+_held_leases = set()
+_leases_lock = threading.Lock()
+_lease_renewer_pid = None
+
+_postprocessor = None
+_postprocessor_lock = threading.Lock()
+
+_finalize_pool = ThreadPoolExecutor(max_workers=FINALIZE_WORKERS, thread_name_prefix='screenpipe-finalize')
+_finalize_slots = threading.BoundedSemaphore(FINALIZE_QUEUE)
+
+def get_registry():
+    """Return the session registry shared by all worker processes."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            registry = SessionRegistry(os.getenv('SCREENPIPE_SESSIONS_DB') or os.path.join(RECORDINGS_DIR, 'sessions.db'))
+            # A new or pre-catalog database starts out from the recordings already on disk
+            if not registry.catalogued():
+                count = registry.rebuild(_catalog_infos())
+                logger.info(f"Catalogued {count} existing recording sessions from {RECORDINGS_DIR}")
+            _registry = registry
+        return _registry
+
+def recording_path(session_id):
+    """Path of a session's output file."""
+    return os.path.join(RECORDINGS_DIR, session_id, f'gameplay_{session_id}.webm')
+
+def cue_index_path(session_id):
+    """Path of a session's sidecar (time, byte offset) index."""
+    return os.path.join(RECORDINGS_DIR, session_id, 'cues.bin')
+
+def write_session_info(session_id, session_info):
+    """Atomically replace a session's info.json and update its catalog entry."""
+    info_path = os.path.join(RECORDINGS_DIR, session_id, 'info.json')
+    temp_path = f"{info_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(session_info, f, indent=2)
+    os.replace(temp_path, info_path)
+    get_registry().save_info(session_info)
+
+class FinalizeQueueFull(Exception):
+    """No finalize thread or queue slot is free; the session is left recording."""
+
+class WriterClosedError(OSError):
+    """The writer was closed by the sweep between being looked up and being used."""
+
+class RecordingWriter:
+    """
+    This process's handle on a session's output file.
+    Chunks are written at the offset the registry reserved for them, so writers in
+    different processes never overlap. Bytes past the committed size (a write that
+    crashed before its commit) are overwritten by the next write and trimmed when the
+    session is finalized.
+    """
+    
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.session_dir = os.path.join(RECORDINGS_DIR, session_id)
+        self.output_path = recording_path(session_id)
+        self._fd = os.open(self.output_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        self._synced_at = time.monotonic()
+        self.last_used = time.monotonic()
+        # Held while writing, so the sweep never closes the descriptor under a write
+        self._lock = threading.Lock()
+    
+    def write(self, offset, first_seq, chunks):
+        """Write chunks starting at offset; called by the registry while it holds the reservation."""
+        with self._lock:
+            if self._fd is None:
+                raise WriterClosedError(f"Writer of session {self.session_id} is closed")
+            self._write(offset, first_seq, chunks)
+            self.last_used = time.monotonic()
+    
+    def _write(self, offset, first_seq, chunks):
+        for chunk_data in chunks:
+            view = memoryview(chunk_data)
+            while view:
+                written = os.pwrite(self._fd, view, offset)
+                view = view[written:]
+                offset += written
+            
+            if KEEP_CHUNKS:
+                chunks_dir = os.path.join(self.session_dir, 'chunks')
+                os.makedirs(chunks_dir, exist_ok=True)
+                with open(os.path.join(chunks_dir, f'chunk_{first_seq:05d}.webm'), 'wb') as f:
+                    f.write(chunk_data)
+            first_seq += 1
+        
+        now = time.monotonic()
+        if FSYNC_POLICY == 'always' or (FSYNC_POLICY == 'interval' and now - self._synced_at >= FSYNC_INTERVAL):
+            # Data must be durable before the registry says it is committed
+            os.fsync(self._fd)
+            self._synced_at = now
+    
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+def get_writer(session_id):
+    """Return this process's writer for a session, opening it if needed."""
+    _ensure_writer_sweeper()
+    with _writers_lock:
+        writer = _writers.get(session_id)
+        if writer is None:
+            writer = _writers[session_id] = RecordingWriter(session_id)
+        return writer
+
+def sweep_writers():
+    """
+    Close writers that sat idle for WRITER_IDLE_SECONDS or whose session is no longer
+    recording, e.g. because another worker stopped it. Returns how many were closed.
+    """
+    with _writers_lock:
+        writers = list(_writers.items())
+    
+    registry = get_registry()
+    now = time.monotonic()
+    closed = 0
+    for session_id, writer in writers:
+        if now - writer.last_used < WRITER_IDLE_SECONDS:
+            session = registry.get(session_id)
+            if session and session['status'] == 'recording':
+                continue
+        with _writers_lock:
+            if _writers.get(session_id) is not writer:
+                continue
+            del _writers[session_id]
+        writer.close()
+        closed += 1
+    if closed:
+        logger.debug(f"Closed {closed} recording writers")
+    return closed
+
+def _run_writer_sweeper():
+    while True:
+        time.sleep(WRITER_IDLE_SECONDS)
+        try:
+            sweep_writers()
+        except Exception as e:
+            logger.error(f"Error sweeping recording writers: {str(e)}")
+
+def _ensure_writer_sweeper():
+    """Start the writer sweep thread in this process (once per pid, safe after fork)."""
+    global _writer_sweeper_pid
+    with _writers_lock:
+        if _writer_sweeper_pid == os.getpid():
+            return
+        _writer_sweeper_pid = os.getpid()
+    threading.Thread(target=_run_writer_sweeper, name='screenpipe-writer-sweep', daemon=True).start()
+
+def _close_writer(session_id):
+    with _writers_lock:
+        writer = _writers.pop(session_id, None)
+    if writer:
+        writer.close()
+
+def upload_settings(requested_timeslice=None):
+    """Negotiate how a recorder slices and batches its uploads."""
+    timeslice = TIMESLICE_MS
+    if isinstance(requested_timeslice, int):
+        timeslice = min(max(requested_timeslice, MIN_TIMESLICE_MS), MAX_TIMESLICE_MS)
+    return {
+        'timeslice_ms': timeslice,
+        'batch_chunks': min(BATCH_CHUNKS, MAX_BATCH_CHUNKS),
+        'max_batch_chunks': MAX_BATCH_CHUNKS,
+        'max_batch_bytes': MAX_BATCH_BYTES
+    }
 
 def init_recording_session(session_id, game_id=None):
     """Initialize a new recording session."""
@@ -31,10 +255,7 @@ def init_recording_session(session_id, game_id=None):
     
     # Create session directory
     session_dir = os.path.join(RECORDINGS_DIR, session_id)
-    chunks_dir = os.path.join(session_dir, 'chunks')
-    
     os.makedirs(session_dir, exist_ok=True)
-    os.makedirs(chunks_dir, exist_ok=True)
     
     # Create session metadata
     session_info = {
@@ -48,134 +269,360 @@ def init_recording_session(session_id, game_id=None):
         'file_path': None
     }
     
-    # Save session info
-    with open(os.path.join(session_dir, 'info.json'), 'w') as f:
-        json.dump(session_info, f, indent=2)
+    # Register the session for all workers and save its info
+    registry = get_registry()
+    registry.create(session_id, game_id, session_info['start_time'])
+    write_session_info(session_id, session_info)
     
-    # Store in active sessions
-    active_sessions[session_id] = session_info
+    resume_finalization()
     
     return session_info
 
-def save_recording_chunk(session_id, chunk_data):
-    """Save a recording chunk for the given session."""
-    if session_id not in active_sessions:
-        logger.warning(f"Trying to save chunk for unknown session: {session_id}")
-        return False
-    
+def next_sequence(session_id):
+    """Next chunk sequence number a session expects, or None if it is not recording."""
+    session = get_registry().get(session_id)
+    if not session or session['status'] != 'recording':
+        return None
+    return session['next_seq']
+
+def save_recording_batch(session_id, chunks, first_seq=None):
+    """
+    Append several chunks to a session in one commit.
+    Any worker may be handed any chunk; the registry serializes writers per session.
+    Returns the next chunk sequence number the session expects, or None on failure.
+    """
     try:
-        # Update session metadata
-        session_info = active_sessions[session_id]
-        chunk_number = session_info['chunks']
-        session_info['chunks'] += 1
-        
-        # Define chunk path
-        chunks_dir = os.path.join(RECORDINGS_DIR, session_id, 'chunks')
-        chunk_path = os.path.join(chunks_dir, f'chunk_{chunk_number:05d}.webm')
-        
-        # Save the chunk
-        with open(chunk_path, 'wb') as f:
-            f.write(chunk_data)
+        try:
+            writer = get_writer(session_id)
+            next_seq = get_registry().append(session_id, chunks, first_seq, writer.write)
+        except WriterClosedError:
+            # Swept between lookup and write; nothing was committed, so write through a fresh one
+            writer = get_writer(session_id)
+            next_seq = get_registry().append(session_id, chunks, first_seq, writer.write)
+        if next_seq is None:
+            logger.warning(f"Trying to save chunks for unknown session: {session_id}")
+            _close_writer(session_id)
+            return None
         
-        logger.debug(f"Saved chunk {chunk_number} for session {session_id}")
-        return True
+        logger.debug(f"Saved batch of {len(chunks)} chunks for session {session_id}, next {next_seq}")
+        return next_seq
     
     except Exception as e:
-        logger.error(f"Error saving chunk for session {session_id}: {str(e)}")
-        return False
+        logger.error(f"Error saving chunks for session {session_id}: {str(e)}")
+        return None
 
-def finalize_recording(session_id):
-    """Finalize a recording session by merging chunks and updating metadata."""
-    if session_id not in active_sessions:
-        logger.warning(f"Trying to finalize unknown session: {session_id}")
+def save_recording_chunk(session_id, chunk_data):
+    """Append a recording chunk to the given session's output file."""
+    return save_recording_batch(session_id, [chunk_data]) is not None
+
+def _finalize_claimed(session_id):
+    """Trim the output of a session this worker has claimed and mark it completed."""
+    session = get_registry().get(session_id)
+    session_info = get_recording_info(session_id) or {
+        'session_id': session_id,
+        'game_id': session['game_id'],
+        'start_time': session['start_time']
+    }
+    
+    # Chunks were appended as they arrived; only uncommitted bytes need dropping.
+    # A file an earlier attempt already rewrote no longer matches the committed size.
+    output_path = recording_path(session_id)
+    size = session['size']
+    rewritten = os.path.exists(output_path) and webm.is_seekable(output_path)
+    if os.path.exists(output_path) and not rewritten:
+        with open(output_path, 'r+b') as f:
+            actual = os.fstat(f.fileno()).st_size
+            if actual > size:
+                logger.warning(f"Discarding {actual - size} uncommitted bytes of session {session_id}")
+                f.truncate(size)
+            elif actual < size:
+                # Unsynced data lost by an OS crash; keep what actually reached the disk
+                size = actual
+            if FSYNC_POLICY != 'never':
+                os.fsync(f.fileno())
+    
+    # Update session info; the end is when stop was requested, not when processing ran
+    end_time = datetime.fromisoformat(session['end_time']) if session['end_time'] else datetime.now()
+    start_time = datetime.fromisoformat(session_info['start_time'])
+    session_info['end_time'] = end_time.isoformat()
+    session_info['duration'] = (end_time - start_time).total_seconds()
+    session_info['chunks'] = session['next_seq']
+    session_info['file_path'] = output_path
+    
+    if session['next_seq'] == 0:
+        # No chunks were saved
+        logger.warning(f"No video chunks were received for session {session_id}")
+        session_info['status'] = 'error'
+        session_info['error'] = 'No video chunks were received'
+        write_session_info(session_id, session_info)
         return None
     
+    if CUE_INDEX and not (rewritten and os.path.exists(cue_index_path(session_id))):
+        summary = index_recording(session_id)
+        if summary:
+            session_info['media_duration'] = summary['duration']
+            session_info['cues'] = summary['cues']
+    
+    # Mark as completed
+    session_info['status'] = 'completed'
+    write_session_info(session_id, session_info)
+    logger.debug(f"Finalized {session['next_seq']} chunks ({size} bytes) in {output_path}")
+    
+    # Return the recording ID (same as session ID in this case)
+    return session_id
+
+def _run_blocking(fn, *args):
+    """Run CPU- and disk-heavy work in a real OS thread when eventlet has patched threading, so it never stalls the hub."""
     try:
-        # Get session info
-        session_info = active_sessions[session_id]
-        session_dir = os.path.join(RECORDINGS_DIR, session_id)
-        chunks_dir = os.path.join(session_dir, 'chunks')
-        
-        # Update session info
-        end_time = datetime.now()
-        session_info['end_time'] = end_time.isoformat()
-        session_info['status'] = 'processing'
-        
-        # Calculate duration
-        start_time = datetime.fromisoformat(session_info['start_time'])
-        duration_seconds = (end_time - start_time).total_seconds()
-        session_info['duration'] = duration_seconds
-        
-        # Save updated session info
-        with open(os.path.join(session_dir, 'info.json'), 'w') as f:
-            json.dump(session_info, f, indent=2)
-        
-        # Concatenate video chunks if more than one chunk exists
-        output_path = os.path.join(session_dir, f'gameplay_{session_id}.webm')
-        session_info['file_path'] = output_path
+        from eventlet import patcher, tpool
+    except ImportError:
+        return fn(*args)
+    if patcher.is_monkey_patched('thread'):
+        return tpool.execute(fn, *args)
+    return fn(*args)
+
+def index_recording(session_id):
+    """Add Cues and Duration to a finished recording; returns a summary, or None if it cannot be indexed."""
+    try:
+        return _run_blocking(webm.make_seekable, recording_path(session_id), cue_index_path(session_id))
+    except webm.WebMError as e:
+        # The recording stays playable, just not seekable
+        logger.warning(f"Could not index recording {session_id}: {str(e)}")
+        return None
+
+def reindex_recording(recording_id):
+    """Index a finished recording again and update its info and catalog entry to match the file."""
+    summary = index_recording(recording_id)
+    info = get_recording_info(recording_id)
+    if summary and info and info.get('session_id'):
+        info['media_duration'] = summary['duration']
+        info['cues'] = summary['cues']
+        write_session_info(recording_id, info)
+    return summary
+
+def seek_offset(recording_id, seconds):
+    """(cue time in seconds, byte offset) to start playback of a recording at, or None without an index."""
+    index_path = cue_index_path(recording_id)
+    if not os.path.exists(index_path):
+        return None
+    return webm.offset_for_time(index_path, seconds)
+
+def _mark_failed(session_id, error):
+    registry = get_registry()
+    try:
+        session_info = get_recording_info(session_id) or {'session_id': session_id}
+        session_info['status'] = 'error'
+        session_info['error'] = error
+        write_session_info(session_id, session_info)
+    finally:
+        # The registry must leave processing even if info.json cannot be written
+        registry.set_status(session_id, 'error')
+
+def _process(session_id):
+    """Finalize a claimed session, retrying I/O errors with exponential backoff."""
+    _hold_lease(session_id)
+    try:
+        for attempt in range(FINALIZE_RETRIES + 1):
+            try:
+                recording_id = _finalize_claimed(session_id)
+                if recording_id:
+                    queue_postprocess(recording_id)
+                return recording_id
+            except OSError as e:
+                if attempt == FINALIZE_RETRIES:
+                    error = e
+                    break
+                logger.warning(f"Finalizing recording {session_id} failed ({str(e)}), retrying")
+                time.sleep(FINALIZE_RETRY_DELAY * 2 ** attempt)
+            except Exception as e:
+                error = e
+                break
         
-        if session_info['chunks'] > 0:
-            if session_info['chunks'] == 1:
-                # If only one chunk, just copy it
-                chunk_path = os.path.join(chunks_dir, f'chunk_00000.webm')
-                if os.path.exists(chunk_path):
-                    shutil.copy(chunk_path, output_path)
-                    logger.debug(f"Copied single chunk to {output_path}")
-                else:
-                    logger.error(f"Expected chunk file not found: {chunk_path}")
-                    return None
+        logger.error(f"Error finalizing recording {session_id}: {str(error)}")
+        _mark_failed(session_id, str(error))
+        return None
+    finally:
+        _release_lease(session_id)
+
+def _hold_lease(session_id):
+    """Keep renewing this process's lease on a claimed session until it is released."""
+    with _leases_lock:
+        _held_leases.add(session_id)
+    _ensure_lease_renewer()
+
+def _release_lease(session_id):
+    with _leases_lock:
+        _held_leases.discard(session_id)
+
+def renew_leases():
+    """Renew the leases of the sessions this process is finalizing or has queued for it."""
+    with _leases_lock:
+        session_ids = list(_held_leases)
+    
+    registry = get_registry()
+    for session_id in session_ids:
+        if not registry.renew(session_id):
+            # Another worker took the session over; stop claiming it
+            logger.warning(f"Lost the finalization lease of recording session {session_id}")
+            _release_lease(session_id)
+
+def _run_lease_renewer():
+    while True:
+        time.sleep(LEASE_SECONDS / 3)
+        try:
+            renew_leases()
+        except Exception as e:
+            logger.error(f"Error renewing finalization leases: {str(e)}")
+
+def _ensure_lease_renewer():
+    """Start the lease renewal thread in this process (once per pid, safe after fork)."""
+    global _lease_renewer_pid
+    with _leases_lock:
+        if _lease_renewer_pid == os.getpid():
+            return
+        _lease_renewer_pid = os.getpid()
+    threading.Thread(target=_run_lease_renewer, name='screenpipe-lease-renew', daemon=True).start()
+
+def get_postprocessor():
+    """Return this process's post-processing pool, or None if disabled or ffmpeg is missing."""
+    global _postprocessor, POSTPROCESS
+    with _postprocessor_lock:
+        if _postprocessor is None and POSTPROCESS:
+            if postprocess.available():
+                _postprocessor = postprocess.PostProcessor(record_outputs)
             else:
-                # Concatenate chunks using simple binary merge
-                with open(output_path, 'wb') as outfile:
-                    # Merge all chunk files
-                    for i in range(session_info['chunks']):
-                        chunk_path = os.path.join(chunks_dir, f'chunk_{i:05d}.webm')
-                        if os.path.exists(chunk_path):
-                            with open(chunk_path, 'rb') as infile:
-                                outfile.write(infile.read())
-                
-                logger.debug(f"Merged {session_info['chunks']} chunks into {output_path}")
-            
-            # Mark as completed
-            session_info['status'] = 'completed'
-            
-            # Save updated session info
-            with open(os.path.join(session_dir, 'info.json'), 'w') as f:
-                json.dump(session_info, f, indent=2)
-            
-            # Remove from active sessions
-            if session_id in active_sessions:
-                del active_sessions[session_id]
-            
-            # Return the recording ID (same as session ID in this case)
-            return session_id
-        else:
-            # No chunks were saved
-            logger.warning(f"No video chunks were received for session {session_id}")
-            return None
-        
+                logger.warning(f"{postprocess.FFMPEG} not found, recordings will not be post-processed")
+                POSTPROCESS = False
+        return _postprocessor
+
+def queue_postprocess(recording_id):
+    """Queue a completed recording for remuxing and thumbnails; returns whether it was queued."""
+    processor = get_postprocessor()
+    info = get_recording_info(recording_id)
+    if processor is None or not info:
+        return False
+    return processor.submit(recording_id, recording_path(recording_id), os.path.join(RECORDINGS_DIR, recording_id),
+                            info.get('media_duration') or info.get('duration'))
+
+def record_outputs(recording_id, outputs, errors):
+    """Add post-processing results to a recording's info."""
+    try:
+        info = get_recording_info(recording_id)
+        if not info or info.get('status') != 'completed':
+            # Deleted while it was being processed
+            return
+        info['outputs'] = outputs
+        if errors:
+            info['postprocess_errors'] = errors
+        write_session_info(recording_id, info)
     except Exception as e:
-        logger.error(f"Error finalizing recording {session_id}: {str(e)}")
-        
-        # Mark as error
-        if session_id in active_sessions:
-            session_info = active_sessions[session_id]
-            session_info['status'] = 'error'
-            session_info['error'] = str(e)
-            
-            # Save error info
-            session_dir = os.path.join(RECORDINGS_DIR, session_id)
-            with open(os.path.join(session_dir, 'info.json'), 'w') as f:
-                json.dump(session_info, f, indent=2)
-            
-            # Remove from active sessions
-            active_sessions.pop(session_id, None)
-        
+        logger.error(f"Error recording post-processing outputs of {recording_id}: {str(e)}")
+
+def get_output_file(recording_id, name):
+    """Path of a post-processing output (remux, poster or sprite) of a recording, or None."""
+    info = get_recording_info(recording_id)
+    filename = ((info or {}).get('outputs') or {}).get(name)
+    if not isinstance(filename, str):
+        return None
+    file_path = os.path.join(RECORDINGS_DIR, recording_id, os.path.basename(filename))
+    return file_path if os.path.exists(file_path) else None
+
+def _submit(session_id):
+    """Queue a claimed session for finalization; the caller has taken a queue slot for it."""
+    # The lease is renewed while the session waits, so no other worker reclaims it meanwhile
+    _hold_lease(session_id)
+    
+    def run():
+        try:
+            _process(session_id)
+        finally:
+            _finalize_slots.release()
+    try:
+        _finalize_pool.submit(run)
+    except RuntimeError:
+        _release_lease(session_id)
+        _finalize_slots.release()
+        raise
+
+def get_recording_status(recording_id):
+    """Processing status of a recording (recording, processing, completed or error), or None."""
+    session = get_registry().get(recording_id)
+    if session is None:
+        info = get_recording_info(recording_id)
+        return {'recording_id': recording_id, 'status': info.get('status')} if info else None
+    
+    status = {'recording_id': recording_id, 'status': session['status'], 'chunks': session['next_seq']}
+    if session['status'] == 'error':
+        status['error'] = (get_recording_info(recording_id) or {}).get('error')
+    return status
+
+def request_finalize(session_id):
+    """
+    Stop a recording session and finalize it in the background.
+    Returns the session's status; repeated calls report progress instead of queueing it
+    again. Returns None for unknown sessions. Raises FinalizeQueueFull, leaving the session
+    recording, when this worker has no room to queue it.
+    """
+    # A slot is taken before claiming, so a claimed session always has a thread coming
+    if not _finalize_slots.acquire(blocking=False):
+        session = get_registry().get(session_id)
+        if session and session['status'] == 'recording':
+            logger.warning(f"Finalize queue full, not stopping recording {session_id} yet")
+            raise FinalizeQueueFull(f"Finalize queue full, recording {session_id} is still open")
+        return get_recording_status(session_id)
+    
+    # Only one worker wins the claim, so a repeated stop cannot finalize twice
+    if get_registry().begin_finalize(session_id, datetime.now().isoformat()):
+        _close_writer(session_id)
+        _submit(session_id)
+    else:
+        _finalize_slots.release()
+    return get_recording_status(session_id)
+
+def finalize_recording(session_id):
+    """Finalize a recording session in this thread: trim its output file and mark it completed."""
+    if get_registry().begin_finalize(session_id, datetime.now().isoformat()) is None:
+        logger.warning(f"Trying to finalize unknown session: {session_id}")
         return None
+    
+    _close_writer(session_id)
+    return _process(session_id)
+
+def resume_finalization():
+    """
+    Queue sessions nobody is finishing: recordings abandoned by their recorder, and
+    sessions left in processing by a worker that died. Safe to call from every worker;
+    sessions that do not fit in the finalize queue are left for a later call.
+    """
+    registry = get_registry()
+    for session_id in registry.expired('recording', ABANDON_SECONDS):
+        if not _finalize_slots.acquire(blocking=False):
+            return
+        # The recording ended with its last write, which is when the lease was last renewed
+        session = registry.get(session_id)
+        last_write = datetime.fromtimestamp(session['lease_expires'] - LEASE_SECONDS) if session else datetime.now()
+        if registry.begin_finalize(session_id, last_write.isoformat()):
+            logger.info(f"Finalizing abandoned recording session {session_id}")
+            _submit(session_id)
+        else:
+            _finalize_slots.release()
+    
+    for session_id in registry.expired('processing'):
+        if not _finalize_slots.acquire(blocking=False):
+            return
+        if registry.reclaim(session_id):
+            logger.info(f"Resuming finalization of recording session {session_id}")
+            _submit(session_id)
+        else:
+            _finalize_slots.release()
 
 def get_recording_info(recording_id):
     """Get information about a recording."""
-    # First check if it's a session ID
+    info = get_registry().get_info(recording_id)
+    if info:
+        return info
+    
+    # Sessions recorded before the catalog existed
     session_dir = os.path.join(RECORDINGS_DIR, recording_id)
     if os.path.exists(session_dir) and os.path.isdir(session_dir):
         info_path = os.path.join(session_dir, 'info.json')
@@ -200,40 +647,80 @@ def get_recording_file(recording_id):
     info = get_recording_info(recording_id)
     if info and 'file_path' in info:
         file_path = info['file_path']
-        if os.path.exists(file_path):
+        if file_path and os.path.exists(file_path):
             return file_path
     
+    # The stored path goes stale when the recordings directory moves
+    session_path = recording_path(recording_id)
+    if os.path.exists(session_path):
+        return session_path
+    
     # Direct check for the recording file
-    recording_path = os.path.join(RECORDINGS_DIR, f"{recording_id}.webm")
-    if os.path.exists(recording_path):
-        return recording_path
+    webm_path = os.path.join(RECORDINGS_DIR, f"{recording_id}.webm")
+    if os.path.exists(webm_path):
+        return webm_path
     
     return None
 
-def list_recordings():
-    """List all recordings."""
-    recordings = []
+def _encode_cursor(after):
+    return base64.urlsafe_b64encode(json.dumps(after).encode('utf-8')).decode('ascii') if after else None
+
+def _decode_cursor(cursor):
+    try:
+        value, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return value, session_id
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def _day_after(value):
+    """Exclusive upper bound for an `until` given as a date, so that whole day is included."""
+    if len(value) == 10:
+        return (date.fromisoformat(value) + timedelta(days=1)).isoformat()
+    return value
+
+def list_recordings(status='completed', game_id=None, since=None, until=None, sort='start_time', order='desc',
+                    limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    One page of recordings from the catalog.
+    since/until are ISO dates or datetimes of the start time (until is inclusive for dates).
+    Returns (recordings, cursor of the next page or None). Raises ValueError for bad arguments.
+    """
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Unknown order: {order}")
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
     
-    # Walk through the recordings directory
+    recordings, after = get_registry().list(
+        status=status or None,
+        game_id=game_id or None,
+        since=since or None,
+        until=_day_after(until) if until else None,
+        sort=sort,
+        descending=order == 'desc',
+        limit=limit,
+        after=_decode_cursor(cursor) if cursor else None
+    )
+    for info in recordings:
+        info['recording_id'] = info['session_id']
+    return recordings, _encode_cursor(after)
+
+def _catalog_infos():
+    """The info.json contents of every session directory on disk."""
     for item in os.listdir(RECORDINGS_DIR):
-        # Skip non-directory items except .webm files
-        item_path = os.path.join(RECORDINGS_DIR, item)
-        if not os.path.isdir(item_path) and not item.endswith('.webm'):
+        info_path = os.path.join(RECORDINGS_DIR, item, 'info.json')
+        if not os.path.isfile(info_path):
             continue
-        
-        if os.path.isdir(item_path):
-            # Check for info.json in directory
-            info_path = os.path.join(item_path, 'info.json')
-            if os.path.exists(info_path):
-                with open(info_path, 'r') as f:
-                    try:
-                        info = json.load(f)
-                        if info.get('status') == 'completed':
-                            recordings.append(info)
-                    except json.JSONDecodeError:
-                        logger.warning(f"Invalid JSON in {info_path}")
-    
-    return recordings
+        with open(info_path, 'r') as f:
+            try:
+                info = json.load(f)
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid JSON in {info_path}")
+                continue
+        info.setdefault('session_id', item)
+        yield info
+
+def rebuild_catalog():
+    """Rebuild the recording catalog from the info.json files on disk; returns how many were found."""
+    return get_registry().rebuild(_catalog_infos())
 
 def delete_recording(recording_id):
     """Delete a recording."""
@@ -248,6 +735,9 @@ def delete_recording(recording_id):
             if os.path.exists(session_dir) and os.path.isdir(session_dir):
                 shutil.rmtree(session_dir)
         
+        # Forget the session in the registry
+        get_registry().delete(recording_id)
+        
         # Delete the recording file
         recording_path = os.path.join(RECORDINGS_DIR, f"{recording_id}.webm")
         if os.path.exists(recording_path):
@@ -10,6 +10,21 @@ let recordingTimer = null;
 let recordingTimeElapsed = 0;
 let sessionId = null;
 
+// Upload batching, negotiated with the server in start_recording
+const DEFAULT_UPLOAD_SETTINGS = { timeslice_ms: 1000, batch_chunks: 5, max_batch_chunks: 20, max_batch_bytes: 4 * 1024 * 1024 };
+let uploadSettings = DEFAULT_UPLOAD_SETTINGS;
+let batchChunks = DEFAULT_UPLOAD_SETTINGS.batch_chunks;
+let pendingChunks = [];      // { seq, blob } not yet acknowledged by the server
+let nextChunkSeq = 0;
+let uploadInFlight = null;   // promise of the batch currently being uploaded
+let flushTimer = null;
+
+// Socket.IO ingest, used when the client library is loaded and the server accepts it
+let ingestSocket = null;
+let ingestCredits = 0;
+let ingestAcked = 0;         // next sequence number the server has written
+let ingestSentUpTo = 0;      // next sequence number to send
+
 // Initialize the screen recorder when document is loaded
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Screen recorder initialized');
@@ -117,9 +132,19 @@ async function startRecording() {
         
         // Clear previous recorded chunks
         recordedChunks = [];
+        pendingChunks = [];
+        nextChunkSeq = 0;
+        
+        // Create the server session first so no chunk can arrive before it exists,
+        // and use the timeslice and batch size it negotiates
+        uploadSettings = await notifyRecordingStarted(sessionId);
+        batchChunks = uploadSettings.batch_chunks;
+        
+        // Prefer one persistent connection over per-batch HTTP uploads
+        await openIngestSocket(sessionId);
         
         // Start recording
-        mediaRecorder.start(100); // Collect 100ms chunks
+        mediaRecorder.start(uploadSettings.timeslice_ms);
         isRecording = true;
         
         // Update UI
@@ -134,9 +159,6 @@ async function startRecording() {
         // Show status
         showRecordingStatus('Recording started', 'success');
         
-        // Notify the server that recording has started
-        notifyRecordingStarted(sessionId);
-        
         console.log('Recording started with session ID:', sessionId);
     } catch (error) {
         console.error('Error starting recording:', error);
@@ -177,14 +199,15 @@ function handleDataAvailable(event) {
     if (event.data && event.data.size > 0) {
         recordedChunks.push(event.data);
         
-        // Send chunk to server
-        sendChunkToServer(event.data, sessionId);
+        // Queue chunk for the next batch upload
+        queueChunk(event.data);
     }
 }
 
 // Handle recording stopped event
-function handleRecordingStopped() {
-    // Notify server that recording has ended
+async function handleRecordingStopped() {
+    // Upload whatever is still buffered, then notify server that recording has ended
+    await drainUploads();
     notifyRecordingEnded(sessionId);
     
     // If there are recorded chunks, enable sharing
@@ -193,52 +216,206 @@ function handleRecordingStopped() {
     }
 }
 
-// Send recorded chunk to server
-function sendChunkToServer(chunk, sessionId) {
-    // Create form data with chunk and session ID
+// Connect to the Socket.IO ingest namespace; resolves to false if it is unavailable
+function openIngestSocket(sessionId) {
+    if (typeof io === 'undefined') {
+        return Promise.resolve(false);
+    }
+    
+    return new Promise(resolve => {
+        const socket = io('/screenpipe', { transports: ['websocket'] });
+        const timeout = setTimeout(() => {
+            socket.close();
+            resolve(false);
+        }, 3000);
+        
+        // Runs again after every reconnect, resuming from what the server already has
+        socket.on('connect', () => {
+            socket.emit('start', { session_id: sessionId }, reply => {
+                clearTimeout(timeout);
+                if (!reply || !reply.success) {
+                    socket.close();
+                    resolve(false);
+                    return;
+                }
+                ingestSocket = socket;
+                ingestCredits = reply.credits;
+                ingestAcked = ingestSentUpTo = reply.next_seq;
+                pendingChunks = pendingChunks.filter(item => item.seq >= reply.next_seq);
+                pumpIngest();
+                resolve(true);
+            });
+        });
+        
+        // The server confirms written chunks and reports how many more it can queue
+        socket.on('written', data => {
+            ingestAcked = data.next_seq;
+            ingestSentUpTo = Math.max(ingestSentUpTo, ingestAcked);
+            ingestCredits = data.credits;
+            pendingChunks = pendingChunks.filter(item => item.seq >= data.next_seq);
+            pumpIngest();
+        });
+        
+        socket.on('ingest_error', data => {
+            console.error('Error writing chunks:', data.message);
+        });
+        
+        // Anything not yet confirmed is resent once the connection is back
+        socket.on('disconnect', () => {
+            ingestSentUpTo = ingestAcked;
+        });
+    });
+}
+
+// Send pending chunks over the socket while the server has credits left
+function pumpIngest() {
+    if (!ingestSocket || !ingestSocket.connected) return;
+    
+    for (const item of pendingChunks) {
+        if (item.seq < ingestSentUpTo) continue;
+        if (ingestSentUpTo - ingestAcked >= ingestCredits) break;
+        
+        ingestSocket.emit('chunk', { session_id: sessionId, seq: item.seq, data: item.blob }, reply => {
+            if (reply && reply.retry) {
+                // Server queue was full; send again from this chunk right away, since a
+                // `written` event may never come if the queue drained in the meantime
+                ingestSentUpTo = Math.min(ingestSentUpTo, item.seq);
+                pumpIngest();
+            }
+        });
+        ingestSentUpTo = item.seq + 1;
+    }
+}
+
+// Buffer a chunk and upload once the batch is full (by count or size) or has waited long enough
+function queueChunk(chunk) {
+    pendingChunks.push({ seq: nextChunkSeq++, blob: chunk });
+    
+    if (ingestSocket && ingestSocket.connected) {
+        pumpIngest();
+        return;
+    }
+    
+    const pendingBytes = pendingChunks.reduce((total, item) => total + item.blob.size, 0);
+    if (pendingChunks.length >= batchChunks || pendingBytes >= uploadSettings.max_batch_bytes) {
+        flushChunks();
+    } else if (!flushTimer) {
+        // Never hold chunks much longer than a full batch would take to record
+        flushTimer = setTimeout(flushChunks, uploadSettings.timeslice_ms * batchChunks);
+    }
+}
+
+// Upload buffered chunks as one request; only one batch is in flight at a time
+function flushChunks() {
+    if (flushTimer) {
+        clearTimeout(flushTimer);
+        flushTimer = null;
+    }
+    if (uploadInFlight || pendingChunks.length === 0) {
+        return uploadInFlight || Promise.resolve();
+    }
+    
+    // Take as many chunks as the server accepts per request (always at least one)
+    const batch = [];
+    let batchBytes = 0;
+    for (const item of pendingChunks) {
+        if (batch.length >= uploadSettings.max_batch_chunks ||
+            (batch.length > 0 && batchBytes + item.blob.size > uploadSettings.max_batch_bytes)) {
+            break;
+        }
+        batch.push(item);
+        batchBytes += item.blob.size;
+    }
+    
+    // Create form data with the batch and the sequence number of its first chunk
     const formData = new FormData();
-    formData.append('video_chunk', chunk);
     formData.append('session_id', sessionId);
+    formData.append('seq', batch[0].seq);
+    batch.forEach(item => formData.append('video_chunk', item.blob, `chunk_${item.seq}.webm`));
     
-    // Send chunk to server
-    fetch('/screenshare/upload_chunk', {
+    const started = performance.now();
+    uploadInFlight = fetch('/screenshare/upload_chunk', {
         method: 'POST',
         body: formData
     })
     .then(response => response.json())
     .then(data => {
+        // Drop everything the server has acknowledged (including after a 409 resync)
+        if (typeof data.next_seq === 'number') {
+            pendingChunks = pendingChunks.filter(item => item.seq >= data.next_seq);
+        }
         if (!data.success) {
-            console.error('Error sending chunk:', data.message);
+            console.error('Error sending chunks:', data.message);
+        }
+        
+        // Adapt: when uploads take a large share of the batch interval, send bigger batches
+        const elapsed = performance.now() - started;
+        const interval = uploadSettings.timeslice_ms * batchChunks;
+        if (elapsed > interval / 2 && batchChunks < uploadSettings.max_batch_chunks) {
+            batchChunks = Math.min(uploadSettings.max_batch_chunks, batchChunks * 2);
+        } else if (elapsed < interval / 10 && batchChunks > uploadSettings.batch_chunks) {
+            batchChunks = Math.max(uploadSettings.batch_chunks, Math.floor(batchChunks / 2));
         }
     })
     .catch(error => {
-        console.error('Error sending chunk to server:', error);
+        // Keep the chunks; they are retried with the next batch
+        console.error('Error sending chunks to server:', error);
+    })
+    .finally(() => {
+        uploadInFlight = null;
+        if (pendingChunks.length >= batchChunks) {
+            flushChunks();
+        }
     });
+    
+    return uploadInFlight;
 }
 
-// Notify server that recording has started
+// Upload every buffered chunk before the recording is finalized
+async function drainUploads() {
+    if (ingestSocket) {
+        // Wait for the server to confirm every chunk; HTTP picks up anything left over
+        for (let waited = 0; pendingChunks.length > 0 && ingestSocket.connected && waited < 10000; waited += 100) {
+            await new Promise(resolve => setTimeout(resolve, 100));
+        }
+        ingestSocket.close();
+        ingestSocket = null;
+    }
+    
+    for (let attempt = 0; attempt < 5 && (pendingChunks.length > 0 || uploadInFlight); attempt++) {
+        if (uploadInFlight) {
+            await uploadInFlight;
+        }
+        await flushChunks();
+    }
+}
+
+// Notify server that recording has started; resolves to the negotiated upload settings
 function notifyRecordingStarted(sessionId) {
-    fetch('/screenshare/start_recording', {
+    return fetch('/screenshare/start_recording', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
             session_id: sessionId,
-            game_id: getGameId()
+            game_id: getGameId(),
+            timeslice_ms: DEFAULT_UPLOAD_SETTINGS.timeslice_ms
         })
     })
     .then(response => response.json())
     .then(data => {
         console.log('Recording session started on server:', data);
+        return data.upload || DEFAULT_UPLOAD_SETTINGS;
     })
     .catch(error => {
         console.error('Error notifying server about recording start:', error);
+        return DEFAULT_UPLOAD_SETTINGS;
     });
 }
 
 // Notify server that recording has ended
-function notifyRecordingEnded(sessionId) {
+function notifyRecordingEnded(sessionId, attempt = 0) {
     fetch('/screenshare/stop_recording', {
         method: 'POST',
         headers: {
@@ -248,13 +425,33 @@ function notifyRecordingEnded(sessionId) {
             session_id: sessionId
         })
     })
-    .then(response => response.json())
+    .then(response => {
+        // The server's finalize queue is full and the session is still open; ask again later
+        if (response.status === 503 && attempt < 10) {
+            const delay = (parseInt(response.headers.get('Retry-After'), 10) || 5) * 1000;
+            setTimeout(() => notifyRecordingEnded(sessionId, attempt + 1), delay);
+            return null;
+        }
+        return response.json();
+    })
     .then(data => {
+        if (!data) {
+            return null;
+        }
         console.log('Recording session ended on server:', data);
         
+        // The server finalizes in the background; wait until the recording is ready
+        return data.success && data.status === 'processing' ? waitForRecording(data.status_url) : data;
+    })
+    .then(data => {
         // Update share button with the recording ID
-        if (data.success && data.recording_id) {
+        if (!data) {
+            return;
+        }
+        if (data.success && data.status === 'completed') {
             document.getElementById('share-recording').setAttribute('data-recording-id', data.recording_id);
+        } else if (data.status === 'error') {
+            showRecordingStatus('Recording could not be saved: ' + (data.error || data.message), 'error');
         }
     })
     .catch(error => {
@@ -262,6 +459,20 @@ function notifyRecordingEnded(sessionId) {
     });
 }
 
+// Poll a recording's status until it leaves processing
+async function waitForRecording(statusUrl) {
+    let delay = 500;
+    for (let attempt = 0; attempt < 30; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+        const data = await fetch(statusUrl).then(response => response.json());
+        if (!data.success || data.status !== 'processing') {
+            return data;
+        }
+        delay = Math.min(delay * 2, 5000);
+    }
+    return { success: false, message: 'Recording is still processing' };
+}
+
 // Share the recorded gameplay
 function shareRecording() {
     const recordingId = document.getElementById('share-recording').getAttribute('data-recording-id');
@@ -0,0 +1,131 @@
+"""
+Byte serving for recordings.
+Finished files are served with strong ETags and single byte ranges. The response body is
+the open file handed to the server's wsgi.file_wrapper, so servers that support it
+(gunicorn) send it with sendfile() straight from the page cache; ranges that stop short of
+the end of the file are streamed in blocks instead, since a file wrapper would send
+everything up to EOF. Sessions still being recorded can be followed live: the tail
+stream sends what has been committed so far and then every chunk as it is committed.
+"""
+
+import os
+import time
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+from . import screenpipe
+
+# Block size for ranges that end before EOF and for live tails
+READ_BYTES = 256 * 1024
+
+# Seconds between checks for newly committed data while tailing
+LIVE_POLL_SECONDS = float(os.getenv('SCREENPIPE_LIVE_POLL_MS', 500)) / 1000
+
+# A tail ends once the session has committed nothing new for this long
+LIVE_IDLE_SECONDS = float(os.getenv('SCREENPIPE_LIVE_IDLE_SECONDS', 30))
+
+LIVE_STATUSES = ('recording', 'processing')
+
+
+def recording_etag(stat):
+    """Strong ETag for a file version; rewriting or growing the file changes it."""
+    return f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def _read_blocks(file, start, stop):
+    file.seek(start)
+    while start < stop:
+        data = file.read(min(READ_BYTES, stop - start))
+        if not data:
+            break
+        start += len(data)
+        yield data
+
+
+def _read_range(file, start, stop):
+    try:
+        yield from _read_blocks(file, start, stop)
+    finally:
+        file.close()
+
+
+def send_recording(file_path, mimetype='video/webm', download_name=None):
+    """Serve a recording file honouring If-None-Match, Range and If-Range."""
+    file = open(file_path, 'rb')
+    stat = os.fstat(file.fileno())
+    size = stat.st_size
+    etag = recording_etag(stat)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'no-cache'
+    }
+    if request.if_none_match.contains(etag):
+        file.close()
+        return Response(status=304, headers=headers)
+
+    start, stop, status = 0, size, 200
+    # A Range with a stale If-Range validator gets the whole new file instead
+    if request.range is not None and (request.if_range.etag is None or request.if_range.etag == etag):
+        bounds = request.range.range_for_length(size)
+        if bounds is None:
+            file.close()
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    headers['Content-Length'] = str(stop - start)
+    if stop == size:
+        file.seek(start)
+        body = wrap_file(request.environ, file, READ_BYTES)
+    else:
+        body = _read_range(file, start, stop)
+    response = Response(body, status=status, mimetype=mimetype, headers=headers, direct_passthrough=True)
+    if download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
+
+
+def tail_recording(session_id, offset=0):
+    """
+    Yield a session's committed bytes from offset on, then new data as it is committed,
+    until the session is finalized or stays idle for LIVE_IDLE_SECONDS.
+    Only committed bytes are sent, so spectators never see a half-written chunk.
+    """
+    registry = screenpipe.get_registry()
+    with open(screenpipe.recording_path(session_id), 'rb') as file:
+        idle_since = time.monotonic()
+        while True:
+            session = registry.get(session_id)
+            if session is None:
+                return
+            live = session['status'] in LIVE_STATUSES
+            available = os.fstat(file.fileno()).st_size
+            if live:
+                available = min(available, session['size'])
+
+            if available > offset:
+                yield from _read_blocks(file, offset, available)
+                offset = available
+                idle_since = time.monotonic()
+            elif not live or time.monotonic() - idle_since >= LIVE_IDLE_SECONDS:
+                return
+            time.sleep(LIVE_POLL_SECONDS)
+
+
+def stream_live(session_id, offset=0):
+    """Chunked response following a recording while it is being written."""
+    return Response(
+        tail_recording(session_id, offset),
+        mimetype='video/webm',
+        headers={
+            'Cache-Control': 'no-store',
+            # Keep reverse proxies from buffering the stream
+            'X-Accel-Buffering': 'no'
+        },
+        direct_passthrough=True
+    )
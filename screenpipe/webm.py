@@ -0,0 +1,430 @@
+"""
+Cue index for MediaRecorder WebM files, in pure Python.
+MediaRecorder writes a live stream: the Segment (and in Chrome every Cluster) has an
+unknown size, there is no Duration and no Cues element, so players cannot seek without
+downloading and scanning the file. make_seekable walks the file once, reading only
+element headers and the first bytes of each block, and records every cluster's position
+and first keyframe. It then rewrites the file sequentially with a known Segment size, a
+SeekHead, a Duration in Info, sized Clusters and a Cues element at the end, and stores
+a compact (time, byte offset) sidecar index so the server can map times to offsets
+without parsing the file again.
+"""
+
+import os
+import bisect
+import struct
+import functools
+
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+REFERENCE_BLOCK = 0xFB
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TIME = 0xB3
+CUE_TRACK_POSITIONS = 0xB7
+CUE_TRACK = 0xF7
+CUE_CLUSTER_POSITION = 0xF1
+VOID = 0xEC
+
+# Elements that can follow a cluster at segment level; one of them ends an unknown-size cluster
+TOP_LEVEL = frozenset((EBML, SEGMENT, SEEK_HEAD, INFO, TRACKS, CLUSTER, CUES,
+                       0x1043A770, 0x1254C367, 0x1941A469))
+
+# Elements of the original file that the rewrite regenerates
+REGENERATED = frozenset((SEEK_HEAD, CUES, VOID))
+
+TRACK_TYPE_VIDEO = 1
+DEFAULT_TIMECODE_SCALE = 1000000
+
+# Sidecar index: magic, version, entry count, then (time in ms, absolute byte offset) pairs
+INDEX_HEADER = struct.Struct('<4sII')
+INDEX_ENTRY = struct.Struct('<QQ')
+INDEX_MAGIC = b'WCUE'
+INDEX_VERSION = 1
+
+COPY_BYTES = 1024 * 1024
+
+
+class WebMError(ValueError):
+    """Raised for files this module cannot index."""
+
+
+def _vint_length(byte):
+    length = 1
+    while length <= 8 and not byte & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise WebMError('Invalid variable-length integer')
+    return length
+
+
+def _vint_at(data, pos, keep_marker=False):
+    """Decode an EBML variable-length integer at data[pos]; returns (value, length)."""
+    length = _vint_length(data[pos])
+    if pos + length > len(data):
+        raise WebMError('Truncated variable-length integer')
+    value = data[pos] if keep_marker else data[pos] & (0xFF >> length)
+    for extra in data[pos + 1:pos + length]:
+        value = (value << 8) | extra
+    return value, length
+
+
+def _read_vint(file, keep_marker=False):
+    """Read a variable-length integer from a file; returns (value, length), or (None, 0) at EOF."""
+    first = file.read(1)
+    if not first:
+        return None, 0
+    data = first + file.read(_vint_length(first[0]) - 1)
+    if len(data) != _vint_length(first[0]):
+        return None, 0
+    return _vint_at(data, 0, keep_marker)
+
+
+def _read_header(file):
+    """Read an element header; returns (id, size or None if unknown, header length), or None at EOF."""
+    element_id, id_length = _read_vint(file, keep_marker=True)
+    if element_id is None:
+        return None
+    size, size_length = _read_vint(file)
+    if size is None:
+        return None
+    if size == (1 << (7 * size_length)) - 1:
+        size = None
+    return element_id, size, id_length + size_length
+
+
+def _uint(data):
+    return int.from_bytes(data, 'big') if data else 0
+
+
+def _children(data):
+    """(id, payload) pairs of a fully read master element."""
+    pos = 0
+    while pos < len(data):
+        element_id, id_length = _vint_at(data, pos, keep_marker=True)
+        size, size_length = _vint_at(data, pos + id_length)
+        start = pos + id_length + size_length
+        yield element_id, data[start:start + size]
+        pos = start + size
+
+
+def _encode_id(element_id):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+
+
+def _encode_size(size, length=None):
+    if length is None:
+        length = 1
+        while size >= (1 << (7 * length)) - 1:
+            length += 1
+    return ((1 << (7 * length)) | size).to_bytes(length, 'big')
+
+
+def _element(element_id, payload, size_length=None):
+    return _encode_id(element_id) + _encode_size(len(payload), size_length) + payload
+
+
+def _uint_element(element_id, value, width=None):
+    return _element(element_id, value.to_bytes(width or max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+class Cluster:
+    """Position of one cluster's payload in the source file and its first keyframe per track."""
+
+    __slots__ = ('start', 'end', 'keyframes', 'last_time')
+
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        self.keyframes = {}
+        self.last_time = None
+
+
+# A block starts with its track number (at most 8 bytes), a 16-bit relative time and flags
+BLOCK_HEAD_BYTES = 11
+
+
+def _block(data, cluster, timecode, keyframe=None):
+    """Note a block's track, time and keyframe flag from its first bytes."""
+    track, track_length = _vint_at(data, 0)
+    if len(data) < track_length + 3:
+        return
+    time = timecode + struct.unpack_from('>h', data, track_length)[0]
+    if keyframe is None:
+        # SimpleBlock flags carry the keyframe bit
+        keyframe = bool(data[track_length + 2] & 0x80)
+    if keyframe and track not in cluster.keyframes:
+        cluster.keyframes[track] = time
+    if cluster.last_time is None or time > cluster.last_time:
+        cluster.last_time = time
+
+
+def _scan_cluster(file, start, size, limit):
+    """Walk a cluster's children; stops at the first incomplete child or a top-level element."""
+    cluster = Cluster(start)
+    end = min(start + size, limit) if size is not None else limit
+    timecode = 0
+    pos = start
+    while pos < end:
+        file.seek(pos)
+        header = _read_header(file)
+        if header is None:
+            break
+        element_id, child_size, header_length = header
+        if size is None and element_id in TOP_LEVEL:
+            break
+        if child_size is None or pos + header_length + child_size > end:
+            # Unknown-size children are not allowed here; anything past this point is torn
+            break
+
+        if element_id == CLUSTER_TIMECODE:
+            timecode = _uint(file.read(child_size))
+        elif element_id == SIMPLE_BLOCK:
+            _block(file.read(min(child_size, BLOCK_HEAD_BYTES)), cluster, timecode)
+        elif element_id == BLOCK_GROUP:
+            group = file.read(child_size)
+            block, referenced = None, False
+            for group_id, payload in _children(group):
+                if group_id == BLOCK:
+                    block = payload
+                elif group_id == REFERENCE_BLOCK:
+                    referenced = True
+            if block is not None:
+                # Blocks in a group are keyframes unless they reference another frame
+                _block(block, cluster, timecode, not referenced)
+
+        pos += header_length + child_size
+        cluster.end = pos
+    return cluster
+
+
+def scan(file):
+    """
+    Walk a WebM file once.
+    Returns a dict with the raw EBML header, the Info and Tracks payloads, other
+    segment-level elements as (start, end) ranges, and the clusters.
+    """
+    file.seek(0, os.SEEK_END)
+    file_size = file.tell()
+    file.seek(0)
+
+    header = _read_header(file)
+    if header is None or header[0] != EBML or header[1] is None:
+        raise WebMError('Not an EBML file')
+    file.seek(header[2] + header[1])
+    ebml_header_end = file.tell()
+
+    header = _read_header(file)
+    if header is None or header[0] != SEGMENT:
+        raise WebMError('No Segment element')
+    segment_start = file.tell()
+    segment_end = file_size if header[1] is None else min(segment_start + header[1], file_size)
+
+    result = {'ebml_header_end': ebml_header_end, 'info': None, 'tracks': None, 'other': [], 'clusters': []}
+    pos = segment_start
+    while pos < segment_end:
+        file.seek(pos)
+        header = _read_header(file)
+        if header is None:
+            break
+        element_id, size, header_length = header
+        data_start = pos + header_length
+
+        if element_id == CLUSTER:
+            cluster = _scan_cluster(file, data_start, size, segment_end)
+            if cluster.end == data_start:
+                break
+            result['clusters'].append(cluster)
+            pos = cluster.end if size is None else data_start + size
+            continue
+        if size is None or data_start + size > segment_end:
+            break
+
+        if element_id == INFO:
+            result['info'] = file.read(size)
+        elif element_id == TRACKS:
+            result['tracks'] = file.read(size)
+        elif element_id not in REGENERATED:
+            result['other'].append((pos, data_start + size))
+        pos = data_start + size
+
+    if result['info'] is None or result['tracks'] is None:
+        raise WebMError('Missing Info or Tracks')
+    return result
+
+
+def _cue_track(tracks):
+    """Number of the first video track, or of the first track if there is no video."""
+    first = None
+    for element_id, entry in _children(tracks):
+        if element_id != TRACK_ENTRY:
+            continue
+        fields = dict(_children(entry))
+        number = _uint(fields.get(TRACK_NUMBER))
+        if _uint(fields.get(TRACK_TYPE)) == TRACK_TYPE_VIDEO:
+            return number
+        if first is None:
+            first = number
+    return first
+
+
+def _copy(source, destination, start, end):
+    source.seek(start)
+    while start < end:
+        data = source.read(min(COPY_BYTES, end - start))
+        if not data:
+            raise WebMError('File shrank while indexing')
+        destination.write(data)
+        start += len(data)
+
+
+def write_index(index_path, entries):
+    """Atomically write a sidecar index of (time in ms, byte offset) entries."""
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(entries)))
+        for entry in entries:
+            f.write(INDEX_ENTRY.pack(*entry))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, index_path)
+
+
+def is_seekable(path):
+    """
+    Whether a WebM file has already been rewritten by make_seekable.
+    MediaRecorder always leaves the Segment size unknown; the rewrite always sets it.
+    """
+    with open(path, 'rb') as file:
+        header = _read_header(file)
+        if header is None or header[0] != EBML or header[1] is None:
+            return False
+        file.seek(header[2] + header[1])
+        header = _read_header(file)
+        return header is not None and header[0] == SEGMENT and header[1] is not None
+
+
+def make_seekable(path, index_path=None):
+    """
+    Rewrite a WebM file with Duration, Cues and sized elements, replacing it atomically.
+    The sidecar index, if requested, is written after the file is replaced, so it never
+    points into the old layout; rewriting a file that is already seekable gives the same
+    file and restores a missing index. Returns a summary dict.
+    """
+    temp_path = f"{path}.cues.tmp"
+    with open(path, 'rb') as source:
+        layout = scan(source)
+        clusters = layout['clusters']
+        if not clusters:
+            raise WebMError('No complete clusters')
+
+        info = dict(_children(layout['info']))
+        timecode_scale = _uint(info.get(TIMECODE_SCALE)) or DEFAULT_TIMECODE_SCALE
+        cue_track = _cue_track(layout['tracks'])
+        last_time = max(cluster.last_time or 0 for cluster in clusters)
+
+        # Info keeps everything but the stale or missing Duration
+        info_payload = b''.join(
+            _element(element_id, payload) for element_id, payload in _children(layout['info'])
+            if element_id != DURATION
+        ) + _element(DURATION, struct.pack('>d', float(last_time)))
+
+        with open(temp_path, 'wb') as out:
+            _copy(source, out, 0, layout['ebml_header_end'])
+            out.write(_encode_id(SEGMENT))
+            segment_size_at = out.tell()
+            out.write(_encode_size(0, 8))
+            segment_start = out.tell()
+
+            # SeekHead with fixed-width positions, patched once the layout is known
+            def seek_head(positions):
+                return _element(SEEK_HEAD, b''.join(
+                    _element(SEEK, _element(SEEK_ID, _encode_id(element_id)) +
+                             _uint_element(SEEK_POSITION, position, width=8))
+                    for element_id, position in positions
+                ))
+            positions = {INFO: 0, TRACKS: 0, CUES: 0}
+            out.write(seek_head(positions.items()))
+
+            positions[INFO] = out.tell() - segment_start
+            out.write(_element(INFO, info_payload))
+            positions[TRACKS] = out.tell() - segment_start
+            out.write(_element(TRACKS, layout['tracks']))
+            for start, end in layout['other']:
+                _copy(source, out, start, end)
+
+            cues = []
+            for cluster in clusters:
+                position = out.tell() - segment_start
+                keyframe = cluster.keyframes.get(cue_track)
+                if keyframe is not None:
+                    cues.append((keyframe, position))
+                out.write(_encode_id(CLUSTER) + _encode_size(cluster.end - cluster.start))
+                _copy(source, out, cluster.start, cluster.end)
+
+            positions[CUES] = out.tell() - segment_start
+            out.write(_element(CUES, b''.join(
+                _element(CUE_POINT, _uint_element(CUE_TIME, time) + _element(
+                    CUE_TRACK_POSITIONS, _uint_element(CUE_TRACK, cue_track) +
+                    _uint_element(CUE_CLUSTER_POSITION, position)))
+                for time, position in cues
+            )))
+
+            segment_size = out.tell() - segment_start
+            out.seek(segment_size_at)
+            out.write(_encode_size(segment_size, 8))
+            out.write(seek_head(positions.items()))
+            out.flush()
+            os.fsync(out.fileno())
+
+    os.replace(temp_path, path)
+    if index_path:
+        to_ms = timecode_scale / 1000000
+        write_index(index_path, [(round(time * to_ms), segment_start + position) for time, position in cues])
+
+    return {
+        'duration': last_time * timecode_scale / 1e9,
+        'clusters': len(clusters),
+        'cues': len(cues)
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def _load_index(index_path, mtime_ns):
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    magic, version, count = INDEX_HEADER.unpack_from(data)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise WebMError(f"Not a cue index: {index_path}")
+    entries = [INDEX_ENTRY.unpack_from(data, INDEX_HEADER.size + i * INDEX_ENTRY.size) for i in range(count)]
+    return [time for time, _ in entries], [offset for _, offset in entries]
+
+
+def load_index(index_path):
+    """(times in ms, byte offsets) of a sidecar index, cached until the file changes."""
+    return _load_index(index_path, os.stat(index_path).st_mtime_ns)
+
+
+def offset_for_time(index_path, seconds):
+    """(cue time in seconds, byte offset) of the last cue at or before `seconds`, or None."""
+    times, offsets = load_index(index_path)
+    if not times:
+        return None
+    i = max(bisect.bisect_right(times, seconds * 1000) - 1, 0)
+    return times[i] / 1000, offsets[i]
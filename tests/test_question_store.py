@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from quiz.question_store import QuestionStore, build_store, add_questions
+
+SCIENCE = [
+    "What planet is known as the Red Planet?|Mars|Venus|Jupiter|Saturn|easy|space,planets",
+    "What is the largest planet in the solar system?|Jupiter|Saturn|Neptune|Earth|easy|space,planets",
+    "What is the chemical symbol for gold?|Au|Ag|Gd|Go|medium|chemistry",
+    "What gas do plants absorb from the air?|Carbon dioxide|Oxygen|Nitrogen|Helium|easy|biology",
+    "What is the speed of light?|300,000 km/s|150,000 km/s|30,000 km/s|3,000 km/s|hard|physics,space",
+    "Which particle has a negative charge?|Electron|Proton|Neutron|Photon|medium|physics",
+    "not a question line",
+]
+HISTORY = [
+    "In which year did the Berlin Wall fall?|1989|1991|1979|1985|medium|europe",
+    "Who was the first emperor of Rome?|Augustus|Julius Caesar|Nero|Caligula|hard|europe,rome",
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = tmp_path / 'questions'
+    source.mkdir()
+    (source / 'science.txt').write_text('\n'.join(SCIENCE), encoding='utf-8')
+    (source / 'history.txt').write_text('\n'.join(HISTORY), encoding='utf-8')
+    path = str(tmp_path / 'questions.db')
+    assert build_store([str(source)], path) == 8
+    return QuestionStore(path, reload_interval=0)
+
+
+def test_genres_and_bucket_counts(store):
+    assert store.genres() == ('history', 'science')
+    assert store.count('g:science') == 6
+    assert store.count('g:science|d:easy') == 3
+    assert store.count('g:science|t:space') == 3
+    assert store.count('g:science|t:missing') == 0
+
+
+def test_sample_is_distinct_and_reproducible(store):
+    first = store.sample('science', 4, rng=random.Random(7))
+    assert len(first) == 4
+    assert len({q['question'] for q in first}) == 4
+    assert store.sample('science', 4, rng=random.Random(7)) == first
+
+
+def test_sample_never_returns_more_than_the_bucket_holds(store):
+    assert len(store.sample('history', 10)) == 2
+    assert store.sample('unknown', 3) == []
+
+
+def test_sample_filters(store):
+    easy = store.sample('science', 10, difficulty='EASY')
+    assert {q['correct'] for q in easy} == {'Mars', 'Jupiter', 'Carbon dioxide'}
+
+    physics = store.sample('science', 10, tags=['physics'])
+    assert {q['correct'] for q in physics} == {'300,000 km/s', 'Electron'}
+
+    # Two tags, and a tag with a difficulty, go through the tag index
+    assert [q['correct'] for q in store.sample('science', 10, tags=['space', 'physics'])] == ['300,000 km/s']
+    assert sorted(q['correct'] for q in store.sample('science', 10, difficulty='easy', tags=['space'])) == \
+        ['Jupiter', 'Mars']
+
+
+def test_sampled_questions_carry_their_wrong_options(store):
+    question, = store.sample('science', 1, tags=['chemistry'])
+    assert question == {'question': 'What is the chemical symbol for gold?', 'correct': 'Au',
+                        'wrong': ['Ag', 'Gd', 'Go']}
+
+
+def test_added_questions_join_every_bucket(store):
+    assert add_questions('science', ["What is H2O?|Water|Salt|Sugar|Sand|easy|chemistry"], store.path) == 1
+    assert store.count('g:science') == 7
+    assert store.count('g:science|d:easy') == 4
+    assert {q['correct'] for q in store.sample('science', 10, tags=['chemistry'])} == {'Au', 'Water'}
+    assert [r['question'] for r in store.search('H2O')] == ['What is H2O?']
+
+
+def test_search_matches_question_text_and_tags(store):
+    results = store.search('planet')
+    assert {r['question'] for r in results} == {
+        'What planet is known as the Red Planet?',
+        'What is the largest planet in the solar system?',
+    }
+    assert all(r['genre'] == 'science' for r in results)
+
+    rome, = store.search('rome')
+    assert rome['tags'] == ['europe', 'rome']
+    assert rome['difficulty'] == 'hard'
+
+
+def test_search_filters_by_genre_and_limit(store):
+    assert store.search('europe', genre='science') == []
+    assert len(store.search('europe', genre='history')) == 2
+    assert len(store.search('europe', limit=1)) == 1
+
+
+def test_search_treats_input_as_plain_terms(store):
+    # FTS5 operators and stray quotes in user input must not raise
+    assert store.search('planet OR NEAR(" *') == []
+    assert store.search('   ') == []
+
+
+def test_search_without_answers_hides_the_correct_option(store):
+    if not store._has_fts:
+        pytest.skip('SQLite was built without FTS5')
+
+    with_answers, = store.search('Augustus')
+    assert with_answers['correct'] == 'Augustus'
+
+    # A player must not be able to find a question by guessing its answer
+    assert store.search('Augustus', answers=False) == []
+    results = store.search('rome', answers=False)
+    assert len(results) == 1
+    assert 'correct' not in results[0]
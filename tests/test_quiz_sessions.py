@@ -0,0 +1,146 @@
+import pytest
+from flask import Flask
+
+from models import db, User
+from quiz import leaderboard, sessions
+
+
+def make_question(text, correct, wrong):
+    options = [correct] + wrong
+    return {'question': text, 'options': options, 'correct': 0}
+
+
+BANK = {
+    'science': [
+        make_question('What planet is known as the Red Planet?', 'Mars', ['Venus', 'Jupiter', 'Saturn']),
+        make_question('What is the chemical symbol for gold?', 'Au', ['Ag', 'Gd', 'Go']),
+        make_question('Which particle has a negative charge?', 'Electron', ['Proton', 'Neutron', 'Photon']),
+        make_question('What gas do plants absorb?', 'Carbon dioxide', ['Oxygen', 'Nitrogen', 'Helium']),
+    ]
+}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    # Fresh boards per test, synced on every read
+    monkeypatch.setattr(leaderboard, 'CACHE', leaderboard.LeaderboardCache(sync_interval=0))
+    draws = iter(range(1000))
+
+    def generate_quiz(genre, question_count=5, difficulty=None, tags=None, seed=None):
+        questions = BANK.get(genre, [])
+        if not questions:
+            return None
+        # A seed always picks the same questions; without one each draw rotates through the bank
+        start = 0 if seed is not None else next(draws)
+        return {'topic': genre.capitalize(),
+                'questions': [questions[(start + i) % len(questions)] for i in range(question_count)]}
+
+    monkeypatch.setattr(sessions, 'generate_quiz', generate_quiz)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def user_id(app):
+    user = User(name='Player', email='player@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def play(user_id, correct=True, **kwargs):
+    """Start an attempt, answer every question and finish it."""
+    quiz = sessions.start_attempt(user_id, kwargs.pop('genre', 'science'), **kwargs)
+    for index, question in enumerate(quiz['questions']):
+        # The correct option is never sent to the client; the bank puts it first
+        result = sessions.answer_question(user_id, quiz['attempt_id'], index, 0 if correct else 1)
+        assert result['is_correct'] == correct
+        assert 'correct' not in question
+    return quiz, sessions.finish_attempt(user_id, quiz['attempt_id'])
+
+
+def test_first_attempt_is_ranked(user_id):
+    quiz, result = play(user_id, question_count=3, seed='daily')
+    assert result['score'] == 3
+    assert result['ranked'] is True
+    assert (result['genre_rank'], result['genre_score']) == (1, 3)
+    assert (result['global_rank'], result['global_score']) == (1, 3)
+
+
+def test_replay_and_repeated_seed_score_nothing(user_id):
+    first, _ = play(user_id, question_count=3, seed='daily')
+
+    _, replay = play(user_id, replay=first['attempt_id'])
+    assert replay['score'] == 3
+    assert replay['ranked'] is False
+    assert replay['global_score'] == 3
+
+    _, again = play(user_id, question_count=3, seed='daily')
+    assert again['ranked'] is False
+    assert again['global_score'] == 3
+
+
+def test_only_new_questions_of_a_fresh_draw_are_ranked(user_id):
+    # Draw 0 serves questions 0-1, draw 1 serves 1-2: only question 2 is new
+    play(user_id, question_count=2)
+    _, result = play(user_id, question_count=2)
+    assert result['score'] == 2
+    assert result['ranked'] is True
+    assert result['global_score'] == 3
+
+
+def test_a_question_repeated_within_an_attempt_counts_once(user_id):
+    _, result = play(user_id, question_count=6, seed='daily')
+    assert result['score'] == 6
+    assert result['global_score'] == 4
+
+
+def test_finishing_twice_counts_once(user_id):
+    quiz, _ = play(user_id, question_count=2, seed='daily')
+    result = sessions.finish_attempt(user_id, quiz['attempt_id'])
+    assert result['global_score'] == 2
+
+
+def test_wrong_answers_are_not_ranked_points(user_id):
+    _, result = play(user_id, correct=False, question_count=2, seed='daily')
+    assert result['score'] == 0
+    assert result['ranked'] is True
+    assert result['global_score'] == 0
+
+
+def test_attempts_are_private_to_their_player(app, user_id):
+    other = User(name='Other', email='other@example.com')
+    db.session.add(other)
+    db.session.commit()
+    quiz = sessions.start_attempt(user_id, 'science', 2, seed='daily')
+    with pytest.raises(sessions.QuizAttemptError) as error:
+        sessions.answer_question(other.id, quiz['attempt_id'], 0, 0)
+    assert error.value.status_code == 404
+
+    # The same questions are new to another player
+    _, result = play(other.id, question_count=2, seed='daily')
+    assert result['ranked'] is True
+    assert result['global_score'] == 2
+
+
+def test_answers_are_validated(user_id):
+    quiz = sessions.start_attempt(user_id, 'science', 2)
+    attempt_id = quiz['attempt_id']
+    for index, selected in ((2, 0), (-1, 0), (0, 4), (0, '0')):
+        with pytest.raises(sessions.QuizAttemptError):
+            sessions.answer_question(user_id, attempt_id, index, selected)
+    sessions.answer_question(user_id, attempt_id, 0, 0)
+    with pytest.raises(sessions.QuizAttemptError) as error:
+        sessions.answer_question(user_id, attempt_id, 0, 1)
+    assert error.value.status_code == 409
+
+
+def test_unknown_topic(user_id):
+    with pytest.raises(sessions.QuizAttemptError) as error:
+        sessions.start_attempt(user_id, 'astrology', 2)
+    assert error.value.status_code == 404
@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from screenpipe import registry
+from screenpipe.registry import SessionRegistry
+
+
+class Recorder:
+    """`write` callback that keeps what it was asked to write."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, offset, first_seq, chunks):
+        self.calls.append((offset, first_seq, list(chunks)))
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    sessions = SessionRegistry(str(tmp_path / 'sessions.db'))
+    sessions.create('s1', 'game', '2025-04-19T10:00:00')
+    return sessions
+
+
+def test_append_allocates_sequence_and_offset(sessions):
+    write = Recorder()
+    assert sessions.append('s1', [b'aa', b'bbb'], 0, write) == 2
+    assert sessions.append('s1', [b'c'], None, write) == 3
+    assert write.calls == [(0, 0, [b'aa', b'bbb']), (5, 2, [b'c'])]
+    session = sessions.get('s1')
+    assert (session['next_seq'], session['size'], session['write_token'], session['write_until']) == (3, 6, None, 0)
+
+
+def test_append_skips_chunks_already_committed(sessions):
+    write = Recorder()
+    sessions.append('s1', [b'aa', b'bb'], 0, write)
+    # A retried batch overlapping what was committed only writes the new tail
+    assert sessions.append('s1', [b'bb', b'cc'], 1, write) == 3
+    assert write.calls[-1] == (4, 2, [b'cc'])
+    # A batch that was fully committed writes nothing
+    assert sessions.append('s1', [b'aa'], 0, write) == 3
+    assert len(write.calls) == 2
+
+
+def test_append_refuses_a_gap(sessions):
+    write = Recorder()
+    sessions.append('s1', [b'aa'], 0, write)
+    assert sessions.append('s1', [b'dd'], 3, write) == 1
+    assert len(write.calls) == 1
+    assert sessions.get('s1')['size'] == 2
+
+
+def test_append_to_unknown_or_stopped_session(sessions):
+    write = Recorder()
+    assert sessions.append('missing', [b'aa'], 0, write) is None
+    assert sessions.begin_finalize('s1', '2025-04-19T10:05:00')['status'] == 'processing'
+    assert sessions.append('s1', [b'aa'], 0, write) is None
+    assert write.calls == []
+
+
+def test_failed_write_releases_the_reservation(sessions):
+    def fail(offset, first_seq, chunks):
+        raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        sessions.append('s1', [b'aa'], 0, fail)
+    session = sessions.get('s1')
+    assert (session['next_seq'], session['size'], session['write_until']) == (0, 0, 0)
+
+    write = Recorder()
+    assert sessions.append('s1', [b'aa'], 0, write) == 1
+    assert write.calls == [(0, 0, [b'aa'])]
+
+
+def test_expired_reservation_is_taken_over(sessions):
+    # A writer that reserved the session and died never commits or releases it
+    sessions._conn().execute("UPDATE sessions SET write_token = 'dead', write_until = ? WHERE session_id = 's1'",
+                             (time.time() - 1,))
+    write = Recorder()
+    assert sessions.append('s1', [b'aa'], 0, write) == 1
+
+
+def test_writer_that_lost_its_reservation_does_not_commit(sessions):
+    conn = sessions._conn()
+    calls = []
+
+    def slow_write(offset, first_seq, chunks):
+        calls.append((offset, first_seq, list(chunks)))
+        if len(calls) == 1:
+            # Another writer takes over the expired reservation and commits first
+            conn.execute("UPDATE sessions SET next_seq = 1, size = 2, write_token = NULL, write_until = 0 "
+                         "WHERE session_id = 's1'")
+
+    assert sessions.append('s1', [b'aa', b'bb'], 0, slow_write) == 2
+    # The second round only writes what the other writer did not commit, after its bytes
+    assert calls == [(0, 0, [b'aa', b'bb']), (2, 1, [b'bb'])]
+    assert sessions.get('s1')['size'] == 4
+
+
+def test_finalize_waits_for_a_write_in_progress(sessions):
+    sessions._conn().execute("UPDATE sessions SET write_token = 'busy', write_until = ? WHERE session_id = 's1'",
+                             (time.time() + 0.2,))
+    started = time.monotonic()
+    assert sessions.begin_finalize('s1', '2025-04-19T10:05:00')['status'] == 'processing'
+    assert time.monotonic() - started >= 0.15
+    # Only one finalizer wins
+    assert sessions.begin_finalize('s1', '2025-04-19T10:05:00') is None
+
+
+def test_lease_reclaim_and_renew(sessions):
+    sessions.begin_finalize('s1', '2025-04-19T10:05:00')
+    assert sessions.renew('s1') is True
+    # Nobody can take a session whose finalizing worker is alive
+    assert sessions.reclaim('s1') is None
+    assert sessions.expired('processing') == []
+
+    conn = sessions._conn()
+    conn.execute("UPDATE sessions SET owner = 'gone:1', lease_expires = ? WHERE session_id = 's1'", (time.time() - 60,))
+    assert sessions.expired('processing', idle_seconds=30) == ['s1']
+    # The dead worker's lease is gone: it cannot renew, anyone can reclaim once
+    assert sessions.renew('s1') is False
+    session = sessions.reclaim('s1')
+    assert session['owner'] == registry.OWNER
+    assert session['lease_expires'] > time.time()
+    assert sessions.reclaim('s1') is None
+    assert sessions.renew('s1') is True
+
+
+def test_idle_recordings_expire(sessions):
+    assert sessions.expired('recording') == []
+    sessions._conn().execute("UPDATE sessions SET lease_expires = ? WHERE session_id = 's1'", (time.time() - 60,))
+    assert sessions.expired('recording', idle_seconds=30) == ['s1']
+    # A write renews the lease
+    sessions.append('s1', [b'aa'], 0, Recorder())
+    assert sessions.expired('recording') == []
+
+
+def test_create_does_not_reset_a_session_with_chunks(sessions):
+    sessions.append('s1', [b'aa'], 0, Recorder())
+    sessions.create('s1', 'other', '2025-04-19T11:00:00')
+    session = sessions.get('s1')
+    assert (session['game_id'], session['next_seq']) == ('game', 1)
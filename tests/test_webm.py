@@ -0,0 +1,137 @@
+import struct
+
+import pytest
+
+from screenpipe import webm
+
+UNKNOWN_SIZE = b'\x01\xff\xff\xff\xff\xff\xff\xff'
+
+
+def element(element_id, payload):
+    size = len(payload)
+    assert size < 0x3fff
+    return element_id + bytes([0x40 | size >> 8, size & 0xff]) + payload
+
+
+def simple_block(timecode, keyframe, frame):
+    return element(b'\xa3', b'\x81' + struct.pack('>hB', timecode, 0x80 if keyframe else 0) + frame)
+
+
+def live_cluster(timecode, blocks):
+    """A cluster as MediaRecorder streams it: unknown size, a timecode, then blocks."""
+    return b'\x1f\x43\xb6\x75' + UNKNOWN_SIZE + element(b'\xe7', struct.pack('>H', timecode)) + b''.join(
+        simple_block(*block) for block in blocks)
+
+
+FRAMES = [b'frame-%d' % i for i in range(6)]
+
+
+def recording():
+    """A small live WebM: no Duration, no Cues, unknown Segment and Cluster sizes, cut mid-block."""
+    header = element(b'\x1a\x45\xdf\xa3', element(b'\x42\x82', b'webm'))
+    info = element(b'\x15\x49\xa9\x66', element(b'\x2a\xd7\xb1', (1000000).to_bytes(3, 'big')) +
+                   element(b'\x4d\x80', b'Chrome'))
+    tracks = element(b'\x16\x54\xae\x6b', element(b'\xae', element(b'\xd7', b'\x01') + element(b'\x83', b'\x01') +
+                                                  element(b'\x86', b'V_VP8')))
+    clusters = (live_cluster(0, [(0, True, FRAMES[0]), (500, False, FRAMES[1])]) +
+                live_cluster(1000, [(0, True, FRAMES[2]), (400, False, FRAMES[3])]) +
+                # The last cluster opens with a delta frame; its cue is the keyframe after it
+                live_cluster(2000, [(0, False, FRAMES[4]), (200, True, FRAMES[5])]))
+    # The recorder stopped in the middle of writing a block
+    truncated = simple_block(300, False, b'lost')[:6]
+    return header + b'\x18\x53\x80\x67' + UNKNOWN_SIZE + info + tracks + clusters + truncated
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'gameplay.webm'
+    path.write_bytes(recording())
+    return path
+
+
+def test_scan_reads_the_live_layout(path):
+    with open(path, 'rb') as f:
+        layout = webm.scan(f)
+    clusters = layout['clusters']
+    assert len(clusters) == 3
+    assert [cluster.keyframes for cluster in clusters] == [{1: 0}, {1: 1000}, {1: 2200}]
+    assert [cluster.last_time for cluster in clusters] == [500, 1400, 2200]
+
+
+def test_make_seekable_round_trip(path, tmp_path):
+    index_path = tmp_path / 'gameplay.cues'
+    assert not webm.is_seekable(path)
+
+    summary = webm.make_seekable(str(path), str(index_path))
+    assert summary == {'duration': 2.2, 'clusters': 3, 'cues': 3}
+    assert webm.is_seekable(path)
+
+    data = path.read_bytes()
+    # Every frame survives in order
+    positions = [data.index(frame) for frame in FRAMES]
+    assert positions == sorted(positions)
+
+    with open(path, 'rb') as f:
+        layout = webm.scan(f)
+    info = dict(webm._children(layout['info']))
+    assert struct.unpack('>d', info[webm.DURATION])[0] == 2200.0
+    assert info[0x4D80] == b'Chrome'
+    assert [cluster.keyframes for cluster in layout['clusters']] == [{1: 0}, {1: 1000}, {1: 2200}]
+
+    # The sidecar index points at the start of each cluster
+    times, offsets = webm.load_index(str(index_path))
+    assert times == [0, 1000, 2200]
+    for offset in offsets:
+        assert data[offset:offset + 4] == b'\x1f\x43\xb6\x75'
+    assert webm.offset_for_time(str(index_path), 1.5) == (1.0, offsets[1])
+    assert webm.offset_for_time(str(index_path), 0.2) == (0.0, offsets[0])
+    assert webm.offset_for_time(str(index_path), 60) == (2.2, offsets[2])
+
+
+def test_cues_in_the_file_match_the_index(path, tmp_path):
+    index_path = tmp_path / 'gameplay.cues'
+    webm.make_seekable(str(path), str(index_path))
+    data = path.read_bytes()
+
+    with open(path, 'rb') as f:
+        header = webm._read_header(f)
+        f.seek(header[2] + header[1])
+        segment_id, segment_size, _ = webm._read_header(f)
+        segment_start = f.tell()
+    assert segment_id == webm.SEGMENT
+    assert segment_start + segment_size == len(data)
+
+    segment = data[segment_start:]
+    children = dict(webm._children(segment[:segment.index(b'\x1f\x43\xb6\x75')]))
+    seeks = [dict(webm._children(seek)) for _, seek in webm._children(children[webm.SEEK_HEAD])]
+    seek_positions = {seek[webm.SEEK_ID]: webm._uint(seek[webm.SEEK_POSITION]) for seek in seeks}
+    cues_at = segment_start + seek_positions[webm._encode_id(webm.CUES)]
+    assert data[cues_at:cues_at + 4] == webm._encode_id(webm.CUES)
+
+    cues, = [payload for _, payload in webm._children(data[cues_at:])]
+    points = []
+    for _, point in webm._children(cues):
+        fields = dict(webm._children(point))
+        positions = dict(webm._children(fields[webm.CUE_TRACK_POSITIONS]))
+        points.append((webm._uint(fields[webm.CUE_TIME]),
+                       segment_start + webm._uint(positions[webm.CUE_CLUSTER_POSITION])))
+    assert points == list(zip(*webm.load_index(str(index_path))))
+
+
+def test_rewriting_a_seekable_file_is_stable(path, tmp_path):
+    index_path = tmp_path / 'gameplay.cues'
+    webm.make_seekable(str(path), str(index_path))
+    first = path.read_bytes()
+    index_path.unlink()
+
+    webm.make_seekable(str(path), str(index_path))
+    assert path.read_bytes() == first
+    assert webm.load_index(str(index_path))[0] == [0, 1000, 2200]
+
+
+def test_rejects_files_that_are_not_webm(tmp_path):
+    path = tmp_path / 'broken.webm'
+    path.write_bytes(b'not a webm file')
+    with pytest.raises(webm.WebMError):
+        webm.make_seekable(str(path))
+    assert not webm.is_seekable(path)